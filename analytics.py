@@ -0,0 +1,312 @@
+import argparse
+import time
+
+from match_source import placement_number
+from team_index import player_key
+
+
+DAY_SECONDS = 86400
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_state (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO rollup_state (key, value) VALUES ('last_revision', -1);
+CREATE TABLE IF NOT EXISTS team_rollups (
+    team_tag TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    placement_sum INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    kills INTEGER NOT NULL,
+    PRIMARY KEY (team_tag, day)
+);
+CREATE TABLE IF NOT EXISTS player_rollups (
+    player_key TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    player_name TEXT NOT NULL,
+    games INTEGER NOT NULL,
+    placement_sum INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    kills INTEGER NOT NULL,
+    deaths INTEGER NOT NULL,
+    assists INTEGER NOT NULL,
+    PRIMARY KEY (player_key, day)
+);
+CREATE TABLE IF NOT EXISTS rollup_lines (
+    game_id TEXT NOT NULL,
+    game_key TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    name TEXT,
+    day INTEGER NOT NULL,
+    placement INTEGER NOT NULL,
+    kills INTEGER NOT NULL,
+    deaths INTEGER NOT NULL,
+    assists INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS team_rollups_day ON team_rollups (day);
+CREATE INDEX IF NOT EXISTS player_rollups_day ON player_rollups (day);
+CREATE INDEX IF NOT EXISTS rollup_lines_game_id ON rollup_lines (game_id);
+CREATE INDEX IF NOT EXISTS rollup_lines_game_key ON rollup_lines (game_key);
+"""
+
+# day = -1 holds the all-time totals, so unbounded queries read one row per team or player
+ALL_TIME = -1
+
+UPSERT_TEAM = """
+INSERT INTO team_rollups (team_tag, day, games, placement_sum, wins, kills) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (team_tag, day) DO UPDATE SET
+    games = games + excluded.games,
+    placement_sum = placement_sum + excluded.placement_sum,
+    wins = wins + excluded.wins,
+    kills = kills + excluded.kills
+"""
+
+UPSERT_PLAYER = """
+INSERT INTO player_rollups (player_key, day, player_name, games, placement_sum, wins, kills, deaths, assists)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (player_key, day) DO UPDATE SET
+    player_name = excluded.player_name,
+    games = games + excluded.games,
+    placement_sum = placement_sum + excluded.placement_sum,
+    wins = wins + excluded.wins,
+    kills = kills + excluded.kills,
+    deaths = deaths + excluded.deaths,
+    assists = assists + excluded.assists
+"""
+
+LINE_COLUMNS = "game_id, game_key, kind, key, name, day, placement, kills, deaths, assists"
+
+
+def registered_tag(team_tag):
+    # Batch runs store unmapped teams under their lobby label; those are not the same team game to game
+    return team_tag if team_tag and not team_tag.startswith("Team #") else None
+
+
+def rollup_updates(lines, sign):
+    """ (team upserts, player upserts) adding (`sign` 1) or taking back (-1) a game's lines, all-time and per day. """
+    team_updates, player_updates = [], []
+    for _, _, kind, key, name, day, place, kills, deaths, assists in lines:
+        win = int(place == 1)
+        for rollup_day in (ALL_TIME, day):
+            if kind == "team":
+                team_updates.append((key, rollup_day, sign, sign * place, sign * win, sign * kills))
+            else:
+                player_updates.append((key, rollup_day, name, sign, sign * place, sign * win,
+                                       sign * kills, sign * deaths, sign * assists))
+    return team_updates, player_updates
+
+
+def summary(row):
+    """ {"games", "average_placement", "wins", "win_rate", "kills", ...} from a summed rollup row. """
+    games, placement_sum, wins, kills = row[:4]
+    result = {
+        "games": games,
+        "average_placement": round(placement_sum / games, 2) if games else None,
+        "wins": wins,
+        "win_rate": round(wins / games, 3) if games else 0.0,
+        "kills": kills,
+        "kills_per_game": round(kills / games, 2) if games else 0.0,
+    }
+    if len(row) > 4:
+        result["deaths"], result["assists"] = row[4], row[5]
+    return result
+
+
+class Rollups:
+    """ Per-team and per-player totals over every stored game, kept in the match store's database.
+
+    ingest() folds in only the games saved since the last call, adding each one to an all-time row
+    and a per-day row. Queries read at most one row per team/player per day in the window, no matter
+    how many games the archive holds. What each game added is kept in rollup_lines under its lobby
+    fingerprint, so a game saved again (new team tags) or stored twice replaces its old contribution.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        with store.lock, store.connection:
+            store.connection.executescript(SCHEMA)
+            # Rollups built before per-game lines were kept cannot be corrected; the next ingest rebuilds them
+            if store.connection.execute("DELETE FROM rollup_state WHERE key = 'last_game_rowid'").rowcount:
+                store.connection.execute("UPDATE rollup_state SET value = -1 WHERE key = 'last_revision'")
+
+    def ingest(self):
+        """ Fold the games saved since the last ingest into the rollups. Returns how many games were (re)counted. """
+        connection = self.store.connection
+        with self.store.lock, connection:
+            # Other connections to the store (the bot's, another process's) may ingest too; take the write
+            # lock before reading any state, so two ingests cannot both subtract the same old lines
+            connection.execute("BEGIN IMMEDIATE")
+            last_revision = connection.execute("SELECT value FROM rollup_state WHERE key = 'last_revision'").fetchone()[0]
+            rebuilding = last_revision < 0
+            if rebuilding:
+                for table in ("team_rollups", "player_rollups", "rollup_lines"):
+                    connection.execute(f"DELETE FROM {table}")
+
+            games = connection.execute(
+                "SELECT game_key, COALESCE(lobby_key, game_key), recorded_at, revision FROM games WHERE revision > ? ORDER BY revision, rowid",
+                (last_revision,)
+            ).fetchall()
+            if not games:
+                return 0
+
+            # A lobby stored under two keys counts once: the most recently saved row wins
+            latest = {}
+            for game_key, game_id, recorded_at, _ in games:
+                latest.pop(game_id, None)
+                latest[game_id] = (game_key, int(recorded_at // DAY_SECONDS))
+            current = {game_key: (game_id, day) for game_id, (game_key, day) in latest.items()}
+
+            team_rows = connection.execute(
+                "SELECT g.game_key, t.team_tag, t.placement, t.kills FROM team_results t JOIN games g ON g.game_key = t.game_key "
+                "WHERE g.revision > ?", (last_revision,)
+            ).fetchall()
+            player_rows = connection.execute(
+                "SELECT g.game_key, p.player_name, t.placement, p.kills, p.deaths, p.assists FROM player_results p "
+                "JOIN games g ON g.game_key = p.game_key "
+                "JOIN team_results t ON t.game_key = p.game_key AND t.team_number = p.team_number "
+                "WHERE g.revision > ?", (last_revision,)
+            ).fetchall()
+
+            lines = []
+            for game_key, team_tag, placement, kills in team_rows:
+                tag = registered_tag(team_tag)
+                place = placement_number(placement)
+                if game_key in current and tag is not None and place is not None:
+                    game_id, day = current[game_key]
+                    lines.append((game_id, game_key, "team", tag, None, day, place, kills, 0, 0))
+            for game_key, player_name, placement, kills, deaths, assists in player_rows:
+                place = placement_number(placement)
+                if game_key in current and place is not None:
+                    game_id, day = current[game_key]
+                    lines.append((game_id, game_key, "player", player_key(player_name), player_name, day, place,
+                                  kills or 0, deaths or 0, assists or 0))
+
+            if not rebuilding:
+                # Take back whatever these games (by lobby or by key) added last time
+                old_lines = []
+                for game_key, (game_id, _) in current.items():
+                    old_lines += connection.execute(
+                        f"SELECT {LINE_COLUMNS} FROM rollup_lines WHERE game_id = ? OR game_key = ?", (game_id, game_key)
+                    ).fetchall()
+                    connection.execute("DELETE FROM rollup_lines WHERE game_id = ? OR game_key = ?", (game_id, game_key))
+                self.apply(rollup_updates(old_lines, -1))
+
+            connection.executemany(f"INSERT INTO rollup_lines ({LINE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", lines)
+            self.apply(rollup_updates(lines, 1))
+            connection.execute("DELETE FROM team_rollups WHERE games <= 0")
+            connection.execute("DELETE FROM player_rollups WHERE games <= 0")
+            connection.execute("UPDATE rollup_state SET value = ? WHERE key = 'last_revision'", (games[-1][3],))
+        return len(current)
+
+    def apply(self, updates):
+        team_updates, player_updates = updates
+        self.store.connection.executemany(UPSERT_TEAM, team_updates)
+        self.store.connection.executemany(UPSERT_PLAYER, player_updates)
+
+    def day_range(self, days):
+        # None means all time; otherwise today plus the days before it
+        if days is None:
+            return "day = ?", (ALL_TIME,)
+        return "day >= ?", (int(time.time() // DAY_SECONDS) - days + 1,)
+
+    def team(self, tag, days=None):
+        """ Summary for one team tag over the last `days` days (all time by default), or None. """
+        condition, parameters = self.day_range(days)
+        with self.store.lock:
+            row = self.store.connection.execute(
+                f"SELECT SUM(games), SUM(placement_sum), SUM(wins), SUM(kills) FROM team_rollups WHERE team_tag = ? AND {condition}",
+                (tag, *parameters)
+            ).fetchone()
+        return {"team": tag, **summary(row)} if row and row[0] else None
+
+    def teams(self, days=None, limit=None, min_games=1):
+        """ Every team's summary over the window, best average placement first. """
+        condition, parameters = self.day_range(days)
+        with self.store.lock:
+            rows = self.store.connection.execute(
+                f"SELECT team_tag, SUM(games), SUM(placement_sum), SUM(wins), SUM(kills) FROM team_rollups WHERE {condition} "
+                "GROUP BY team_tag HAVING SUM(games) >= ? ORDER BY 1.0 * SUM(placement_sum) / SUM(games), SUM(wins) DESC LIMIT ?",
+                (*parameters, min_games, -1 if limit is None else limit)
+            ).fetchall()
+        return [{"team": row[0], **summary(row[1:])} for row in rows]
+
+    def player(self, name, days=None):
+        """ Summary for one player (any spelling that canonicalizes to the same key), or None. """
+        condition, parameters = self.day_range(days)
+        with self.store.lock:
+            row = self.store.connection.execute(
+                "SELECT SUM(games), SUM(placement_sum), SUM(wins), SUM(kills), SUM(deaths), SUM(assists), MAX(player_name) "
+                f"FROM player_rollups WHERE player_key = ? AND {condition}",
+                (player_key(name), *parameters)
+            ).fetchone()
+        return {"player": row[6], **summary(row[:6])} if row and row[0] else None
+
+    def players(self, days=None, limit=10, min_games=1, order="kills"):
+        """ Player summaries over the window, most kills (or best average placement / win rate) first. """
+        orders = {
+            "kills": "SUM(kills) DESC",
+            "placement": "1.0 * SUM(placement_sum) / SUM(games)",
+            "win_rate": "1.0 * SUM(wins) / SUM(games) DESC",
+        }
+        condition, parameters = self.day_range(days)
+        with self.store.lock:
+            rows = self.store.connection.execute(
+                "SELECT MAX(player_name), SUM(games), SUM(placement_sum), SUM(wins), SUM(kills), SUM(deaths), SUM(assists) "
+                f"FROM player_rollups WHERE {condition} GROUP BY player_key HAVING SUM(games) >= ? ORDER BY {orders[order]} LIMIT ?",
+                (*parameters, min_games, -1 if limit is None else limit)
+            ).fetchall()
+        return [{"player": row[0], **summary(row[1:])} for row in rows]
+
+    def rebuild(self):
+        """ Drop the rollups and fold every stored game in again (after deleting games). """
+        with self.store.lock, self.store.connection:
+            self.store.connection.execute("UPDATE rollup_state SET value = -1 WHERE key = 'last_revision'")
+        return self.ingest()
+
+
+def format_team(row):
+    return (f"{row['team']:<8} {row['games']:>4} games  avg {row['average_placement']:>5}  "
+            f"{row['win_rate'] * 100:>5.1f}% wins  {row['kills']:>5} kills")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Team and player stats across every stored scrim.")
+    parser.add_argument("--days", type=int, help="only the last N days (default: all time)")
+    parser.add_argument("--team", help="one team tag")
+    parser.add_argument("--player", help="one player (name, name#tag or op.gg URL)")
+    parser.add_argument("--players", action="store_true", help="player table instead of the team table")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--rebuild", action="store_true", help="recompute the rollups from every stored game")
+    args = parser.parse_args()
+
+    from match_store import MatchStore
+
+    store = MatchStore()
+    try:
+        rollups = Rollups(store)
+        added = rollups.rebuild() if args.rebuild else rollups.ingest()
+        print(f"Ingested {added} new game(s).")
+        window = f"last {args.days} day(s)" if args.days else "all time"
+
+        if args.team:
+            row = rollups.team(args.team, args.days)
+            print(format_team(row) if row else f"No games for {args.team} ({window}).")
+        elif args.player:
+            row = rollups.player(args.player, args.days)
+            if row:
+                print(f"{row['player']}: {row['games']} games, avg placement {row['average_placement']}, "
+                      f"{row['win_rate'] * 100:.1f}% wins, {row['kills']}/{row['deaths']}/{row['assists']} K/D/A")
+            else:
+                print(f"No games for {args.player} ({window}).")
+        elif args.players:
+            for row in rollups.players(args.days, args.limit):
+                print(f"{row['player']:<20} {row['games']:>4} games  {row['kills']:>5} kills  avg {row['average_placement']}")
+        else:
+            print(f"Teams, {window}:")
+            for row in rollups.teams(args.days, args.limit):
+                print(format_team(row))
+    finally:
+        store.close()
@@ -0,0 +1,318 @@
+import argparse
+import contextlib
+import glob
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from fake_driver import FakeDriver, fixture_copy, load_fixture_games, synthetic_game_html, synthetic_teams
+from fake_sheets import FakeSpreadsheet, FakeWorksheet
+
+
+LOBBY_SIZES = (2, 5, 10, 20, 40)
+BATCH_SIZES = (1, 5, 10, 25, 50)
+REALTIME_GAMES = 10
+REPEATS = 20
+# op.gg relabels a finished game as it ages; each sequence must still be one game
+REALTIME_AGING_LABELS = ("a few seconds ago", "a minute ago", "2 minutes ago")
+BATCH_AGING_LABELS = ("a day ago", "2 days ago")
+# Recorded expanded game blocks (*.html), each with the parse_game() output it must produce (*.json)
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def milliseconds(seconds):
+    return round(seconds * 1000, 3)
+
+
+@contextlib.contextmanager
+def quiet():
+    """ Keep the pipeline's own output out of the report. """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def team_index_for(team_count, directory):
+    from team_index import TeamIndex
+
+    team_file = os.path.join(directory, f"teams_{team_count}.json")
+    players_file = os.path.join(directory, "players.json")
+    with open(team_file, "w", encoding="utf-8") as file:
+        json.dump(synthetic_teams(team_count), file)
+    with open(players_file, "w", encoding="utf-8") as file:
+        json.dump({}, file)
+    return TeamIndex(team_file, players_file)
+
+
+def lobby_games(team_count, count, fixtures=None):
+    if fixtures:
+        return [fixture_copy(fixtures[number % len(fixtures)], number) for number in range(count)]
+    return [synthetic_game_html(f"{team_count}-{number}", team_count) for number in range(count)]
+
+
+def bench_stages(team_counts, directory, fixtures=None, repeats=REPEATS):
+    """ extract_team_data / assign_team_names / update_spreadsheet on one expanded game per lobby size. """
+    import supervive_batch as batch
+
+    rows = []
+    for team_count in team_counts:
+        driver = FakeDriver(lobby_games(team_count, 1, fixtures))
+        driver.get("fake://profile")
+        driver.expand(0)
+        game = driver.find_elements(value="//div[@id='history']/div")[0]
+        batch.team_index = team_index_for(team_count, directory)
+
+        timings = {"extract": [], "assign": [], "update": []}
+        trips = sheets_calls = 0
+        for _ in range(repeats):
+            before = driver.commands
+            with quiet():
+                started = time.perf_counter()
+                teams_data = batch.extract_team_data(game)
+                timings["extract"].append(time.perf_counter() - started)
+                trips = driver.commands - before
+
+                batch.team_mappings.clear()
+                started = time.perf_counter()
+                batch.assign_team_names(teams_data)
+                timings["assign"].append(time.perf_counter() - started)
+
+                games = [{batch.team_mappings.get(team_number, team_number): data for team_number, data in teams_data.items()}]
+                batch.worksheet = FakeWorksheet()
+                started = time.perf_counter()
+                batch.update_spreadsheet(games)
+                timings["update"].append(time.perf_counter() - started)
+                sheets_calls = batch.worksheet.api_calls
+
+        rows.append({
+            "teams": team_count,
+            "extract_ms": milliseconds(statistics.median(timings["extract"])),
+            "assign_ms": milliseconds(statistics.median(timings["assign"])),
+            "update_ms": milliseconds(statistics.median(timings["update"])),
+            "webdriver_round_trips": trips,
+            "sheets_calls": sheets_calls,
+        })
+    return rows
+
+
+def bench_realtime(team_count, directory, games=REALTIME_GAMES, fixtures=None):
+    """ The realtime loop end to end, one finished game at a time, against a fake page and spreadsheet. """
+    import supervive_realtime as realtime
+    from analytics import Rollups
+    from jobs import Job
+    from match_store import MatchStore
+    from observers import ProfileObserver
+    from scoreboard import ScoreboardMirror
+    from sheet_layout import SeriesTabs
+    from sheets_queue import SheetWriteQueue
+    from waits import Backoff
+
+    spreadsheet = FakeSpreadsheet()
+    realtime.series_tabs = SeriesTabs(spreadsheet, "Benchmark")
+    with quiet():
+        realtime.worksheet, realtime.series_number = realtime.series_tabs.open_series()
+    realtime.sheet_writes = SheetWriteQueue(realtime.worksheet, requests_per_minute=60000, flush_interval=0)
+    realtime.scoreboard = ScoreboardMirror(realtime.worksheet)
+    realtime.match_store = MatchStore(os.path.join(directory, f"realtime_{team_count}.db"))
+    realtime.rollups = Rollups(realtime.match_store)
+    realtime.team_index = team_index_for(team_count, directory)
+    realtime.team_mappings.clear()
+    realtime.games_since_reset = 0
+    realtime.set_job(Job("benchmark"))
+    # "Fetch New Matches" re-renders a few commands later, like the real page, so stale elements show up
+    driver = FakeDriver(fetch_delay=3)
+    realtime.observer = ProfileObserver("fake://profile", driver)
+    realtime.retry_backoff = Backoff(initial=0, maximum=0)  # idle polls would otherwise sleep between games
+    realtime.WRITE_TOTALS = True  # fresh tabs hold no formulas, so the totals block is measured too
+
+    new_games = lobby_games(team_count, games, fixtures)
+    latencies, trips, sheets_calls = [], [], []
+    try:
+        for game_html in new_games:
+            driver.publish(game_html)
+            before_trips = driver.commands
+            before_calls = sum(ws.api_calls for ws in spreadsheet.tabs)
+            with quiet():
+                started = time.perf_counter()
+                realtime.process_next_game()
+                realtime.sheet_writes.flush()
+                latencies.append(time.perf_counter() - started)
+            trips.append(driver.commands - before_trips)
+            sheets_calls.append(sum(ws.api_calls for ws in spreadsheet.tabs) - before_calls)
+    finally:
+        realtime.sheet_writes.close()
+        realtime.match_store.close()
+
+    return {
+        "teams": team_count,
+        "games": len(new_games),
+        "per_game_ms": milliseconds(statistics.median(latencies)),
+        "max_game_ms": milliseconds(max(latencies)),
+        "webdriver_round_trips_per_game": statistics.median(trips),
+        "sheets_calls_per_game": statistics.median(sheets_calls),
+        "dropped_batches": realtime.sheet_writes.batches_dropped,
+        "webdriver_round_trips": dict(driver.round_trips),
+    }
+
+
+def bench_batch(sizes, team_count, directory, fixtures=None):
+    """ process_past_games + update_spreadsheet for the last N games of a fake profile page. """
+    import supervive_batch as batch
+    from match_source import SeleniumMatchSource
+
+    batch.team_index = team_index_for(team_count, directory)
+    batch.WRITE_TOTALS = True  # fresh worksheets hold no formulas, so the totals block is measured too
+    history = lobby_games(team_count, max(sizes), fixtures)
+
+    rows = []
+    for size in sizes:
+        driver = FakeDriver(history)
+        batch.driver = driver
+        batch.worksheet = FakeWorksheet()
+        with quiet():
+            started = time.perf_counter()
+            games = batch.process_past_games(size, SeleniumMatchSource(driver))
+            scraped = time.perf_counter()
+            batch.update_spreadsheet(games)
+            finished = time.perf_counter()
+        rows.append({
+            "games": size,
+            "total_ms": milliseconds(finished - started),
+            "per_game_ms": milliseconds((finished - started) / size),
+            "scrape_ms": milliseconds(scraped - started),
+            "write_ms": milliseconds(finished - scraped),
+            "webdriver_round_trips": driver.commands,
+            "sheets_calls": batch.worksheet.api_calls,
+        })
+    return rows
+
+
+def check_aging_labels(directory, team_count=2):
+    """ Re-poll and re-scrape one finished game while its time label ages; it must be stored once. """
+    from match_source import SeleniumMatchSource
+    from match_store import MatchStore
+    from observers import ProfileObserver
+    from opgg_parser import parse_game
+
+    store = MatchStore(os.path.join(directory, "aging.db"))
+    driver = FakeDriver()
+    rows = []
+    try:
+        recorded = 0
+        for label in REALTIME_AGING_LABELS:
+            driver.games = [synthetic_game_html("aging", team_count, time_label=label)]
+            driver.render()
+            # A fresh observer each time, like after a restart, so only the stored key can skip the game
+            with quiet():
+                found = ProfileObserver("fake://profile", driver).poll(known=store.has_game, sleep=lambda seconds: None)
+            if found is not None:
+                latest_game, record = found
+                record["teams"] = parse_game(latest_game.get_attribute("outerHTML"))
+                store.save_match(record)
+                recorded += 1
+        rows.append({"check": "realtime relabel", "labels": len(REALTIME_AGING_LABELS), "scraped": recorded,
+                     "stored": len(store.recent_game_keys(100)), "ok": recorded == 1})
+
+        scraped = 0
+        for label in BATCH_AGING_LABELS:
+            driver.games = [synthetic_game_html("aging", team_count, time_label=label)]
+            with quiet():
+                matches = SeleniumMatchSource(driver).recent_matches(1, known=store.get_match)
+            for match in matches:
+                if "team_tags" not in match:
+                    scraped += 1
+                    store.save_match(match)
+        stored = len(store.recent_game_keys(100))
+        rows.append({"check": "batch relabel", "labels": len(BATCH_AGING_LABELS), "scraped": scraped,
+                     "stored": stored, "ok": scraped == 0 and stored == 1})
+    finally:
+        store.close()
+    return rows
+
+
+def check_batch_reruns(directory, team_count=2, games=3):
+    """ Two batch runs into the same tab; /results and the scoring CLI must only see the last one. """
+    import supervive_batch as batch
+    from match_source import SeleniumMatchSource
+    from match_store import MatchStore
+
+    batch.team_index = team_index_for(team_count, directory)
+    store = MatchStore(os.path.join(directory, "reruns.db"))
+    try:
+        for run in range(2):
+            driver = FakeDriver([synthetic_game_html(f"rerun-{run}-{number}", team_count) for number in range(games)])
+            batch.driver = driver
+            batch.worksheet = FakeWorksheet()
+            with quiet():
+                batch.process_past_games(games, SeleniumMatchSource(driver), store)
+        _, matches = store.latest_tab_matches()
+    finally:
+        store.close()
+    return [{"check": "batch rerun", "labels": "-", "scraped": games * 2, "stored": len(matches), "ok": len(matches) == games}]
+
+
+def check_fixtures(directory=FIXTURE_DIR):
+    """ parse_game() on every recorded game block must give the teams, kills and K/D/A saved next to it. """
+    from opgg_parser import parse_game_file
+
+    rows = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(os.path.splitext(path)[0] + ".json", "r", encoding="utf-8") as file:
+            expected = json.load(file)
+        # Round-trip through JSON so stats tuples compare equal to the saved lists
+        parsed = json.loads(json.dumps(parse_game_file(path)))
+        rows.append({"check": f"fixture {os.path.basename(path)}", "labels": "-", "scraped": len(parsed),
+                     "stored": len(expected), "ok": parsed == expected})
+    return rows
+
+
+def print_table(title, rows):
+    if not rows:
+        return
+    columns = [column for column in rows[0] if not isinstance(rows[0][column], dict)]
+    widths = [max(len(column), *(len(str(row[column])) for row in rows)) for column in columns]
+    print(f"\n{title}")
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[column]).rjust(width) for column, width in zip(columns, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark of the scrape -> parse -> assign -> sheet pipeline.")
+    parser.add_argument("--teams", default=",".join(map(str, LOBBY_SIZES)), help="lobby sizes to test, comma separated")
+    parser.add_argument("--batch-sizes", default=",".join(map(str, BATCH_SIZES)), help="N values for process_past_games")
+    parser.add_argument("--realtime-games", type=int, default=REALTIME_GAMES, help="games to push through the realtime loop")
+    parser.add_argument("--fixtures", metavar="DIR", help="recorded expanded game blocks (*.html) to use instead of synthetic lobbies")
+    parser.add_argument("--json", metavar="FILE", help="also write the results as JSON, to diff runs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    team_counts = [int(value) for value in args.teams.split(",")]
+    batch_sizes = [int(value) for value in args.batch_sizes.split(",")]
+    fixtures = load_fixture_games(args.fixtures) if args.fixtures else None
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = {
+            "stages": bench_stages(team_counts, directory, fixtures),
+            "realtime": [bench_realtime(team_count, directory, args.realtime_games, fixtures) for team_count in team_counts],
+            "batch": bench_batch(batch_sizes, max(team_counts), directory, fixtures),
+            "checks": check_aging_labels(directory) + check_batch_reruns(directory) + check_fixtures(),
+        }
+
+    print_table("Per-stage latency (median per game)", results["stages"])
+    print_table("Realtime loop (per game, including the sheet flush)", results["realtime"])
+    print_table(f"process_past_games + update_spreadsheet ({max(team_counts)} teams)", results["batch"])
+    print_table("Correctness checks", results["checks"])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=4)
+        print(f"\nResults saved to {args.json}")
+
+    failed = [row["check"] for row in results["checks"] if not row["ok"]]
+    # A dropped batch means the sheet rejected a write, e.g. one past the worksheet's grid
+    failed += [f"realtime {row['teams']} teams dropped sheet writes" for row in results["realtime"] if row["dropped_batches"]]
+    if failed:
+        raise SystemExit(f"\nFailed checks: {', '.join(failed)}")
@@ -1,56 +1,178 @@
+import time
+
+startup_started = time.perf_counter()
+
 import discord
 import threading
 from discord import app_commands
 from discord.ext import commands
 import os
 import asyncio
-from flask import Flask
-import subprocess
-from threading import Thread
+import hashlib
 import json
-import psutil
-import time
+import sys
+
+from event_bus import EventBus
+from jobs import JobRunner
+from metrics import configure_logging, metrics
+from results_cache import ResultsCache
+from team_registry import TeamRegistry
 
 # THIS BOT IS RUNNING IN REPLIT FOR SEMI 24/7 UP-TIME
 
 TOKEN = ""  # Discord Bot Token
-GUILD_ID = ""  # Discord Server ID
-app = Flask(__name__)
+GUILD_ID = ""  # Discord Server ID; commands sync to this guild only (instant) when set
+EVENTS_CHANNEL_ID = ""  # channel for updates from scrapers started outside the bot (event bus)
+COMMAND_FINGERPRINT_FILE = ".command_fingerprint"  # hash of the last synced command tree
+
+startup_marks = [("imports", time.perf_counter())]
+
 
+def mark_startup(stage):
+  startup_marks.append((stage, time.perf_counter()))
 
-@app.route('/')
-def home():
-  return "Bot is alive!"
 
+def startup_report():
+  parts = []
+  previous = startup_started
+  for stage, at in startup_marks:
+    parts.append(f"{stage} {at - previous:.2f}s")
+    previous = at
+  return ", ".join(parts) + f" (total {previous - startup_started:.2f}s)"
+
+
+def run_keepalive():
+  # Flask is only needed for the Replit keep-alive ping, so it is imported off the startup path
+  from flask import Flask, Response
+
+  app = Flask(__name__)
+
+  @app.route('/')
+  def home():
+    return "Bot is alive!"
+
+  @app.route('/metrics')
+  def metrics_page():
+    # Stage timers and Sheets counters from every job running in this process
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
-def run():
   app.run(host="0.0.0.0", port=8080)
 
 
-IMAGE_PATH = "/tmp/spreadsheet_final.png"
+configure_logging()
+threading.Thread(target=run_keepalive, daemon=True).start()
+
+
+class ScrimsBot(commands.Bot):
 
+  async def setup_hook(self):
+    mark_startup("login")
+    await sync_commands()
+    mark_startup("command sync")
+    try:
+      await event_bus.start()
+    except OSError as e:
+      print(f"Could not start the event bus: {e}")
+
+  async def close(self):
+    await event_bus.close()
+    await super().close()
 
-threading.Thread(target=run, daemon=True).start()
 
 intents = discord.Intents.default()
-bot = commands.Bot(command_prefix="!", intents=discord.Intents.default())
+bot = ScrimsBot(command_prefix="!", intents=discord.Intents.default())
 
 
 ALLOWED_ROLES = {"New Tech", "Admin", "Owner", "Helper guy"}
 
 
-REALTIME_SCRIPT = "supervive_realtime.py"
-BATCH_SCRIPT = "supervive_batch.py"
 TEAMS_JSON = "teams.json"
+PROGRESS_EDIT_INTERVAL = 2  # seconds between progress edits of a command's reply, to stay clear of rate limits
+STATS_TABLE_LIMIT = 15  # teams listed by /scrims_stats, to stay under Discord's message length
+
+# Realtime, batch and screenshot work runs in-process on this runner's thread pool
+jobs = JobRunner()
+
+# teams.json is owned by the bot; edits go through the registry instead of touching the file directly
+team_registry = TeamRegistry(TEAMS_JSON)
+
+
+def refresh_scraper_teams(tag, entry):
+  # Scrapers running in-process re-read teams.json before their next team assignment
+  for name in ("supervive_realtime", "supervive_batch"):
+    module = sys.modules.get(name)
+    if module is not None:
+      module.team_index.mark_stale()
+
+
+team_registry.subscribe(refresh_scraper_teams)
+
+# Scrapers run from the command line report here over a local socket instead of the job runner
+event_bus = EventBus()
+
+
+def describe_bus_event(event):
+  stage = event["stage"]
+  if stage == "game_detected":
+    observer = f" by {event['observer']}" if event.get("observer") else ""
+    return f"🔎 New game detected{observer} ({event['job']})."
+  if stage == "sheet_written":
+    games = f"{event['games']} game(s)" if "games" in event else "Game"
+    return f"✅ {games} written to {event.get('tab', 'the sheet')} ({event['job']})."
+  if stage == "error":
+    return f"❌ {event['job']}: {event.get('error', 'unknown error')}"
+  return None  # game_extracted is too chatty for the channel
+
+
+async def post_bus_event(event):
+  text = describe_bus_event(event)
+  if not text or not EVENTS_CHANNEL_ID:
+    return
+  channel = bot.get_channel(int(EVENTS_CHANNEL_ID))
+  if channel is not None:
+    await channel.send(text)
+
+
+event_bus.subscribe(post_bus_event)
+
+match_store = None
+
+
+def get_match_store():
+  global match_store
+  if match_store is None:
+    from match_store import MatchStore
+    match_store = MatchStore()
+  return match_store
+
+
+def render_results(kind, version, path, job=None):
+  if kind == "spreadsheet":
+    import screenshot_script
+    return screenshot_script.take_screenshot(output_path=path)
+
+  import results_renderer
+  return results_renderer.render_latest_results(get_match_store(), path=path)
+
+
+# One image per scoreboard version; concurrent /results calls share a single render
+results_cache = ResultsCache(
+    render_results,
+    lambda: get_match_store().version(),
+    run=lambda func, *args: jobs.run("results", func, *args))
 
 SCRIMS_COMMANDS = {
-    "/scrims_start_realtime": "Starts real-time calculations.",
+    "/scrims_start_realtime [observers]":
+    "Starts real-time calculations, optionally watching several players' profiles.",
     "/scrims_stop": "Stops the calculations.",
-    "/results": "Sends results (screenshot of spreadsheet).",
+    "/scrims_jobs": "Lists running and recent background jobs.",
+    "/results [spreadsheet]": "Sends results (standings image, or a screenshot of the spreadsheet).",
     "/scrims_calc_past <number>": "Calculates past <number> custom games.",
     "/team_add <TAG> <Captain> <Member1> <Member2> <Member3> <Captain's-op.gg>":
     "Adds a team with specified members.",
-    "/team_remove <TAG>": "Removes a team by its tag."
+    "/team_remove <TAG>": "Removes a team by its tag.",
+    "/scrims_stats [team] [days]":
+    "Team placements, win rates and kills across every stored scrim."
 }
 
 
@@ -63,16 +185,10 @@ def has_permission(interaction: discord.Interaction):
   return any(role.name in ALLOWED_ROLES for role in interaction.user.roles)
 
 
-def stop_script(script_name):
-  for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-    try:
-      if script_name in " ".join(
-          proc.info['cmdline']):  
-        proc.kill()
-        return True
-    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-      continue
-  return False
+def describe_job(job):
+  latest = job.latest
+  stage = f", {latest['stage']}" if latest else ""
+  return f"`{job.id}`: {job.status}{stage}"
 
 
 
@@ -99,15 +215,39 @@ async def help_scrims(interaction: discord.Interaction):
 
 @bot.tree.command(name="scrims_start_realtime",
                   description="Starts real-time calculations")
-async def scrims_start_realtime(interaction: discord.Interaction):
+@app_commands.describe(
+    observers='"auto", or comma separated players whose op.gg profiles are watched at once')
+async def scrims_start_realtime(interaction: discord.Interaction,
+                                observers: str = None):
   if not has_permission(interaction):
     await interaction.response.send_message(
         "You don't have the required permissions to use this command",
         ephemeral=True)
     return
 
-  subprocess.Popen(["python", REALTIME_SCRIPT])
-  await interaction.response.send_message("Real-time calculations started!")
+  running = jobs.active("realtime")
+  if running:
+    await interaction.response.send_message(
+        f"Real-time calculations are already running ({running[0].id}).",
+        ephemeral=True)
+    return
+
+  import supervive_realtime
+
+  channel = interaction.channel
+
+  async def on_event(event):
+    if event["stage"] == "game_processed":
+      await channel.send(
+          f"✅ Game {event['game_number']} recorded in {event['tab']}.")
+    elif event["stage"] == "failed":
+      await channel.send(
+          f"❌ Real-time calculations stopped: {event['error']}")
+
+  job = jobs.start("realtime", supervive_realtime.main, on_event=on_event,
+                   observers=observers)
+  await interaction.response.send_message(
+      f"Real-time calculations started! ({job.id})")
 
 
 
@@ -119,14 +259,36 @@ async def scrims_stop(interaction: discord.Interaction):
         ephemeral=True)
     return
 
-  if stop_script(REALTIME_SCRIPT):
-    await interaction.response.send_message("Real-time calculations stopped.")
+  stopped = [job.id for job in jobs.active("realtime") if jobs.cancel(job.id)]
+  if stopped:
+    await interaction.response.send_message(
+        f"Real-time calculations stopped ({', '.join(stopped)}).")
   else:
     await interaction.response.send_message(
         "Real-time script was not running.", ephemeral=True)
 
 
 
+@bot.tree.command(name="scrims_jobs",
+                  description="Lists running and recent background jobs")
+async def scrims_jobs(interaction: discord.Interaction):
+  if not has_permission(interaction):
+    await interaction.response.send_message(
+        "You don't have the required permissions to use this command",
+        ephemeral=True)
+    return
+
+  listed = list(jobs.jobs.values())[-10:]
+  if not listed:
+    await interaction.response.send_message("No jobs have run yet.",
+                                            ephemeral=True)
+    return
+
+  await interaction.response.send_message(
+      "\n".join(describe_job(job) for job in listed), ephemeral=True)
+
+
+
 @bot.tree.command(name="scrims_calc_past",
                   description="Calculate past X custom games")
 @app_commands.describe(number="Number of past scrims to calculate")
@@ -140,29 +302,29 @@ async def scrims_calc_past(interaction: discord.Interaction, number: int):
   await interaction.response.send_message(
       f"Calculating past {number} custom games...")
 
+  import supervive_batch
 
-  process = await asyncio.create_subprocess_exec(
-      "python",
-      BATCH_SCRIPT,
-      str(number),
-      stdout=asyncio.subprocess.PIPE,
-      stderr=asyncio.subprocess.PIPE)
-
+  last_edit = 0
 
-  while True:
-    line = await process.stdout.readline()
-    if not line:
-      break  
+  async def on_event(event):
+    nonlocal last_edit
+    if event["stage"] != "game_processed" or time.monotonic() - last_edit < PROGRESS_EDIT_INTERVAL:
+      return
+    last_edit = time.monotonic()
+    await interaction.edit_original_response(
+        content=f"Calculating past {number} custom games... ({event['game_number']}/{event['total']})")
 
-    decoded_line = line.decode().strip()
-    print(decoded_line) 
-
-    if "Completed batch processing." in decoded_line:
-      await interaction.followup.send(
-          f"✅ Done calculating past {number} custom games.")
-      return  
+  # The batch module keeps per-run state in globals, so the runner lets one batch job run at a time
+  try:
+    await jobs.run("batch", supervive_batch.run_batch, number, on_event=on_event)
+  except Exception as e:
+    print(f"Batch processing failed: {e}")
+    await interaction.followup.send(
+        f"❌ Failed calculating past {number} custom games.")
+    return
 
-  await process.wait()  
+  await interaction.followup.send(
+      f"✅ Done calculating past {number} custom games.")
 
 
 
@@ -182,13 +344,7 @@ async def team_add(interaction: discord.Interaction, tag: str, captain: str,
         ephemeral=True)
     return
 
-  try:
-    with open(TEAMS_JSON, "r") as file:
-      teams = json.load(file)
-  except (FileNotFoundError, json.JSONDecodeError):
-    teams = {}
-
-  teams[tag] = {
+  await team_registry.add_team(tag, {
       "enabled": True,
       "players": {
           captain: captain_opgg,
@@ -197,10 +353,7 @@ async def team_add(interaction: discord.Interaction, tag: str, captain: str,
           member3: ""
       },
       "captain": captain
-  }
-
-  with open(TEAMS_JSON, "w") as file:
-    json.dump(teams, file, indent=4)
+  })
 
   await interaction.response.send_message(
       f"Team {tag} added with members: {captain}, {member1}, {member2}, {member3}. Captain's op.gg: {captain_opgg}"
@@ -217,25 +370,53 @@ async def team_remove(interaction: discord.Interaction, tag: str):
         ephemeral=True)
     return
 
-  try:
-    with open(TEAMS_JSON, "r") as file:
-      teams = json.load(file)
-  except (FileNotFoundError, json.JSONDecodeError):
-    await interaction.response.send_message("No teams found.", ephemeral=True)
-    return
-
-  if tag in teams:
-    del teams[tag]
-    with open(TEAMS_JSON, "w") as file:
-      json.dump(teams, file, indent=4)
+  if await team_registry.remove_team(tag):
     await interaction.response.send_message(f"Team {tag} has been removed.")
   else:
     await interaction.response.send_message(f"Team {tag} not found.",
                                             ephemeral=True)
 
 
+def scrims_stats_text(team, days):
+  from analytics import Rollups, format_team
+
+  rollups = Rollups(get_match_store())
+  rollups.ingest()
+  window = f"last {days} day(s)" if days else "all time"
+  if team:
+    row = rollups.team(team, days)
+    if row is None:
+      return f"No stored games for {team} ({window})."
+    return f"**{team}**, {window}:\n```{format_team(row)}```"
+  rows = rollups.teams(days, limit=STATS_TABLE_LIMIT)
+  if not rows:
+    return f"No stored games ({window})."
+  table = "\n".join(format_team(row) for row in rows)
+  return f"**Teams**, {window}:\n```{table}```"
+
+
+@bot.tree.command(name="scrims_stats",
+                  description="Team stats across every stored scrim")
+@app_commands.describe(team="Team tag (leave empty for every team)",
+                       days="Only the last N days (leave empty for all time)")
+async def scrims_stats(interaction: discord.Interaction,
+                       team: str = None,
+                       days: int = None):
+  if not has_permission(interaction):
+    await interaction.response.send_message(
+        "You don't have the required permissions to use this command",
+        ephemeral=True)
+    return
+
+  # Catching up on new games and the queries are SQLite reads, kept off the event loop
+  text = await asyncio.to_thread(scrims_stats_text, team, days)
+  await interaction.response.send_message(text)
+
+
 @bot.tree.command(name="results", description="Get the latest scrim results")
-async def results(interaction: discord.Interaction):
+@app_commands.describe(
+    spreadsheet="Screenshot the Google Sheet instead of drawing the table locally")
+async def results(interaction: discord.Interaction, spreadsheet: bool = False):
   await interaction.response.defer(
   )  
   if not has_permission(interaction):
@@ -245,29 +426,99 @@ async def results(interaction: discord.Interaction):
     return
 
 
-  process = await asyncio.create_subprocess_exec("python",
-                                                 "screenshot_script.py")
-  await process.communicate()  
+  image_path = None
+  if not spreadsheet:
+    try:
+      image_path = await results_cache.get("rendered")
+    except Exception as e:
+      print(f"Rendering results failed: {e}")
+
+  # The Selenium screenshot stays as a fallback when there is nothing stored locally
+  if image_path is None:
+    try:
+      image_path = await results_cache.get("spreadsheet")
+    except Exception as e:
+      print(f"Screenshot failed: {e}")
 
 
-  if os.path.exists(IMAGE_PATH):
-    file = discord.File(IMAGE_PATH)
+  if image_path and os.path.exists(image_path):
+    file = discord.File(image_path)
     await interaction.followup.send("**Latest Scrims Data:**", file=file)
   else:
     await interaction.followup.send(
         "No scrim results found. Please try again later.")
 
 
-@bot.event
-async def on_ready():
-  print(f'Logged in as {bot.user}')
+def command_payload(command):
+  try:
+    return command.to_dict(bot.tree)
+  except TypeError:  # discord.py < 2.4 takes no tree argument
+    return command.to_dict()
+
+
+def command_fingerprint():
+  """ Hash of every command definition plus the sync target, so unchanged trees are never re-synced. """
+  payloads = sorted((command_payload(command) for command in bot.tree.get_commands()),
+                    key=lambda payload: payload["name"])
+  blob = json.dumps({"guild": GUILD_ID, "commands": payloads}, sort_keys=True, default=str)
+  return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def read_fingerprint():
   try:
-    bot.tree.clear_commands(guild=None)
-    time.sleep(2)
-    synced = await bot.tree.sync()
+    with open(COMMAND_FINGERPRINT_FILE, "r") as file:
+      return file.read().strip()
+  except FileNotFoundError:
+    return None
+
+
+def write_fingerprint(fingerprint):
+  with open(COMMAND_FINGERPRINT_FILE, "w") as file:
+    file.write(fingerprint)
+
+
+async def sync_commands():
+  """ Sync slash commands only when their definitions changed since the last successful sync. """
+  fingerprint = command_fingerprint()
+  if fingerprint == read_fingerprint():
+    print("Commands unchanged since last sync. Skipping sync.")
+    return
+
+  try:
+    if GUILD_ID:
+      guild = discord.Object(id=int(GUILD_ID))
+      bot.tree.copy_global_to(guild=guild)
+      # Drop the old global registrations so commands are not listed twice in the server
+      bot.tree.clear_commands(guild=None)
+      await bot.tree.sync()
+      synced = await bot.tree.sync(guild=guild)
+    else:
+      synced = await bot.tree.sync()
+    await asyncio.to_thread(write_fingerprint, fingerprint)
     print(f"Synced {len(synced)} commands successfully!")
   except Exception as e:
     print(f"Failed to sync commands: {e}")
 
 
-bot.run(TOKEN)
\ No newline at end of file
+def warm_browsers():
+  # Selenium and psutil load in this thread, not on the startup path
+  from browser_pool import get_pool
+
+  try:
+    get_pool().warm()
+    print("Browser pool warmed.")
+  except Exception as e:
+    print(f"Could not warm browser pool: {e}")
+
+
+@bot.event
+async def on_ready():
+  print(f'Logged in as {bot.user}')
+  if startup_marks[-1][0] != "ready":
+    mark_startup("ready")
+    print(f"Startup: {startup_report()}")
+    # Batch and screenshot jobs borrow these browsers instead of cold-starting Chrome
+    threading.Thread(target=warm_browsers, daemon=True).start()
+
+
+bot.run(TOKEN)
@@ -0,0 +1,202 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import psutil
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+
+from metrics import get_logger
+
+
+DRIVER_CACHE_FILE = ".chromedriver_path"  # resolved chromedriver binary, reused across runs
+POOL_SIZE = 2
+MAX_RSS_MB = 1500  # recycle a browser once chromedriver + Chrome grow past this
+MAX_USES = 50  # recycle a browser after this many sessions even if it looks healthy
+WINDOW_SIZE = "1920,1080"
+
+log = get_logger("browsers")
+
+
+def resolve_chromedriver():
+    """ Path to chromedriver, resolved with webdriver_manager once and cached on disk afterwards. """
+    try:
+        with open(DRIVER_CACHE_FILE, "r", encoding="utf-8") as file:
+            cached_path = file.read().strip()
+        if cached_path and os.path.exists(cached_path):
+            return cached_path
+    except FileNotFoundError:
+        pass
+
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    driver_path = ChromeDriverManager().install()
+    with open(DRIVER_CACHE_FILE, "w", encoding="utf-8") as file:
+        file.write(driver_path)
+    return driver_path
+
+
+def new_driver():
+    """ Start one headless Chrome with the options every job expects. """
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless")
+    options.add_argument(f"--window-size={WINDOW_SIZE}")
+    return webdriver.Chrome(service=Service(resolve_chromedriver()), options=options)
+
+
+def driver_rss_mb(driver):
+    """ Resident memory of chromedriver and every Chrome process it spawned, in MB. """
+    try:
+        root = psutil.Process(driver.service.process.pid)
+        processes = [root] + root.children(recursive=True)
+    except (AttributeError, psutil.Error):
+        return 0
+
+    total = 0
+    for process in processes:
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            continue
+    return total / (1024 * 1024)
+
+
+def is_alive(driver):
+    """ Cheap health check: a crashed browser or chromedriver raises on any command. """
+    try:
+        driver.current_url
+        return True
+    except Exception:
+        return False
+
+
+def quit_driver(driver):
+    try:
+        driver.quit()
+    except Exception as e:
+        log.warning(f"Error closing browser: {e}")
+
+
+class BrowserPool:
+    """ Keeps warm headless browsers alive and hands them out to realtime, batch and screenshot jobs. """
+
+    def __init__(self, size=POOL_SIZE, max_rss_mb=MAX_RSS_MB, max_uses=MAX_USES):
+        self.size = size
+        self.max_rss_mb = max_rss_mb
+        self.max_uses = max_uses
+        self.idle = queue.LifoQueue()
+        self.uses = {}
+        self.lock = threading.Lock()
+        self.started = 0
+        self.closed = False
+
+    def warm(self):
+        """ Start browsers until the pool is full, so the first job does not pay the cold start. """
+        while True:
+            with self.lock:
+                if self.closed or self.started >= self.size:
+                    return
+                self.started += 1
+            try:
+                driver = new_driver()
+            except Exception:
+                with self.lock:
+                    self.started -= 1
+                raise
+            self.uses[id(driver)] = 0
+            self.idle.put(driver)
+
+    def warm_in_background(self):
+        def run():
+            try:
+                self.warm()
+                log.info(f"Browser pool warmed with {self.size} browser(s).")
+            except Exception as e:
+                log.warning(f"Could not warm browser pool: {e}")
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def acquire(self, timeout=None):
+        """ Take a healthy browser from the pool, starting a new one if the pool is not full yet. """
+        while True:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                with self.lock:
+                    can_start = not self.closed and self.started < self.size
+                    if can_start:
+                        self.started += 1
+                if can_start:
+                    try:
+                        driver = new_driver()
+                    except Exception:
+                        with self.lock:
+                            self.started -= 1
+                        raise
+                    self.uses[id(driver)] = 0
+                else:
+                    driver = self.idle.get(timeout=timeout)
+
+            if is_alive(driver):
+                return driver
+            log.warning("Browser in pool crashed. Replacing it.")
+            self.discard(driver)
+
+    def release(self, driver):
+        """ Return a browser to the pool, recycling it if it crashed, grew too large or is worn out. """
+        self.uses[id(driver)] = self.uses.get(id(driver), 0) + 1
+
+        if self.closed or not is_alive(driver):
+            self.discard(driver)
+            return
+
+        rss_mb = driver_rss_mb(driver)
+        if rss_mb > self.max_rss_mb:
+            log.info(f"Recycling browser using {rss_mb:.0f} MB.")
+            self.discard(driver)
+            return
+        if self.uses[id(driver)] >= self.max_uses:
+            log.info(f"Recycling browser after {self.uses[id(driver)]} sessions.")
+            self.discard(driver)
+            return
+
+        self.idle.put(driver)
+
+    def discard(self, driver):
+        self.uses.pop(id(driver), None)
+        quit_driver(driver)
+        with self.lock:
+            self.started -= 1
+
+    @contextmanager
+    def session(self, timeout=None):
+        """ `with pool.session() as driver:` borrows a browser and always gives it back. """
+        driver = self.acquire(timeout=timeout)
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+        while True:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(driver)
+
+
+shared_pool = None
+shared_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """ The process-wide pool shared by every job running in this process. """
+    global shared_pool
+    with shared_pool_lock:
+        if shared_pool is None:
+            shared_pool = BrowserPool()
+        return shared_pool
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+
+from metrics import get_logger
+
+
+log = get_logger("events")
+
+SOCKET_PATH = os.environ.get("SCRIMS_EVENT_SOCKET", "/tmp/scrims_events.sock")
+EVENT_TYPES = ("game_detected", "game_extracted", "sheet_written", "error")
+RECONNECT_INTERVAL = 5  # seconds a publisher waits before trying a bot that was not listening again
+SEND_TIMEOUT = 1  # a stuck bot must not stall the scraper for longer than this per event
+MAX_EVENT_BYTES = 64 * 1024
+
+
+class EventPublisher:
+    """ Script side of the event bus: sends job events to the bot over a Unix socket, one JSON line each.
+
+    publish() has the Job listener signature, so `Job("realtime", listener=EventPublisher().publish)`
+    forwards a standalone script's events. Only EVENT_TYPES are sent; when no bot is listening the
+    events are dropped and the connection is retried every RECONNECT_INTERVAL seconds.
+    """
+
+    def __init__(self, path=SOCKET_PATH, types=EVENT_TYPES):
+        self.path = path
+        self.types = set(types)
+        self.sock = None
+        self.retry_at = 0
+        self.lock = threading.Lock()  # jobs report from their own thread and from the sheet queue's
+
+    def publish(self, event):
+        if event.get("stage") not in self.types:
+            return
+        data = (json.dumps(event, default=str) + "\n").encode("utf-8")
+        with self.lock:
+            if self.sock is None and not self.connect():
+                return
+            try:
+                self.sock.sendall(data)
+            except OSError as e:
+                log.debug(f"Event bus send failed: {e}")
+                self.disconnect()
+
+    def connect(self):
+        now = time.monotonic()
+        if now < self.retry_at:
+            return False
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        except (AttributeError, OSError):
+            # No Unix sockets on this platform; never try again
+            self.retry_at = float("inf")
+            return False
+        sock.settimeout(SEND_TIMEOUT)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            self.retry_at = now + RECONNECT_INTERVAL
+            return False
+        self.sock = sock
+        return True
+
+    def disconnect(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+        self.retry_at = time.monotonic() + RECONNECT_INTERVAL
+
+    def close(self):
+        with self.lock:
+            self.disconnect()
+
+
+class EventBus:
+    """ Bot side of the event bus: a Unix socket server that hands every script event to subscribers.
+
+    Subscribers are called on the event loop with the event dict, plain or async.
+    """
+
+    def __init__(self, path=SOCKET_PATH):
+        self.path = path
+        self.subscribers = []
+        self.server = None
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    async def start(self):
+        if not hasattr(socket, "AF_UNIX"):
+            log.warning("Unix sockets are not available; the event bus is disabled.")
+            return
+        if os.path.exists(self.path):
+            # Left over from a previous run that did not shut down cleanly
+            os.remove(self.path)
+        self.server = await asyncio.start_unix_server(self.handle, path=self.path, limit=MAX_EVENT_BYTES)
+        log.info(f"Event bus listening on {self.path}")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    log.warning("Dropped a malformed event bus message.")
+                    continue
+                if isinstance(event, dict) and event.get("stage") in EVENT_TYPES:
+                    await self.dispatch(event)
+        except (ConnectionError, ValueError) as e:
+            # ValueError: a line longer than MAX_EVENT_BYTES
+            log.warning(f"Event bus connection closed: {e}")
+        finally:
+            writer.close()
+
+    async def dispatch(self, event):
+        for callback in self.subscribers:
+            try:
+                result = callback(event)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                log.warning(f"Event bus subscriber failed: {e}")
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
@@ -0,0 +1,280 @@
+import copy
+import glob
+import os
+import random
+from collections import Counter
+
+from lxml import etree, html as lxml_html
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+from selenium.webdriver.common.by import By
+
+from match_source import ordinal
+from opgg_parser import GAME_MODE_LABEL, TEAM_BLOCKS, element_text
+from waits import EXPAND_GAMES_SCRIPT, EXPANDED_GAMES_SCRIPT, MATCH_HISTORY_INDEX, NEWEST_GAME_HEADER_SCRIPT
+
+
+PLAYERS_PER_TEAM = 4
+
+
+def player_name(team_number, slot):
+    return f"Player {team_number}-{slot}"
+
+
+def synthetic_game_html(match_id, team_count, time_label="2 minutes ago", custom=True, seed=None):
+    """ Expanded op.gg game block for a lobby of `team_count` teams, shaped like the real markup.
+
+    Placements are shuffled with `seed`; players are named 'Player <team>-<slot>' so a matching
+    teams.json can be generated with synthetic_teams().
+    """
+    rng = random.Random(match_id if seed is None else seed)
+    placements = list(range(1, team_count + 1))
+    rng.shuffle(placements)
+
+    team_blocks = []
+    for team_number, placement in enumerate(placements, start=1):
+        rows = []
+        for slot in range(1, PLAYERS_PER_TEAM + 1):
+            kills, deaths, assists = rng.randint(0, 9), rng.randint(0, 6), rng.randint(0, 12)
+            rows.append(
+                '<div class="flex items-center justify-between rounded w-full">'
+                f'<div class="cursor-help">{player_name(team_number, slot)}</div>'
+                '<div class="grid grid-cols-4 gap-1 text-[11px]">'
+                f'<div class="flex flex-col items-center w-[50px]"><div class="font-medium">{kills} / {deaths} / {assists}</div><div>KDA</div></div>'
+                f'<div class="flex flex-col items-center w-[50px]"><div class="font-medium">{rng.randint(1000, 40000):,}</div><div>DMG</div></div>'
+                '</div></div>'
+            )
+        team_blocks.append(
+            '<div class="rounded border border-opacity-50 p-2">'
+            f'<div class="flex items-center gap-2"><div class="font-bold">{ordinal(placement)}</div>'
+            f'<div class="text-muted-foreground">Team #{team_number}</div></div>'
+            + "".join(rows) + '</div>'
+        )
+
+    mode = "Custom Game" if custom else "Ranked"
+    return (
+        '<div class="rounded-lg border bg-card">'
+        '<div class="flex justify-between">'
+        f'<div class="text-xs font-bold text-red-500">{mode}</div>'
+        f'<div class="text-muted-foreground">{time_label}</div>'
+        f'<span>Match {match_id}</span><span>{team_count} teams</span>'
+        '<button class="flex items-center">Details</button>'
+        '</div>'
+        f'<div class="space-y-1">{"".join(team_blocks)}</div>'
+        '</div>'
+    )
+
+
+def synthetic_teams(team_count):
+    """ teams.json entries registering every synthetic player, captain first. """
+    return {
+        f"T{team_number}": {
+            "enabled": True,
+            "players": {player_name(team_number, slot): "" for slot in range(1, PLAYERS_PER_TEAM + 1)},
+            "captain": player_name(team_number, 1),
+        }
+        for team_number in range(1, team_count + 1)
+    }
+
+
+def load_fixture_games(directory):
+    """ Recorded expanded game blocks (saved outerHTML, one *.html file per game), newest first by file name. """
+    games = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, "r", encoding="utf-8") as file:
+            games.append(file.read())
+    return games
+
+
+def fixture_copy(game_html, number):
+    """ A recorded game block relabeled as replay `number`, so repeating a fixture yields a new game key. """
+    game = lxml_html.fromstring(game_html)
+    label = etree.SubElement(GAME_MODE_LABEL(game)[0].getparent(), "span")
+    label.text = f"Replay {number}"
+    return etree.tostring(game, encoding="unicode", method="html")
+
+
+def profile_page_html():
+    # The match history is the MATCH_HISTORY_INDEX-th "space-y-2" container, like on the real page
+    fillers = '<div class="space-y-2"></div>' * MATCH_HISTORY_INDEX
+    return (
+        '<html><body>'
+        '<button class="btn">Fetch New Matches</button>'
+        f'{fillers}<div class="space-y-2" id="history"></div>'
+        '</body></html>'
+    )
+
+
+class FakeElement:
+    """ WebElement stand-in backed by an lxml element; every call counts as one WebDriver round trip. """
+
+    def __init__(self, driver, element):
+        self.driver = driver
+        self.element = element
+
+    def command(self, name):
+        self.driver.command(name)
+        if self.element.getroottree().getroot() is not self.driver.root:
+            raise StaleElementReferenceException(f"stale element in {name}")
+
+    def find_elements(self, by=By.XPATH, value=None):
+        self.command("find_elements")
+        return self.driver.wrap(find_in(self.element, by, value))
+
+    def find_element(self, by=By.XPATH, value=None):
+        self.command("find_element")
+        found = find_in(self.element, by, value)
+        if not found:
+            raise NoSuchElementException(f"{by}={value}")
+        return FakeElement(self.driver, found[0])
+
+    def get_attribute(self, name):
+        self.command("get_attribute")
+        if name == "outerHTML":
+            return etree.tostring(self.element, encoding="unicode", method="html")
+        if name == "innerHTML":
+            return "".join(etree.tostring(child, encoding="unicode", method="html") for child in self.element)
+        return self.element.get(name)
+
+    @property
+    def text(self):
+        self.command("text")
+        return element_text(self.element)
+
+    def is_enabled(self):
+        self.command("is_enabled")
+        return True
+
+    def click(self):
+        self.command("click")
+        self.driver.click(self.element)
+
+
+def find_in(element, by, value):
+    if by == By.XPATH:
+        return element.xpath(value)
+    if by == By.CLASS_NAME:
+        return element.xpath(f".//*[contains(concat(' ', normalize-space(@class), ' '), ' {value} ')]")
+    raise NotImplementedError(f"FakeDriver does not support locating by {by}")
+
+
+class FakeDriver:
+    """ Offline WebDriver serving an op.gg profile page built from expanded game block HTML.
+
+    Games render collapsed; clicking a game's dropdown (or the batch expand script) fills its team
+    blocks in, and 'Fetch New Matches' re-renders the list, which makes old elements stale like in
+    Chrome. With `fetch_delay`, that re-render lands only after that many more commands, like the
+    page's asynchronous refresh. `round_trips` counts every WebDriver command by name.
+    """
+
+    def __init__(self, games=(), fetch_delay=0):
+        self.games = list(games)  # expanded game HTML, newest first
+        self.fetch_delay = fetch_delay
+        self.render_due = None  # command count at which a pending fetch re-renders the list
+        self.rendered_games = []  # the games the current page was rendered from
+        self.round_trips = Counter()
+        self.root = None
+        self.history = None
+        self.current_url = None
+
+    @property
+    def commands(self):
+        return sum(self.round_trips.values())
+
+    def command(self, name):
+        if self.render_due is not None and self.commands >= self.render_due:
+            self.render_due = None
+            self.render()
+        self.round_trips[name] += 1
+
+    def fetch(self):
+        if self.fetch_delay:
+            # Clicking again while a refresh is pending does not restart it
+            if self.render_due is None:
+                self.render_due = self.commands + self.fetch_delay
+        else:
+            self.render()
+
+    def wrap(self, elements):
+        return [FakeElement(self, element) for element in elements]
+
+    def publish(self, game_html):
+        """ A game just finished: it shows up first in the list after the next load or fetch. """
+        self.games.insert(0, game_html)
+
+    def render(self):
+        self.root = lxml_html.fromstring(profile_page_html())
+        self.history = self.root.get_element_by_id("history")
+        self.rendered_games = list(self.games)
+        for game_html in self.rendered_games:
+            game = lxml_html.fromstring(game_html)
+            for team in TEAM_BLOCKS(game):
+                team.drop_tree()
+            self.history.append(game)
+
+    def expand(self, index):
+        games = list(self.history)
+        if index >= len(games) or TEAM_BLOCKS(games[index]):
+            return
+        # Swap in the expanded markup without replacing the game element, so references stay valid
+        game = games[index]
+        expanded = lxml_html.fromstring(self.rendered_games[index])
+        for child in list(game):
+            game.remove(child)
+        for child in expanded:
+            game.append(copy.deepcopy(child))
+
+    def click(self, element):
+        if "Fetch New Matches" in element_text(element):
+            self.fetch()
+            return
+        games = list(self.history)
+        node = element
+        while node is not None and node.getparent() is not self.history:
+            node = node.getparent()
+        if node is not None:
+            self.expand(games.index(node))
+
+    def get(self, url):
+        self.command("get")
+        self.current_url = url
+        self.render()
+
+    def find_elements(self, by=By.XPATH, value=None):
+        self.command("find_elements")
+        return self.wrap(find_in(self.root, by, value))
+
+    def find_element(self, by=By.XPATH, value=None):
+        self.command("find_element")
+        found = find_in(self.root, by, value)
+        if not found:
+            raise NoSuchElementException(f"{by}={value}")
+        return FakeElement(self, found[0])
+
+    def execute_script(self, script, *args):
+        self.command("execute_script")
+        if script == EXPAND_GAMES_SCRIPT:
+            for index in args[1]:
+                self.expand(index)
+            return None
+        if script == EXPANDED_GAMES_SCRIPT:
+            games = list(self.history)
+            return [index < len(games) and bool(TEAM_BLOCKS(games[index])) for index in args[1]]
+        if script == NEWEST_GAME_HEADER_SCRIPT:
+            if self.history is None or not len(self.history):
+                return None
+            header = copy.deepcopy(self.history[0])
+            for team in TEAM_BLOCKS(header):
+                team.drop_tree()
+            header_html = etree.tostring(header, encoding="unicode", method="html")
+            if args[3] is not None and header_html == args[3]:
+                self.fetch()
+            return header_html
+        raise NotImplementedError("FakeDriver only runs the scripts in waits.py")
+
+    @property
+    def page_source(self):
+        self.command("page_source")
+        return etree.tostring(self.root, encoding="unicode", method="html")
+
+    def quit(self):
+        pass
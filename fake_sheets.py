@@ -0,0 +1,216 @@
+import re
+import threading
+import time
+from collections import Counter
+
+from scoreboard import column_number
+
+
+A1_PATTERN = re.compile(r"^(?:'?(?P<sheet>[^!']+)'?!)?(?P<col1>[A-Z]*)(?P<row1>\d*)(?::(?P<col2>[A-Z]*)(?P<row2>\d*))?$")
+
+
+def parse_range(a1_range):
+    """ (first_row, first_col, last_row, last_col) of an A1 range; open ends are None. """
+    match = A1_PATTERN.match(a1_range.upper())
+    if not match:
+        raise ValueError(f"Bad A1 range: {a1_range}")
+    col1 = column_number(match["col1"]) if match["col1"] else None
+    row1 = int(match["row1"]) if match["row1"] else None
+    if match["col2"] is None and match["row2"] is None:
+        return row1, col1, row1, col1
+    col2 = column_number(match["col2"]) if match["col2"] else None
+    row2 = int(match["row2"]) if match["row2"] else None
+    return row1, col1, row2, col2
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeAPIError(Exception):
+    """ Looks like gspread.exceptions.APIError to code that inspects error.response.status_code. """
+
+    def __init__(self, status_code, message="fake Sheets API error"):
+        super().__init__(f"{status_code}: {message}")
+        self.response = FakeResponse(status_code)
+
+
+class FakeWorksheet:
+    """ In-memory stand-in for a gspread Worksheet that counts API calls, for offline runs.
+
+    Supports the calls this repo makes (update, batch_update, col_values, batch_get,
+    get_all_values, add_cols, add_rows), optional per-call latency and injected 429/5xx failures.
+    Reads and writes past the grid fail with a 400 like the real API, leaving the sheet untouched.
+    """
+
+    def __init__(self, title="Sheet1", latency=0.0, sheet_id=0, rows=1000, cols=26):
+        self.title = title
+        self.id = sheet_id
+        self.latency = latency
+        self.row_count = rows
+        self.col_count = cols
+        self.cells = {}  # (row, col) -> value, 1-based like A1 notation
+        self.calls = Counter()
+        self.failures = []
+        self.lock = threading.Lock()
+
+    @property
+    def api_calls(self):
+        return sum(self.calls.values())
+
+    def fail_next(self, status_code=429, times=1):
+        """ Make the next `times` API calls raise a FakeAPIError with `status_code`. """
+        with self.lock:
+            self.failures.extend([status_code] * times)
+
+    def call(self, name):
+        with self.lock:
+            self.calls[name] += 1
+            failure = self.failures.pop(0) if self.failures else None
+        if self.latency:
+            time.sleep(self.latency)
+        if failure is not None:
+            raise FakeAPIError(failure)
+
+    def check_grid(self, a1_range, values):
+        row1, col1, _, _ = parse_range(a1_range)
+        last_row = row1 + len(values) - 1
+        last_col = col1 + max((len(row) for row in values), default=1) - 1
+        if last_row > self.row_count or last_col > self.col_count:
+            raise FakeAPIError(400, f"Range ({self.title}!{a1_range}) exceeds grid limits. "
+                                    f"Max rows: {self.row_count}, max columns: {self.col_count}")
+
+    def check_read(self, a1_range):
+        _, _, last_row, last_col = parse_range(a1_range)
+        if (last_row or 0) > self.row_count or (last_col or 0) > self.col_count:
+            raise FakeAPIError(400, f"Range ({self.title}!{a1_range}) exceeds grid limits. "
+                                    f"Max rows: {self.row_count}, max columns: {self.col_count}")
+
+    def write_values(self, a1_range, values):
+        row1, col1, _, _ = parse_range(a1_range)
+        with self.lock:
+            for row_offset, row_values in enumerate(values):
+                for col_offset, value in enumerate(row_values):
+                    self.cells[(row1 + row_offset, col1 + col_offset)] = value
+
+    def read_values(self, a1_range):
+        row1, col1, row2, col2 = parse_range(a1_range)
+        with self.lock:
+            if not self.cells:
+                return []
+            max_row = max(row for row, _ in self.cells)
+            max_col = max(col for _, col in self.cells)
+            row1, col1 = row1 or 1, col1 or 1
+            # Anything past the last written cell would be trimmed away anyway
+            row2, col2 = min(row2 or max_row, max_row), min(col2 or max_col, max_col)
+            rows = [[self.cells.get((row, col), "") for col in range(col1, col2 + 1)] for row in range(row1, row2 + 1)]
+        # The Sheets API trims trailing empty cells and rows
+        rows = [self.trim(row) for row in rows]
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    @staticmethod
+    def trim(row):
+        row = list(row)
+        while row and row[-1] == "":
+            row.pop()
+        return row
+
+    def update(self, range_name, values=None, **kwargs):
+        if isinstance(range_name, list):  # gspread 6 takes (values, range_name)
+            range_name, values = values, range_name
+        self.call("update")
+        self.check_grid(range_name, values)
+        self.write_values(range_name, values)
+
+    def batch_update(self, data, **kwargs):
+        self.call("batch_update")
+        for update in data:
+            self.check_grid(update["range"], update["values"])
+        for update in data:
+            self.write_values(update["range"], update["values"])
+
+    def add_cols(self, cols):
+        self.call("add_cols")
+        self.col_count += cols
+
+    def add_rows(self, rows):
+        self.call("add_rows")
+        self.row_count += rows
+
+    def col_values(self, col):
+        self.call("col_values")
+        with self.lock:
+            if not self.cells:
+                return []
+            max_row = max(row for row, _ in self.cells)
+            return self.trim(self.cells.get((row, col), "") for row in range(1, max_row + 1))
+
+    def batch_get(self, ranges, **kwargs):
+        self.call("batch_get")
+        for a1_range in ranges:
+            self.check_read(a1_range)
+        return [self.read_values(a1_range) for a1_range in ranges]
+
+    def get_all_values(self):
+        self.call("get_all_values")
+        return self.read_values("A:ZZZ")
+
+
+class FakeSpreadsheet:
+    """ In-memory stand-in for a gspread Spreadsheet holding FakeWorksheets. """
+
+    def __init__(self, titles=("Sheet1",), latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.tabs = []
+        self.hidden = set()
+        for title in titles:
+            self.add_worksheet(title)
+        self.calls.clear()
+
+    @property
+    def sheet1(self):
+        return self.tabs[0]
+
+    def worksheets(self):
+        self.calls["worksheets"] += 1
+        return list(self.tabs)
+
+    def worksheet(self, title):
+        self.calls["worksheet"] += 1
+        for worksheet in self.tabs:
+            if worksheet.title == title:
+                return worksheet
+        raise KeyError(title)
+
+    def add_worksheet(self, title, rows=100, cols=26, index=None):
+        self.calls["add_worksheet"] += 1
+        worksheet = FakeWorksheet(title, latency=self.latency, sheet_id=max((ws.id for ws in self.tabs), default=-1) + 1,
+                                  rows=rows, cols=cols)
+        self.tabs.insert(len(self.tabs) if index is None else index, worksheet)
+        return worksheet
+
+    def duplicate_sheet(self, source_sheet_id, insert_sheet_index=None, new_sheet_name=None, **kwargs):
+        source = next(ws for ws in self.tabs if ws.id == source_sheet_id)
+        worksheet = self.add_worksheet(new_sheet_name or f"Copy of {source.title}", rows=source.row_count,
+                                       cols=source.col_count, index=insert_sheet_index)
+        worksheet.cells = dict(source.cells)
+        return worksheet
+
+    def batch_update(self, body):
+        self.calls["batch_update"] += 1
+        for request in body.get("requests", []):
+            properties = request.get("updateSheetProperties", {}).get("properties")
+            if not properties:
+                continue
+            worksheet = next(ws for ws in self.tabs if ws.id == properties["sheetId"])
+            if "title" in properties:
+                worksheet.title = properties["title"]
+            if properties.get("hidden"):
+                self.hidden.add(worksheet.id)
+            if "index" in properties:
+                self.tabs.remove(worksheet)
+                self.tabs.insert(min(properties["index"], len(self.tabs)), worksheet)
@@ -0,0 +1,175 @@
+import asyncio
+import functools
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import get_logger
+
+
+MAX_WORKERS = 4  # threads shared by every job; Chrome sessions are capped separately by the browser pool
+JOB_LIMITS = {"realtime": 1, "batch": 1, "results": 2}  # concurrent jobs per kind, others default to 1
+EVENT_HISTORY = 20  # progress events kept per job
+JOB_HISTORY = 50  # finished jobs kept for lookups
+
+ACTIVE_STATUSES = ("queued", "running")
+
+job_numbers = itertools.count(1)
+
+log = get_logger("jobs")
+
+
+class JobCancelled(Exception):
+    """ Raised inside a job's worker thread once the job has been asked to stop. """
+
+
+class Job:
+    """ Handle for one piece of background work: its status, progress events and stop flag.
+
+    The worker function receives the job as `job=` and calls `job.report(stage, **details)` for
+    progress and `job.sleep(seconds)` / `job.check()` at safe points, which raise JobCancelled
+    after cancel(). Scripts run from the command line use a standalone Job with no listener.
+    """
+
+    def __init__(self, kind, listener=None):
+        self.id = f"{kind}-{next(job_numbers)}"
+        self.kind = kind
+        self.status = "queued"
+        self.events = deque(maxlen=EVENT_HISTORY)
+        self.listener = listener
+        self.stop_event = threading.Event()
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.task = None
+
+    def report(self, stage, **details):
+        event = {"job": self.id, "kind": self.kind, "stage": stage, "time": time.time(), **details}
+        self.events.append(event)
+        if self.listener:
+            self.listener(event)
+        return event
+
+    @property
+    def latest(self):
+        return self.events[-1] if self.events else None
+
+    @property
+    def cancelled(self):
+        return self.stop_event.is_set()
+
+    def cancel(self):
+        self.stop_event.set()
+
+    def check(self):
+        if self.stop_event.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled.")
+
+    def sleep(self, seconds):
+        """ time.sleep() that wakes up as soon as the job is cancelled. """
+        if self.stop_event.wait(seconds):
+            raise JobCancelled(f"Job {self.id} was cancelled.")
+
+
+class JobRunner:
+    """ Runs blocking jobs from the bot's event loop on a shared thread pool.
+
+    start() returns a Job handle immediately; jobs of the same kind queue behind a per-kind
+    limit, cancel() is a flag flip on the handle, and progress events are delivered on the
+    event loop to the job's own callback and to every subscriber.
+    """
+
+    def __init__(self, limits=JOB_LIMITS, max_workers=MAX_WORKERS):
+        self.limits = dict(limits)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.semaphores = {}
+        self.jobs = {}  # job id -> Job, oldest first
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        """ Call `callback(event)` (plain or async) on the event loop for every job's progress events. """
+        self.subscribers.append(callback)
+
+    def semaphore(self, kind):
+        if kind not in self.semaphores:
+            self.semaphores[kind] = asyncio.Semaphore(self.limits.get(kind, 1))
+        return self.semaphores[kind]
+
+    def start(self, kind, func, *args, on_event=None, **kwargs):
+        """ Schedule `func(*args, job=job, **kwargs)` on the thread pool and return its Job. """
+        loop = asyncio.get_running_loop()
+        callbacks = self.subscribers + ([on_event] if on_event else [])
+
+        def deliver(event):
+            for callback in callbacks:
+                try:
+                    result = callback(event)
+                    if asyncio.iscoroutine(result):
+                        loop.create_task(result)
+                except Exception as e:
+                    log.warning(f"Job event callback failed: {e}")
+
+        # Events are reported from worker threads; hand them over to the loop
+        job = Job(kind, listener=lambda event: loop.call_soon_threadsafe(deliver, event))
+        self.jobs[job.id] = job
+        self.prune()
+        job.task = loop.create_task(self.execute(job, functools.partial(func, *args, job=job, **kwargs)))
+        return job
+
+    async def run(self, kind, func, *args, **kwargs):
+        """ start() and wait for the job; returns its result or raises its error. """
+        job = self.start(kind, func, *args, **kwargs)
+        await asyncio.shield(job.task)
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    async def execute(self, job, call):
+        loop = asyncio.get_running_loop()
+        try:
+            async with self.semaphore(job.kind):
+                job.check()
+                job.status = "running"
+                job.report("started")
+                job.result = await loop.run_in_executor(self.executor, call)
+            job.status = "done"
+            job.report("finished")
+        except (JobCancelled, asyncio.CancelledError):
+            job.cancel()
+            job.status = "cancelled"
+            job.report("cancelled")
+        except Exception as e:
+            job.status = "failed"
+            job.error = e
+            job.report("failed", error=str(e))
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def active(self, kind=None):
+        return [job for job in self.jobs.values() if job.status in ACTIVE_STATUSES and (kind is None or job.kind == kind)]
+
+    def cancel(self, job_id):
+        """ Ask a job to stop. Queued jobs never start; running ones stop at their next check. """
+        job = self.jobs.get(job_id)
+        if job is None or job.status not in ACTIVE_STATUSES:
+            return False
+        job.cancel()
+        if job.status == "queued":
+            job.task.cancel()
+        return True
+
+    def prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status not in ACTIVE_STATUSES]
+        for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self.jobs[job_id]
+
+    def shutdown(self):
+        for job in self.active():
+            job.cancel()
+        self.executor.shutdown(wait=False)
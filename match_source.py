@@ -0,0 +1,416 @@
+import hashlib
+import json
+import os
+import queue
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from lxml import html as lxml_html
+
+from metrics import get_logger
+from opgg_parser import parse_game, parse_game_header, parse_match_history
+
+
+DEFAULT_PROFILE_URL = "https://supervive.op.gg/players/steam-LilMeap%230001" # OP.GG of user in the games
+SPARE_BROWSER_TIMEOUT = 1  # seconds to wait for an idle pooled browser before reading on fewer lanes
+
+log = get_logger("source")
+
+# Relative ages change as a game gets older ('a few seconds ago', 'a minute ago', '2 days ago'),
+# so every form is stripped before hashing a game header
+TIMESTAMP_PATTERN = r"\b(?:\d+|an?|a few)\s+(?:second|minute|hour|day|week|month|year)s?\s+ago\b"
+
+
+def generate_game_key(game_text):
+    """Generate a unique key for the game based on its details, excluding timestamps."""
+
+    cleaned_text = " ".join(re.sub(TIMESTAMP_PATTERN, "", game_text, flags=re.IGNORECASE).split())
+    return hashlib.md5(cleaned_text.encode()).hexdigest()
+
+
+def lobby_key(teams_data):
+    """ Fingerprint of a finished lobby from its results, the same on every player's profile.
+
+    Game headers differ between profiles (they show that player's own stats), so games seen by
+    different observers are matched on placements, team kills and rosters instead. Kills keep two
+    games of the same teams finishing in the same order apart.
+    """
+    teams = sorted(
+        f"{data['placement']}:{data.get('kills', 0)}:{','.join(sorted(player.casefold() for player in data['players']))}"
+        for data in teams_data.values()
+    )
+    return hashlib.md5("|".join(teams).encode()).hexdigest()
+
+
+def ordinal(number):
+    """ 1 -> '1st', 2 -> '2nd', 11 -> '11th', matching the placement text shown on op.gg. """
+    if 10 <= number % 100 <= 20:
+        suffix = "th"
+    else:
+        suffix = {1: "st", 2: "nd", 3: "rd"}.get(number % 10, "th")
+    return f"{number}{suffix}"
+
+
+def placement_number(placement):
+    """ '3rd' / '3rd Place' / 3 -> 3, or None when there is no number in it. """
+    match = re.search(r"\d+", str(placement))
+    return int(match.group()) if match else None
+
+
+def make_match_record(header, teams_data, is_custom=True, time_label=""):
+    """ The normalized match record every MatchSource returns.
+
+    `teams` has the same shape extract_team_data always produced:
+    {"Team #N": {"placement": "1st", "kills": 7, "players": ["name", ...]}}
+    plus, when the source can pair them, "stats": [(kills, deaths, assists) or None, ...] lined up with "players".
+    """
+    return {
+        "game_key": generate_game_key(header),
+        "header": header,
+        "is_custom": is_custom,
+        "time_label": time_label,
+        "teams": teams_data,
+    }
+
+
+class MatchSource:
+    """ Where match data comes from. Implementations return normalized records, newest first.
+
+    `known(game_key)` may return an already stored record for a game; sources use it instead of
+    reading that game again, which is what lets a re-run skip everything it processed before.
+    """
+
+    def recent_matches(self, count, known=None):
+        raise NotImplementedError
+
+    def latest_match(self):
+        matches = self.recent_matches(1)
+        return matches[0] if matches else None
+
+    def close(self):
+        pass
+
+
+class SeleniumMatchSource(MatchSource):
+    """ Reads the rendered op.gg profile page with a WebDriver.
+
+    All selected games are expanded in one pass and parsed from a single snapshot of the match
+    history. Games that would not expand that way are read one by one, spread across whichever
+    browsers in `pool` are idle when one is given, and merged back in their original order.
+    """
+
+    def __init__(self, driver, profile_url=DEFAULT_PROFILE_URL, pool=None):
+        self.driver = driver
+        self.profile_url = profile_url
+        self.pool = pool
+
+    def recent_matches(self, count, known=None):
+        from waits import expand_games, match_history_block, wait_for_match_history
+
+        self.driver.get(self.profile_url)
+        past_games = wait_for_match_history(self.driver)
+        if not past_games:
+            log.warning("Could not locate the match history block or no games found.")
+            return []
+
+        count = min(count, len(past_games))
+        log.info(f"Found {len(past_games)} total games. Reading the last {count}...")
+
+        # Headers come from one snapshot of the collapsed list, so stored games are never expanded
+        history_block = match_history_block(self.driver)
+        headers = [parse_game_header(game) for game in parse_match_history(history_block.get_attribute("outerHTML"), count)]
+
+        records = [None] * len(headers)
+        wanted = []
+        for i, header in enumerate(headers):
+            stored = known(generate_game_key(header["header"])) if known else None
+            if stored is not None:
+                records[i] = stored
+            else:
+                wanted.append(i)
+
+        if len(wanted) < len(headers):
+            log.info(f"{len(headers) - len(wanted)} game(s) already stored. Scraping {len(wanted)} new game(s)...")
+        if not wanted:
+            return records
+
+        expanded = expand_games(self.driver, history_block, wanted)
+        game_elements = parse_match_history(history_block.get_attribute("outerHTML"), count)
+
+        missing = []
+        for flag, i in zip(expanded, wanted):
+            header = headers[i]
+            if flag and i < len(game_elements):
+                records[i] = make_match_record(header["header"], parse_game(game_elements[i]), header["is_custom"], header["time_label"])
+            else:
+                missing.append((i, header))
+
+        if missing:
+            log.info(f"{len(missing)} game(s) did not expand in the single pass. Reading them individually...")
+            for i, record in self.read_individually(missing):
+                records[i] = record
+
+        return [record for record in records if record is not None]
+
+    def read_individually(self, missing):
+        """ Read games one at a time, on this browser plus any pooled browsers that are idle right now, in parallel. """
+        spare = self.spare_browsers(len(missing) - 1)
+        drivers = [self.driver] + spare
+        lanes = [missing[lane::len(drivers)] for lane in range(len(drivers))]
+
+        def run_lane(lane_index, lane):
+            return self.read_games(drivers[lane_index], lane, reload=lane_index > 0)
+
+        results = []
+        try:
+            with ThreadPoolExecutor(max_workers=len(lanes)) as executor:
+                futures = [executor.submit(run_lane, lane_index, lane) for lane_index, lane in enumerate(lanes)]
+                for future in futures:
+                    try:
+                        results.extend(future.result())
+                    except Exception as e:
+                        log.error(f"Error reading games in a worker browser: {e}")
+        finally:
+            for driver in spare:
+                self.pool.release(driver)
+        return results
+
+    def spare_browsers(self, wanted):
+        """ Up to `wanted` extra browsers from the pool, never waiting on one another job is holding.
+
+        Realtime keeps its pooled browser for its whole run, so a lane that waited for a browser
+        could wait forever.
+        """
+        spare = []
+        if not self.pool:
+            return spare
+        for _ in range(min(wanted, self.pool.size - 1)):
+            try:
+                spare.append(self.pool.acquire(timeout=SPARE_BROWSER_TIMEOUT))
+            except queue.Empty:
+                break
+            except Exception as e:
+                log.warning(f"Could not start a spare browser: {e}")
+                break
+        return spare
+
+    def read_games(self, driver, wanted, reload):
+        from waits import open_game_dropdown, wait_for_match_history
+
+        if reload:
+            driver.get(self.profile_url)
+        past_games = wait_for_match_history(driver) or []
+
+        results = []
+        for i, header in wanted:
+            game = self.find_game(past_games, i, header)
+            if game is None:
+                log.warning(f"Game #{i+1} is no longer on the page. Skipping...")
+                continue
+            try:
+                if not open_game_dropdown(game):
+                    log.warning(f"Could not expand dropdown for Game {i+1}. Skipping...")
+                    continue
+                teams_data = parse_game(game.get_attribute("outerHTML"))
+                results.append((i, make_match_record(header["header"], teams_data, header["is_custom"], header["time_label"])))
+            except Exception as e:
+                log.error(f"Error reading Game #{i+1}: {e}")
+        return results
+
+    @staticmethod
+    def find_game(past_games, index, header):
+        """ The live game element at `index`, or wherever it moved if a new game was added meanwhile. """
+        wanted_key = generate_game_key(header["header"])
+        candidates = past_games[index:index + 1] + past_games[:index] + past_games[index + 1:]
+        for game in candidates:
+            if generate_game_key(parse_game_header(game.get_attribute("outerHTML"))["header"]) == wanted_key:
+                return game
+        return None
+
+
+# Field names the hydrated payload may use; the first one present wins
+MATCH_LIST_KEYS = ("matches", "match_history", "matchHistory", "games", "data")
+PARTICIPANT_KEYS = ("participants", "players", "entries")
+TEAM_KEYS = ("team_id", "teamId", "team_index", "teamIndex", "team", "squad")
+PLACEMENT_KEYS = ("placement", "team_placement", "teamPlacement", "rank", "place")
+KILLS_KEYS = ("kills", "kill", "k")
+DEATHS_KEYS = ("deaths", "death", "d")
+ASSISTS_KEYS = ("assists", "assist", "a")
+NAME_KEYS = ("player_name", "playerName", "display_name", "displayName", "nickname", "name")
+MATCH_ID_KEYS = ("match_id", "matchId", "id")
+MODE_KEYS = ("queue_id", "queueId", "game_mode", "gameMode", "mode", "match_type", "matchType")
+CREATED_KEYS = ("created_at", "createdAt", "started_at", "startedAt", "ended_at", "endedAt")
+
+
+def first_value(mapping, keys, default=None):
+    for key in keys:
+        if key in mapping and mapping[key] is not None:
+            return mapping[key]
+    return default
+
+
+def looks_like_match(candidate):
+    if not isinstance(candidate, dict):
+        return False
+    participants = first_value(candidate, PARTICIPANT_KEYS)
+    return isinstance(participants, list) and bool(participants) and all(isinstance(p, dict) for p in participants)
+
+
+def find_matches(payload):
+    """ Walk a hydrated JSON payload and return every dict that looks like a match, in page order. """
+    found = []
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if looks_like_match(node):
+            found.append(node)
+            continue
+        if isinstance(node, dict):
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return found
+
+
+def normalize_payload_match(match):
+    """ Turn one payload match into the same record the DOM scraper produces. """
+    teams_data = {}
+    for participant in first_value(match, PARTICIPANT_KEYS, []):
+        team = first_value(participant, TEAM_KEYS)
+        if isinstance(team, dict):
+            team = first_value(team, MATCH_ID_KEYS + ("number", "index"))
+        if team is None:
+            continue
+        team_number = team if str(team).startswith("Team #") else f"Team #{team}"
+
+        placement = first_value(participant, PLACEMENT_KEYS)
+        if isinstance(placement, int):
+            placement = ordinal(placement)
+
+        stats = participant.get("stats") if isinstance(participant.get("stats"), dict) else participant
+        kills = first_value(stats, KILLS_KEYS, 0)
+
+        player = participant.get("player") if isinstance(participant.get("player"), dict) else participant
+        name = first_value(player, NAME_KEYS, "")
+
+        team_data = teams_data.setdefault(team_number, {"placement": placement or "Unknown", "kills": 0, "players": [], "stats": []})
+        try:
+            team_data["kills"] += int(kills)
+        except (TypeError, ValueError):
+            pass
+        if name:
+            team_data["players"].append(str(name))
+            try:
+                team_data["stats"].append((int(kills), int(first_value(stats, DEATHS_KEYS, 0)), int(first_value(stats, ASSISTS_KEYS, 0))))
+            except (TypeError, ValueError):
+                team_data["stats"].append(None)
+
+    mode = str(first_value(match, MODE_KEYS, ""))
+    created = str(first_value(match, CREATED_KEYS, ""))
+    match_id = str(first_value(match, MATCH_ID_KEYS, ""))
+    # The payload has a stable id, so the header is built from it instead of from display text
+    header = f"{match_id} {mode}" if match_id else json.dumps(teams_data, sort_keys=True)
+    return make_match_record(header, teams_data, is_custom="custom" in mode.lower(), time_label=created)
+
+
+def extract_embedded_json(page_html):
+    """ JSON payloads the page hydrates from: the Next.js data blob and any application/json scripts. """
+    root = lxml_html.fromstring(page_html)
+    payloads = []
+    for script in root.xpath("//script[@id='__NEXT_DATA__' or @type='application/json']"):
+        try:
+            payloads.append(json.loads(script.text_content()))
+        except ValueError:
+            continue
+    return payloads
+
+
+class JsonMatchSource(MatchSource):
+    """ Reads the structured match payload behind the profile page over pooled HTTP, without rendering.
+
+    If `api_url` is given it is fetched directly (the XHR endpoint the page calls, with
+    `{profile}` filled in from the profile URL); otherwise the payload embedded in the page is used.
+    """
+
+    def __init__(self, profile_url=DEFAULT_PROFILE_URL, api_url=None, session=None, timeout=10):
+        self.profile_url = profile_url
+        self.api_url = api_url
+        self.timeout = timeout
+        self.session = session or self.build_session()
+
+    @staticmethod
+    def build_session(pool_size=8):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["User-Agent"] = "Mozilla/5.0 (supervive-scrims)"
+        return session
+
+    def fetch_payloads(self):
+        if self.api_url:
+            profile = self.profile_url.rstrip("/").rsplit("/", 1)[-1]
+            response = self.session.get(self.api_url.format(profile=profile), timeout=self.timeout)
+            response.raise_for_status()
+            return [response.json()]
+
+        response = self.session.get(self.profile_url, timeout=self.timeout)
+        response.raise_for_status()
+        return extract_embedded_json(response.text)
+
+    def recent_matches(self, count, known=None):
+        matches = []
+        for payload in self.fetch_payloads():
+            matches.extend(find_matches(payload))
+        records = [normalize_payload_match(match) for match in matches[:count]]
+        if known:
+            records = [known(record["game_key"]) or record for record in records]
+        if not records:
+            log.warning("No match payload found in the page. Falling back to the Selenium source may be needed.")
+        return records
+
+    def close(self):
+        self.session.close()
+
+
+class RecordingMatchSource(MatchSource):
+    """ Passes another source through and saves every record it returns as a local fixture. """
+
+    def __init__(self, inner, fixture_dir):
+        self.inner = inner
+        self.fixture_dir = fixture_dir
+        os.makedirs(fixture_dir, exist_ok=True)
+
+    def recent_matches(self, count, known=None):
+        matches = self.inner.recent_matches(count, known)
+        for match in matches:
+            with open(os.path.join(self.fixture_dir, f"{match['game_key']}.json"), "w", encoding="utf-8") as file:
+                json.dump(match, file, indent=4, ensure_ascii=False)
+        with open(os.path.join(self.fixture_dir, "index.json"), "w", encoding="utf-8") as file:
+            json.dump([match["game_key"] for match in matches], file, indent=4)
+        return matches
+
+    def close(self):
+        self.inner.close()
+
+
+class ReplayMatchSource(MatchSource):
+    """ Serves records saved by RecordingMatchSource, with no browser or network. """
+
+    def __init__(self, fixture_dir):
+        self.fixture_dir = fixture_dir
+
+    def recent_matches(self, count, known=None):
+        with open(os.path.join(self.fixture_dir, "index.json"), "r", encoding="utf-8") as file:
+            game_keys = json.load(file)
+
+        matches = []
+        for game_key in game_keys[:count]:
+            with open(os.path.join(self.fixture_dir, f"{game_key}.json"), "r", encoding="utf-8") as file:
+                matches.append(json.load(file))
+        return matches
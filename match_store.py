@@ -0,0 +1,281 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from match_source import lobby_key
+
+
+STORE_FILE = "matches.db"
+RECENT_KEYS_LIMIT = 500  # game keys kept in memory in front of the store
+PLAYER_STAT_COLUMNS = ("kills", "deaths", "assists")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    game_key TEXT PRIMARY KEY,
+    header TEXT NOT NULL,
+    is_custom INTEGER NOT NULL,
+    time_label TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    sheet_tab TEXT,
+    lobby_key TEXT,
+    revision INTEGER NOT NULL DEFAULT 0,
+    run_id TEXT
+);
+CREATE TABLE IF NOT EXISTS team_results (
+    game_key TEXT NOT NULL REFERENCES games(game_key),
+    team_number TEXT NOT NULL,
+    team_tag TEXT,
+    placement TEXT NOT NULL,
+    kills INTEGER NOT NULL,
+    PRIMARY KEY (game_key, team_number)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+CREATE TABLE IF NOT EXISTS player_results (
+    game_key TEXT NOT NULL REFERENCES games(game_key),
+    team_number TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    player_name TEXT NOT NULL,
+    kills INTEGER,
+    deaths INTEGER,
+    assists INTEGER,
+    PRIMARY KEY (game_key, team_number, position)
+);
+"""
+
+
+class MatchStore:
+    """ Local SQLite store of every processed game, keyed by the timestamp-free game fingerprint.
+
+    Games are saved oldest first, so rowid order is play order and recent_matches() can rebuild
+    the spreadsheet without a browser. A lobby is stored once: saving it again under another game
+    key (e.g. one hashed before time labels were stripped) moves the stored game to the new key.
+    """
+
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(games)")]
+        if "sheet_tab" not in columns:
+            # Stores created before games were tagged with the worksheet tab they were logged to
+            self.connection.execute("ALTER TABLE games ADD COLUMN sheet_tab TEXT")
+        if "lobby_key" not in columns:
+            # Stores created before lobbies were fingerprinted; old rows stay NULL
+            self.connection.execute("ALTER TABLE games ADD COLUMN lobby_key TEXT")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS games_lobby_key ON games (lobby_key)")
+        if "revision" not in columns:
+            # Stores created before saves were stamped; every old game counts as revision 0
+            self.connection.execute("ALTER TABLE games ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS games_revision ON games (revision)")
+        if "run_id" not in columns:
+            # Stores created before batch runs were told apart; old rows stay NULL
+            self.connection.execute("ALTER TABLE games ADD COLUMN run_id TEXT")
+        player_columns = [row[1] for row in self.connection.execute("PRAGMA table_info(player_results)")]
+        for column in PLAYER_STAT_COLUMNS:
+            if column not in player_columns:
+                # Stores created before per-player K/D/A was kept; old rows stay NULL
+                self.connection.execute(f"ALTER TABLE player_results ADD COLUMN {column} INTEGER")
+        self.connection.commit()
+        self.backfill_lobby_keys()
+
+    def backfill_lobby_keys(self):
+        """ Fingerprint stored games saved before lobby_key was kept, so later saves can find them. """
+        game_keys = [key for (key,) in self.connection.execute(
+            "SELECT game_key FROM games WHERE lobby_key IS NULL "
+            "AND EXISTS (SELECT 1 FROM team_results t WHERE t.game_key = games.game_key)"
+        )]
+        updates = [(lobby_key(record["teams"]), record["game_key"]) for record in map(self.get_match, game_keys)]
+        if updates:
+            with self.lock, self.connection:
+                self.connection.executemany("UPDATE games SET lobby_key = ? WHERE game_key = ?", updates)
+
+    def has_game(self, game_key):
+        with self.lock:
+            row = self.connection.execute("SELECT 1 FROM games WHERE game_key = ?", (game_key,)).fetchone()
+        return row is not None
+
+    def has_lobby(self, fingerprint):
+        """ Whether a game with this lobby_key() fingerprint is stored, whichever profile it was read from. """
+        with self.lock:
+            row = self.connection.execute("SELECT 1 FROM games WHERE lobby_key = ?", (fingerprint,)).fetchone()
+        return row is not None
+
+    def save_match(self, record, team_tags=None, sheet_tab=None, run_id=None):
+        """ Store a normalized match record with the team tags and worksheet tab it was logged under.
+
+        `run_id` tells apart batch runs that rewrite the same tab; realtime games leave it NULL.
+        """
+        team_tags = team_tags or {}
+        fingerprint = lobby_key(record["teams"]) if record["teams"] else None
+        with self.lock, self.connection:
+            if fingerprint:
+                self.rekey_lobby(fingerprint, record["game_key"])
+            self.connection.execute(
+                "INSERT OR IGNORE INTO games (game_key, header, is_custom, time_label, recorded_at, sheet_tab, lobby_key) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (record["game_key"], record["header"], int(record.get("is_custom", True)), record.get("time_label", ""), time.time(), sheet_tab, fingerprint),
+            )
+            if sheet_tab:
+                self.connection.execute("UPDATE games SET sheet_tab = ?, run_id = ? WHERE game_key = ?", (sheet_tab, run_id, record["game_key"]))
+            if fingerprint:
+                self.connection.execute("UPDATE games SET lobby_key = ? WHERE game_key = ?", (fingerprint, record["game_key"]))
+            # Bumped on every write so anything derived from the scoreboard (e.g. /results images) knows it is stale
+            self.connection.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+            # and stamped on the game, so rollups can find games saved again since they last looked
+            self.connection.execute("UPDATE games SET revision = (SELECT value FROM meta WHERE key = 'version') WHERE game_key = ?",
+                                    (record["game_key"],))
+            self.connection.execute("DELETE FROM player_results WHERE game_key = ?", (record["game_key"],))
+            for team_number, data in record["teams"].items():
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO team_results (game_key, team_number, team_tag, placement, kills) VALUES (?, ?, ?, ?, ?)",
+                    (record["game_key"], team_number, team_tags.get(team_number), data["placement"], data["kills"]),
+                )
+                stats = data.get("stats") or []
+                self.connection.executemany(
+                    "INSERT INTO player_results (game_key, team_number, position, player_name, kills, deaths, assists) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(record["game_key"], team_number, position, name, *player_kda(stats, position))
+                     for position, name in enumerate(data.get("players", []))],
+                )
+
+    def mark_run(self, game_keys, sheet_tab, run_id):
+        """ Record that stored games were written to `sheet_tab` again by run `run_id`, without re-saving them. """
+        with self.lock, self.connection:
+            self.connection.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+            self.connection.executemany(
+                "UPDATE games SET sheet_tab = ?, run_id = ?, revision = (SELECT value FROM meta WHERE key = 'version') WHERE game_key = ?",
+                [(sheet_tab, run_id, game_key) for game_key in game_keys],
+            )
+
+    def rekey_lobby(self, fingerprint, game_key):
+        # Caller holds the lock and the transaction
+        if self.connection.execute("SELECT 1 FROM games WHERE game_key = ?", (game_key,)).fetchone():
+            return
+        row = self.connection.execute("SELECT game_key FROM games WHERE lobby_key = ? ORDER BY rowid LIMIT 1", (fingerprint,)).fetchone()
+        if row is None:
+            return
+        for table in ("games", "team_results", "player_results"):
+            self.connection.execute(f"UPDATE {table} SET game_key = ? WHERE game_key = ?", (game_key, row[0]))
+
+    def version(self):
+        """ Scoreboard version; increases every time a game is written. """
+        with self.lock:
+            return self.connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def get_match(self, game_key):
+        """ The stored record for `game_key` (same shape a MatchSource returns, plus "team_tags"), or None. """
+        with self.lock:
+            game = self.connection.execute(
+                "SELECT game_key, header, is_custom, time_label FROM games WHERE game_key = ?", (game_key,)
+            ).fetchone()
+            if game is None:
+                return None
+            team_rows = self.connection.execute(
+                "SELECT team_number, team_tag, placement, kills FROM team_results WHERE game_key = ? ORDER BY rowid", (game_key,)
+            ).fetchall()
+            player_rows = self.connection.execute(
+                "SELECT team_number, player_name, kills, deaths, assists FROM player_results WHERE game_key = ? ORDER BY team_number, position",
+                (game_key,)
+            ).fetchall()
+
+        teams_data = {}
+        team_tags = {}
+        for team_number, team_tag, placement, kills in team_rows:
+            teams_data[team_number] = {"placement": placement, "kills": kills, "players": []}
+            if team_tag:
+                team_tags[team_number] = team_tag
+        for team_number, player_name, kills, deaths, assists in player_rows:
+            if team_number in teams_data:
+                teams_data[team_number]["players"].append(player_name)
+                teams_data[team_number].setdefault("stats", []).append(None if kills is None else (kills, deaths, assists))
+        for data in teams_data.values():
+            if not any(data.get("stats", [])):
+                data.pop("stats", None)
+
+        return {
+            "game_key": game[0],
+            "header": game[1],
+            "is_custom": bool(game[2]),
+            "time_label": game[3],
+            "teams": teams_data,
+            "team_tags": team_tags,
+        }
+
+    def recent_game_keys(self, count):
+        """ Keys of the `count` most recently played stored games, newest first like the op.gg list. """
+        with self.lock:
+            rows = self.connection.execute("SELECT game_key FROM games ORDER BY rowid DESC LIMIT ?", (count,)).fetchall()
+        return [row[0] for row in rows]
+
+    def recent_matches(self, count):
+        return [self.get_match(game_key) for game_key in self.recent_game_keys(count)]
+
+    def latest_tab_matches(self):
+        """ (tab title, matches oldest first) for the worksheet tab that was written to last.
+
+        When that write came from a batch run, only that run's games count; earlier runs into the
+        same tab were overwritten on the sheet.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT sheet_tab, run_id FROM games WHERE sheet_tab IS NOT NULL ORDER BY revision DESC, rowid DESC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None, []
+            game_keys = [key for (key,) in self.connection.execute(
+                "SELECT game_key FROM games WHERE sheet_tab = ? AND run_id IS ? ORDER BY rowid", row
+            )]
+        return row[0], [self.get_match(game_key) for game_key in game_keys]
+
+    def player_lines(self, since_rowid=0):
+        """ Every stored per-player line in play order, as (game rowid, game_key, sheet_tab, team_tag,
+        placement, player_name, kills, deaths, assists) tuples, for games stored after `since_rowid`.
+        """
+        with self.lock:
+            return self.connection.execute(
+                "SELECT g.rowid, g.game_key, g.sheet_tab, t.team_tag, t.placement, p.player_name, p.kills, p.deaths, p.assists "
+                "FROM player_results p "
+                "JOIN games g ON g.game_key = p.game_key "
+                "JOIN team_results t ON t.game_key = p.game_key AND t.team_number = p.team_number "
+                "WHERE g.rowid > ? ORDER BY g.rowid, p.team_number, p.position",
+                (since_rowid,)
+            ).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def player_kda(stats, position):
+    """ (kills, deaths, assists) of the player at `position`, or NULLs when the source had none. """
+    if position < len(stats) and stats[position]:
+        return tuple(stats[position])
+    return (None, None, None)
+
+
+class RecentKeys:
+    """ Bounded set of recently seen game keys; the least recently added are forgotten first. """
+
+    def __init__(self, limit=RECENT_KEYS_LIMIT):
+        self.limit = limit
+        self.keys = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key):
+        self.keys[key] = None
+        self.keys.move_to_end(key)
+        while len(self.keys) > self.limit:
+            self.keys.popitem(last=False)
+
+    def clear(self):
+        self.keys.clear()
@@ -0,0 +1,109 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+LOG_LEVEL = os.environ.get("SCRIMS_LOG_LEVEL", "INFO")  # DEBUG turns the per-player / per-cell lines back on
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)  # seconds
+
+DESCRIPTIONS = {
+    "scrims_stage_seconds": "Time spent per processing stage.",
+    "scrims_game_to_sheet_seconds": "Time from a game finishing on op.gg to its results reaching the sheet.",
+    "scrims_sheets_api_seconds": "Latency of Google Sheets API calls.",
+    "scrims_sheets_api_calls_total": "Google Sheets API calls made.",
+    "scrims_sheets_api_retries_total": "Google Sheets API calls retried after a retryable error.",
+    "scrims_sheets_api_errors_total": "Google Sheets API calls that failed for good.",
+    "scrims_sheet_cells_written_total": "Cell or block updates sent to the sheet.",
+    "scrims_games_processed_total": "Games scraped and recorded.",
+    "scrims_polls_total": "Match history polls by outcome.",
+}
+
+
+def configure_logging(level=LOG_LEVEL):
+    """ Leveled logging for the scripts and the bot; safe to call more than once. """
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+
+
+def get_logger(name):
+    return logging.getLogger(f"scrims.{name}")
+
+
+def label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Metrics:
+    """ Thread-safe counters and histograms, rendered in the Prometheus text format. """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.counters = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., count, sum]
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[index] += 1
+            histogram[-2] += 1
+            histogram[-1] += value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def stage(self, stage):
+        """ `with metrics.stage("extract"):` times one processing stage. """
+        return self.timer("scrims_stage_seconds", stage=stage)
+
+    def render(self):
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, list(values)) for key, values in self.histograms.items())
+
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {DESCRIPTIONS.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{name}{label_text(labels)} {value}")
+
+        for (name, labels), values in histograms:
+            describe(name, "histogram")
+            for bound, count in zip(self.buckets, values):
+                lines.append(f"{name}_bucket{label_text(labels + (('le', str(bound)),))} {count}")
+            lines.append(f"{name}_bucket{label_text(labels + (('le', '+Inf'),))} {values[-2]}")
+            lines.append(f"{name}_count{label_text(labels)} {values[-2]}")
+            lines.append(f"{name}_sum{label_text(labels)} {values[-1]:.6f}")
+
+        return "\n".join(lines) + "\n"
+
+
+# One registry per process; the bot serves it at /metrics
+metrics = Metrics()
@@ -0,0 +1,339 @@
+import asyncio
+import re
+import time
+from urllib.parse import unquote, urlsplit
+
+from selenium.common.exceptions import WebDriverException
+
+from match_source import DEFAULT_PROFILE_URL, SeleniumMatchSource, generate_game_key, lobby_key, make_match_record
+from match_store import RecentKeys
+from metrics import get_logger, metrics
+from opgg_parser import parse_game_header
+from team_index import PLAYERS_FILE, TEAM_FILE, load_json, player_key
+from waits import Backoff, expand_game, newest_game_header, wait_for_match_history
+
+
+log = get_logger("observers")
+
+MAX_OBSERVERS = 4  # each observer keeps its own headless browser open
+POLL_INTERVAL = 5  # seconds between polls of one observer's profile
+MAX_POLL_DELAY = 60  # backoff ceiling for an observer whose browser keeps failing
+HOST_REQUESTS_PER_SECOND = 2  # page loads + polls per host, across every observer
+PAGE_RELOAD_INTERVAL = 600  # seconds between full reloads of a profile page while polling
+MAX_GAME_AGE_MINUTES = 5  # older games found on startup are skipped instead of recorded
+MAX_EXPAND_SECONDS = 60  # a new game whose dropdown will not open by then is left for the next poll
+STOP_CHECK_INTERVAL = 0.5
+
+
+def is_recent(time_label):
+    """ Whether op.gg's relative time label ('3 minutes ago', '2 hours ago') is within MAX_GAME_AGE_MINUTES. """
+    if "hour" in time_label or "day" in time_label:
+        return False
+    if "minute" in time_label:
+        match = re.search(r"(\d+)", time_label)
+        if match and int(match.group(1)) > MAX_GAME_AGE_MINUTES:
+            return False
+    return True
+
+
+def profile_name(url):
+    """ 'https://supervive.op.gg/players/steam-Tom%20Kick%23TTV' -> 'Tom Kick#TTV', for log lines. """
+    name = unquote(url.rstrip("/").rsplit("/", 1)[-1])
+    return name[len("steam-"):] if name.startswith("steam-") else name
+
+
+def observer_profiles(spec="auto", limit=MAX_OBSERVERS, team_file=TEAM_FILE, players_file=PLAYERS_FILE):
+    """ Profile URLs to watch.
+
+    `spec` is a comma separated list of players.json names or op.gg URLs, or "auto" for the
+    default profile plus the captain (or first listed player) of every enabled team.
+    """
+    players = load_json(players_file)
+    urls_by_key = {player_key(name): url for name, url in players.items() if url}
+
+    def resolve(entry):
+        if "/players/" in entry:
+            return entry
+        return urls_by_key.get(player_key(entry))
+
+    if spec and spec != "auto":
+        candidates = []
+        for entry in spec.split(","):
+            url = resolve(entry.strip()) if entry.strip() else None
+            if url:
+                candidates.append(url)
+            elif entry.strip():
+                log.warning(f"No op.gg profile found for observer '{entry.strip()}'. Skipping it.")
+    else:
+        candidates = [DEFAULT_PROFILE_URL]
+        for team_info in load_json(team_file).values():
+            if not team_info.get("enabled", True):
+                continue
+            roster = team_info.get("players", [])
+            entries = [url or name for name, url in roster.items()] if isinstance(roster, dict) else list(roster)
+            captain = team_info.get("captain")
+            if captain:
+                captain_url = roster.get(captain) if isinstance(roster, dict) else None
+                entries.insert(0, captain_url or captain)
+            for entry in entries:
+                url = resolve(entry) if entry else None
+                if url:
+                    candidates.append(url)
+                    break
+
+    urls, keys = [], set()
+    for url in candidates:
+        key = player_key(url)
+        if key not in keys:
+            keys.add(key)
+            urls.append(url)
+    return urls[:limit]
+
+
+class HostRateLimiter:
+    """ Spaces out requests to the same host, however many observers are polling it.
+
+    Only used from the event loop, so reserving a slot needs no lock.
+    """
+
+    def __init__(self, requests_per_second=HOST_REQUESTS_PER_SECOND):
+        self.interval = 1 / requests_per_second
+        self.next_slot = {}  # host -> monotonic time of its next free slot
+
+    async def wait(self, url):
+        host = urlsplit(url).netloc
+        now = time.monotonic()
+        slot = max(now, self.next_slot.get(host, now))
+        self.next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class ProfileObserver:
+    """ Watches one op.gg profile page for newly finished Custom Games with one browser.
+
+    An idle poll is one small script call that fingerprints the newest game header and fetches new
+    matches when it has not changed; the page is only reloaded periodically or after an error, and a
+    game is only expanded when its key is new.
+    """
+
+    def __init__(self, url=DEFAULT_PROFILE_URL, driver=None):
+        self.url = url
+        self.name = profile_name(url)
+        self.driver = driver
+        self.loaded_at = None
+        self.last_header = None  # newest header of the previous poll; fetching waits until it repeats
+        self.seen = RecentKeys()  # header keys already judged on this profile (recorded, not custom, too old)
+
+    def attach(self, driver):
+        """ Watch with another browser; the profile page is loaded on the next poll. """
+        self.driver = driver
+        self.loaded_at = None
+        self.last_header = None
+
+    def needs_reload(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > PAGE_RELOAD_INTERVAL
+
+    def load(self):
+        with metrics.stage("page_load"):
+            self.driver.get(self.url)
+            wait_for_match_history(self.driver)
+        self.loaded_at = time.monotonic()
+
+    def poll(self, known=None, sleep=time.sleep):
+        """ Look at the newest game once. Returns (game element, record) for a new, recent Custom Game, else None.
+
+        The game comes back expanded and ready to extract. `known(game_key)` lets already stored games
+        be skipped. WebDriver errors are raised after marking the page for a reload.
+        """
+        try:
+            if self.needs_reload():
+                self.load()
+
+            with metrics.stage("poll"):
+                snapshot = newest_game_header(self.driver, self.last_header)
+            self.last_header = snapshot
+            if snapshot is None:
+                self.loaded_at = None
+                log.info(f"{self.name}: could not locate the match history block or no games found.")
+                return None
+
+            header = parse_game_header(snapshot)
+            game_key = generate_game_key(header["header"])
+            if game_key in self.seen:
+                return None
+
+            log.debug(f"{self.name}: new newest game, custom={header['is_custom']}, time label: {header['time_label']}")
+            if not header["is_custom"]:
+                self.seen.add(game_key)
+                log.info(f"{self.name}: newest game is not a Custom Game.")
+                return None
+            if not is_recent(header["time_label"]):
+                self.seen.add(game_key)
+                log.info(f"{self.name}: newest game is older than {MAX_GAME_AGE_MINUTES} minutes.")
+                return None
+            if known and known(game_key):
+                self.seen.add(game_key)
+                log.info(f"{self.name}: newest game is already recorded.")
+                return None
+
+            with metrics.stage("expand"):
+                latest_game = self.expand(header, sleep)
+            if latest_game is None:
+                return None
+
+            self.seen.add(game_key)
+            return latest_game, make_match_record(header["header"], {}, header["is_custom"], header["time_label"])
+
+        except WebDriverException:
+            # A stale list or a crashed tab: start over from a fresh page load
+            self.loaded_at = None
+            raise
+
+    def expand(self, header, sleep=time.sleep):
+        """ The game matching `header`, expanded, or None once it is gone or MAX_EXPAND_SECONDS ran out.
+
+        The game is located again by its key on every attempt, so a list re-rendered in between
+        neither leaves a stale element behind nor swaps in a different game.
+        """
+        deadline = time.monotonic() + MAX_EXPAND_SECONDS
+        dropdown_backoff = Backoff(initial=2, maximum=30)
+        while True:
+            try:
+                game = SeleniumMatchSource.find_game(wait_for_match_history(self.driver) or [], 0, header)
+                if game is None:
+                    self.loaded_at = None
+                    log.info(f"{self.name}: new game is no longer in the match history.")
+                    return None
+                if expand_game(game):
+                    log.debug("Clicked dropdown via button.")
+                    return game
+                log.debug("Dropdown did not expand yet, game might be in progress.")
+            except Exception as e:
+                log.debug(f"Failed to click dropdown, game might be in progress. {e}")
+            if time.monotonic() >= deadline:
+                log.warning(f"{self.name}: new game did not expand within {MAX_EXPAND_SECONDS}s. Trying again next poll.")
+                return None
+            dropdown_backoff.sleep(sleep)
+
+
+class ObserverScheduler:
+    """ Polls several profiles concurrently and hands every finished lobby to `on_game` exactly once.
+
+    Each observer borrows its own browser from `pool` and polls from a worker thread, paced by a
+    per-host rate limiter. Players in the same lobby see the same game, so new games are extracted
+    with `extract(game element)` and deduplicated by lobby fingerprint: the first observer to show
+    it wins, the rest drop it. `lobby_known(fingerprint)` lets lobbies stored before a restart be
+    dropped too. `on_game(record)` runs in a worker thread, one game at a time.
+    """
+
+    def __init__(self, urls, pool, on_game, extract, known=None, job=None,
+                 poll_interval=POLL_INTERVAL, limiter=None, lobby_known=None):
+        self.observers = [ProfileObserver(url) for url in urls]
+        self.pool = pool
+        self.on_game = on_game
+        self.extract = extract
+        self.known = known
+        self.lobby_known = lobby_known
+        self.job = job
+        self.poll_interval = poll_interval
+        self.limiter = limiter or HostRateLimiter()
+        self.lobbies = RecentKeys()  # fingerprints of lobbies already claimed by an observer
+        self.stop = None
+        self.processing = None
+
+    async def run(self):
+        """ Watch until the job is cancelled or an observer hits an error other than a browser failure. """
+        self.stop = asyncio.Event()
+        self.processing = asyncio.Lock()
+        tasks = [asyncio.create_task(self.observe(observer)) for observer in self.observers]
+        watcher = asyncio.create_task(self.watch_job())
+        log.info(f"Watching {len(self.observers)} profile(s): {', '.join(o.name for o in self.observers)}")
+        try:
+            await asyncio.wait(tasks + [watcher], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Observers finish the poll they are in and exit, so no browser is released while in use
+            self.stop.set()
+            results = await asyncio.gather(*tasks, watcher, return_exceptions=True)
+            for observer in self.observers:
+                if observer.driver is not None:
+                    await asyncio.to_thread(self.pool.release, observer.driver)
+                    observer.driver = None
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def watch_job(self):
+        while not self.stop.is_set():
+            if self.job is not None:
+                self.job.check()
+            await self.wait(STOP_CHECK_INTERVAL)
+
+    async def wait(self, seconds):
+        """ asyncio.sleep() that returns early once the scheduler is stopping. """
+        try:
+            await asyncio.wait_for(self.stop.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def observe(self, observer):
+        backoff = Backoff(initial=self.poll_interval, maximum=MAX_POLL_DELAY)
+        while not self.stop.is_set():
+            try:
+                if observer.driver is None:
+                    observer.attach(await asyncio.to_thread(self.pool.acquire))
+                if observer.needs_reload():
+                    await self.limiter.wait(observer.url)
+                await self.limiter.wait(observer.url)
+                record = await asyncio.to_thread(self.check, observer)
+            except WebDriverException as e:
+                log.warning(f"{observer.name}: browser failed: {e}. Getting a fresh browser...")
+                metrics.inc("scrims_polls_total", outcome="error")
+                if self.job is not None:
+                    self.job.report("error", error=f"{observer.name}: browser failed: {e}", recovered=True)
+                # The pool discards the crashed browser on release
+                await asyncio.to_thread(self.pool.release, observer.driver)
+                observer.driver = None
+                await self.wait(backoff.next_delay())
+                continue
+
+            backoff.reset()
+            if record is None:
+                metrics.inc("scrims_polls_total", outcome="no_new_game")
+            else:
+                await self.claim(observer, record)
+            await self.wait(self.poll_interval)
+
+    def check(self, observer):
+        """ Worker thread: one poll, and the extracted record if it found a new game. """
+        sleep = self.job.sleep if self.job is not None else time.sleep
+        found = observer.poll(self.known, sleep)
+        if found is None:
+            return None
+        latest_game, record = found
+        with metrics.stage("extract"):
+            record["teams"] = self.extract(latest_game)
+        return record
+
+    async def claim(self, observer, record):
+        if not record["teams"]:
+            log.warning(f"{observer.name}: could not read the teams of the new game. Leaving it to the other observers.")
+            return
+        fingerprint = lobby_key(record["teams"])
+        if fingerprint in self.lobbies:
+            metrics.inc("scrims_polls_total", outcome="duplicate_game")
+            log.debug(f"{observer.name}: game already claimed by another observer.")
+            return
+        # Claimed before the first await, so no other observer can take the same lobby
+        self.lobbies.add(fingerprint)
+        if self.lobby_known and await asyncio.to_thread(self.lobby_known, fingerprint):
+            metrics.inc("scrims_polls_total", outcome="duplicate_game")
+            log.info(f"{observer.name}: game was already recorded before a restart.")
+            return
+        metrics.inc("scrims_polls_total", outcome="new_game")
+        log.info(f"{observer.name} saw the finished game first. Processing it...")
+        if self.job is not None:
+            self.job.report("game_detected", game_key=record["game_key"], time_label=record["time_label"], observer=observer.name)
+            self.job.report("game_extracted", game_key=record["game_key"], teams=len(record["teams"]))
+        async with self.processing:
+            await asyncio.to_thread(self.on_game, record)
@@ -0,0 +1,156 @@
+import copy
+import json
+import sys
+
+from lxml import etree, html as lxml_html
+
+
+# Compiled once at import, evaluated against an in-memory tree instead of chromedriver
+TEAM_BLOCKS = etree.XPath(".//div[contains(@class, 'rounded') and contains(@class, 'border-opacity')]")
+TEAM_NUMBER = etree.XPath(".//div[@class='text-muted-foreground']")
+PLACEMENT = etree.XPath(".//div[contains(@class, 'flex items-center gap-2')]/div[contains(@class, 'font-bold')]")
+PLAYER_ROWS = etree.XPath(".//div[contains(@class, 'flex items-center justify-between rounded w-full')]")
+PLAYER_NAME = etree.XPath(".//div[contains(@class, 'cursor-help')]")
+GAME_BLOCKS = etree.XPath("./div")
+GAME_MODE_LABEL = etree.XPath(".//div[contains(@class, 'text-xs font-bold text-red-500')]")
+TIME_LABEL = etree.XPath(".//div[contains(@class, 'text-muted-foreground')]")
+KDA_CELLS = etree.XPath(".//div[contains(@class, 'grid grid-cols-4 gap-1 text-[11px]')]/div[contains(@class, 'flex flex-col items-center w-[50px]')]/div[@class='font-medium']")
+
+
+def element_text(element):
+    """ Whitespace-normalized text of an element, matching what WebElement.text returns. """
+    return " ".join(element.text_content().split())
+
+
+def load_tree(source):
+    """ Parse an HTML string (page_source or outerHTML of a game block) into an lxml tree. """
+    if isinstance(source, bytes):
+        source = source.decode("utf-8")
+    return lxml_html.fromstring(source)
+
+
+def parse_kda(kda_text):
+    """ (kills, deaths, assists) from a 'K / D / A' cell, or None when the cell is not a KDA line. """
+    parts = kda_text.split("/")
+    if len(parts) != 3:
+        return None
+    try:
+        return tuple(int(part) for part in parts)
+    except ValueError:
+        return None
+
+
+def parse_kills(kda_text):
+    """ Kills from a 'K / D / A' cell, or None when the cell is not a KDA line. """
+    kda = parse_kda(kda_text)
+    return kda[0] if kda else None
+
+
+def parse_team_block(team):
+    """ Extracts (team_number, data) from one team block element, or None if it has no Team #X label. """
+    team_number_elements = TEAM_NUMBER(team)
+    if not team_number_elements:
+        return None
+    team_number = element_text(team_number_elements[0])
+
+    placement_elements = PLACEMENT(team)
+    placement = element_text(placement_elements[0]) if placement_elements else "Unknown"
+
+    # Each player row holds the name and its own KDA cell, so stats stay paired with the player
+    team_players = []
+    player_stats = []
+    player_rows = PLAYER_ROWS(team)
+    if player_rows:
+        for row in player_rows:
+            name_elements = PLAYER_NAME(row)
+            if name_elements:
+                team_players.append(element_text(name_elements[0]))
+                kdas = [parse_kda(element_text(cell)) for cell in KDA_CELLS(row)]
+                player_stats.append(next((kda for kda in kdas if kda), None))
+    else:
+        team_players = [element_text(player) for player in PLAYER_NAME(team)]
+
+    kda_cells = KDA_CELLS(team)
+    total_kills = 0
+    for kda in kda_cells:
+        kills = parse_kills(element_text(kda))
+        if kills is not None:
+            total_kills += kills
+
+    if not any(player_stats):
+        # Layouts without per-row KDA cells list one KDA line per player, in roster order
+        team_kdas = [kda for kda in (parse_kda(element_text(cell)) for cell in kda_cells) if kda]
+        if team_kdas:
+            player_stats = [team_kdas[index] if index < len(team_kdas) else None for index in range(len(team_players))]
+
+    # "stats" lines up with "players": (kills, deaths, assists) per player, None where unreadable
+    data = {"placement": placement, "kills": total_kills, "players": team_players}
+    if player_stats:
+        data["stats"] = player_stats
+    return team_number, data
+
+
+def parse_game(source):
+    """ Extracts team placements, Team #X, players and kills for a whole game in one pass.
+
+    `source` is either an HTML string or an already parsed lxml element.
+    """
+    root = load_tree(source) if isinstance(source, (str, bytes)) else source
+    teams_data = {}
+
+    for team in TEAM_BLOCKS(root):
+        parsed = parse_team_block(team)
+        if parsed is None:
+            continue
+        team_number, data = parsed
+        if team_number not in teams_data:
+            teams_data[team_number] = data
+
+    return teams_data
+
+
+def parse_game_header(source):
+    """ Header of a game block (mode, summary text) with any expanded team blocks and the time label left out.
+
+    Returns {"header": text, "is_custom": bool, "time_label": text}. The header text is the same
+    whether or not the game was expanded, so it can be fingerprinted before and after clicking.
+    """
+    root = load_tree(source) if isinstance(source, (str, bytes)) else copy.deepcopy(source)
+    for team in TEAM_BLOCKS(root):
+        if team.getparent() is not None:
+            team.drop_tree()
+
+    mode_labels = GAME_MODE_LABEL(root)
+    time_labels = TIME_LABEL(root)
+    time_label = element_text(time_labels[0]).lower() if time_labels else ""
+    # The relative age ('a minute ago', '2 days ago') changes while the game sits in the list,
+    # so it is left out of the header text the game key is hashed from
+    if time_labels and time_labels[0].getparent() is not None:
+        time_labels[0].drop_tree()
+    return {
+        "header": " ".join(text.strip() for text in root.itertext() if text.strip()),
+        "is_custom": bool(mode_labels) and "Custom Game" in element_text(mode_labels[0]),
+        "time_label": time_label,
+    }
+
+
+def parse_match_history(source, count=None):
+    """ Splits a match history block snapshot into its game block elements, newest first. """
+    root = load_tree(source) if isinstance(source, (str, bytes)) else source
+    games = GAME_BLOCKS(root)
+    return games if count is None else games[:count]
+
+
+def parse_game_file(path):
+    """ Parse a saved HTML file (page_source or game block outerHTML) offline. """
+    with open(path, "r", encoding="utf-8") as file:
+        return parse_game(file.read())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python opgg_parser.py <saved_game.html> [...]")
+        sys.exit(1)
+
+    for path in sys.argv[1:]:
+        print(json.dumps({path: parse_game_file(path)}, indent=4, ensure_ascii=False))
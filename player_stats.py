@@ -0,0 +1,222 @@
+import argparse
+
+import numpy as np
+
+from match_source import placement_number
+from team_index import player_key
+
+
+INITIAL_CAPACITY = 4096  # player lines; the columns double when full
+UNREGISTERED = -1  # team id of lines whose lobby team was never mapped to a tag
+STATS = ("kills", "deaths", "assists")
+
+COLUMNS = {
+    "game": np.int32,
+    "session": np.int16,
+    "player": np.int32,
+    "team": np.int16,
+    "placement": np.int16,  # 0 = unknown
+    "kills": np.int16,
+    "deaths": np.int16,
+    "assists": np.int16,
+}
+
+
+class Interner:
+    """ Compact integer ids for names, handed out in order of first appearance. """
+
+    def __init__(self, key=None):
+        self.key = key or (lambda name: name)
+        self.ids = {}  # canonical key -> id
+        self.aliases = {}  # exact name -> id, so repeat names skip the key function
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def id(self, name):
+        found = self.aliases.get(name)
+        if found is None:
+            key = self.key(name)
+            if key not in self.ids:
+                self.ids[key] = len(self.names)
+                self.names.append(name)
+            found = self.aliases[name] = self.ids[key]
+        return found
+
+    def get(self, name):
+        return self.ids.get(self.key(name))
+
+
+class PlayerStats:
+    """ Every per-player line (game, session, player, team, placement, K/D/A) in parallel NumPy columns.
+
+    Players are interned by canonical key, so 'Name', 'name#tag' and the op.gg URL share one id;
+    teams by tag, sessions by sheet tab. A line is 20 bytes, so tens of thousands of games fit in a
+    few MB, and every leaderboard is a couple of bincount calls over the selected lines.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.size = 0
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.players = Interner(player_key)
+        self.teams = Interner()
+        self.sessions = Interner()
+        self.game_keys = Interner()
+        self.last_rowid = 0  # store rowid of the newest game loaded, for load_new()
+
+    @classmethod
+    def from_store(cls, store):
+        stats = cls()
+        stats.load_new(store)
+        return stats
+
+    def load_new(self, store):
+        """ Append the lines of games stored since the last load. Returns how many lines were added. """
+        values = {name: [] for name in COLUMNS}
+        placements = {}
+        for rowid, game_key, sheet_tab, team_tag, placement, player_name, kills, deaths, assists in store.player_lines(self.last_rowid):
+            self.last_rowid = max(self.last_rowid, rowid)
+            if kills is None:
+                continue
+            if placement not in placements:
+                placements[placement] = placement_number(placement) or 0
+            values["game"].append(self.game_keys.id(game_key))
+            values["session"].append(self.sessions.id(sheet_tab) if sheet_tab else -1)
+            values["player"].append(self.players.id(player_name))
+            values["team"].append(self.teams.id(team_tag) if team_tag else UNREGISTERED)
+            values["placement"].append(placements[placement])
+            values["kills"].append(kills)
+            values["deaths"].append(deaths)
+            values["assists"].append(assists)
+        self.extend(values)
+        return len(values["game"])
+
+    def add_game(self, record, team_tags=None, session=None):
+        """ Append one match record's player lines (only players with K/D/A are kept). """
+        team_tags = team_tags or {}
+        for team_number, data in record["teams"].items():
+            for name, kda in zip(data.get("players", []), data.get("stats", [])):
+                if kda:
+                    self.append(record["game_key"], session, name, team_tags.get(team_number), data["placement"], *kda)
+
+    def reserve(self, extra):
+        capacity = len(self.columns["game"])
+        if self.size + extra <= capacity:
+            return
+        while capacity < self.size + extra:
+            capacity *= 2
+        for name, column in self.columns.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    def extend(self, values):
+        """ Append many lines at once from {column: list of ids / numbers}. """
+        count = len(values["game"])
+        self.reserve(count)
+        for name, column in self.columns.items():
+            column[self.size:self.size + count] = values[name]
+        self.size += count
+
+    def append(self, game_key, session, player_name, team_tag, placement, kills, deaths, assists):
+        self.reserve(1)
+        row = self.size
+        self.columns["game"][row] = self.game_keys.id(game_key)
+        self.columns["session"][row] = self.sessions.id(session) if session else -1
+        self.columns["player"][row] = self.players.id(player_name)
+        self.columns["team"][row] = self.teams.id(team_tag) if team_tag else UNREGISTERED
+        self.columns["placement"][row] = placement_number(placement) or 0
+        self.columns["kills"][row] = kills
+        self.columns["deaths"][row] = deaths
+        self.columns["assists"][row] = assists
+        self.size += 1
+
+    def column(self, name):
+        return self.columns[name][:self.size]
+
+    def selection(self, session=None, last_games=None, team=None):
+        """ Boolean mask over the lines of one session (sheet tab), the last N games and/or one team tag.
+
+        None when nothing is filtered, so whole-archive queries skip the copy.
+        """
+        if session is None and not last_games and team is None:
+            return None
+        mask = np.ones(self.size, dtype=bool)
+        if session is not None:
+            session_id = self.sessions.get(session)
+            mask &= self.column("session") == (-2 if session_id is None else session_id)
+        if last_games:
+            first_game = len(self.game_keys) - last_games
+            mask &= self.column("game") >= first_game
+        if team is not None:
+            team_id = self.teams.get(team)
+            mask &= self.column("team") == (-2 if team_id is None else team_id)
+        return mask
+
+    def totals(self, mask=None):
+        """ Per-player arrays (indexed by player id) of games played and summed kills / deaths / assists. """
+        def selected(name):
+            return self.column(name) if mask is None else self.column(name)[mask]
+
+        players = selected("player")
+        count = len(self.players)
+        totals = {"games": np.bincount(players, minlength=count)}
+        for stat in STATS:
+            totals[stat] = np.bincount(players, weights=selected(stat), minlength=count)
+        # K/D with deaths floored at 1, the way scoreboards show a deathless player
+        totals["kd"] = totals["kills"] / np.maximum(totals["deaths"], 1)
+        totals["kda"] = (totals["kills"] + totals["assists"]) / np.maximum(totals["deaths"], 1)
+        totals["kills_per_game"] = totals["kills"] / np.maximum(totals["games"], 1)
+        return totals
+
+    def leaderboard(self, stat="kills", limit=10, min_games=1, session=None, last_games=None, team=None):
+        """ [{"player", "games", "kills", "deaths", "assists", "kd", ...}] best first by `stat`. """
+        totals = self.totals(self.selection(session, last_games, team))
+        eligible = np.flatnonzero(totals["games"] >= max(min_games, 1))
+        # Highest `stat` first, more kills breaking ties
+        order = eligible[np.lexsort((-totals["kills"][eligible], -totals[stat][eligible]))][:limit]
+        return [{
+            "player": self.players.names[player],
+            "games": int(totals["games"][player]),
+            "kills": int(totals["kills"][player]),
+            "deaths": int(totals["deaths"][player]),
+            "assists": int(totals["assists"][player]),
+            "kd": round(float(totals["kd"][player]), 2),
+            "kda": round(float(totals["kda"][player]), 2),
+            "kills_per_game": round(float(totals["kills_per_game"][player]), 2),
+        } for player in order]
+
+    def top_fraggers(self, limit=10, **filters):
+        return self.leaderboard("kills", limit, **filters)
+
+    def best_kd(self, limit=10, min_games=3, **filters):
+        return self.leaderboard("kd", limit, min_games=min_games, **filters)
+
+    def memory_bytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-player leaderboards from the stored games.")
+    parser.add_argument("--stat", default="kills", choices=["kills", "deaths", "assists", "kd", "kda", "kills_per_game"])
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--min-games", type=int, default=1)
+    parser.add_argument("--session", help="sheet tab to limit the leaderboard to, e.g. 'Lobby 1 - Series 3'")
+    parser.add_argument("--last-games", type=int, help="only the most recent N games")
+    parser.add_argument("--team", help="only players' lines for this team tag")
+    args = parser.parse_args()
+
+    from match_store import MatchStore
+
+    store = MatchStore()
+    try:
+        stats = PlayerStats.from_store(store)
+    finally:
+        store.close()
+
+    print(f"{stats.size} player line(s) from {len(stats.game_keys)} game(s), {stats.memory_bytes() / 1024:.0f} KB")
+    rows = stats.leaderboard(args.stat, args.limit, args.min_games, args.session, args.last_games, args.team)
+    for position, row in enumerate(rows, start=1):
+        print(f"{position:>3}. {row['player']:<20} {row[args.stat]:>7g} {args.stat} "
+              f"({row['kills']}/{row['deaths']}/{row['assists']} in {row['games']} game(s))")
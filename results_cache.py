@@ -0,0 +1,63 @@
+import asyncio
+import os
+
+
+CACHE_DIR = "/tmp"
+KEEP_VERSIONS = 2  # older images are deleted once a newer version has been rendered
+
+
+class ResultsCache:
+    """ Results images cached per scoreboard version, with single-flight generation.
+
+    `render(kind, version, path)` draws the image (in a worker thread) and returns the path or None.
+    `current_version()` returns the scoreboard version; it increments whenever a game is written.
+    `run(func, *args)` is awaited to call the renderer off the event loop (asyncio.to_thread by default).
+    Concurrent requests for the same kind and version share one in-flight render, and repeated
+    requests between games are answered from disk without rendering at all.
+    """
+
+    def __init__(self, render, current_version, cache_dir=CACHE_DIR, keep_versions=KEEP_VERSIONS, run=None):
+        self.render = render
+        self.run = run or asyncio.to_thread
+        self.current_version = current_version
+        self.cache_dir = cache_dir
+        self.keep_versions = keep_versions
+        self.paths = {}  # (kind, version) -> image path
+        self.in_flight = {}  # (kind, version) -> asyncio.Task
+
+    def image_path(self, kind, version):
+        return os.path.join(self.cache_dir, f"scrims_results_{kind}_v{version}.png")
+
+    async def get(self, kind="rendered"):
+        """ Path of the results image for the current scoreboard version, rendering it at most once. """
+        version = await asyncio.to_thread(self.current_version)
+        key = (kind, version)
+
+        path = self.paths.get(key)
+        if path and os.path.exists(path):
+            return path
+
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self.generate(kind, version))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+
+        # Shielded so one caller timing out or being cancelled does not cancel the render for the others
+        return await asyncio.shield(task)
+
+    async def generate(self, kind, version):
+        path = await self.run(self.render, kind, version, self.image_path(kind, version))
+        if path:
+            self.paths[(kind, version)] = path
+            self.evict(kind, version)
+        return path
+
+    def evict(self, kind, newest_version):
+        stale = [key for key in self.paths if key[0] == kind and key[1] <= newest_version - self.keep_versions]
+        for key in stale:
+            path = self.paths.pop(key)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
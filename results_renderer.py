@@ -0,0 +1,136 @@
+import sys
+
+from PIL import Image, ImageDraw, ImageFont
+
+from match_source import ordinal, placement_number
+
+
+IMAGE_PATH = "/tmp/spreadsheet_final.png"
+
+FONT_NAMES = ("DejaVuSans.ttf", "Arial.ttf", "arial.ttf")
+FONT_SIZE = 18
+ROW_HEIGHT = 34
+PADDING = 12
+TAG_COLUMN_WIDTH = 110
+GAME_COLUMN_WIDTH = 100
+TOTAL_COLUMN_WIDTH = 96
+
+BACKGROUND = (32, 34, 37)
+HEADER_BACKGROUND = (88, 101, 242)
+ROW_BACKGROUNDS = ((47, 49, 54), (54, 57, 63))
+GRID_COLOR = (66, 69, 73)
+TEXT_COLOR = (235, 235, 235)
+PODIUM_COLORS = {1: (255, 215, 0), 2: (192, 192, 192), 3: (205, 127, 50)}
+
+
+def load_font(size=FONT_SIZE, bold=False):
+    names = tuple(name.replace(".ttf", "-Bold.ttf") for name in FONT_NAMES) if bold else FONT_NAMES
+    for name in names:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 has no sized default font
+        return ImageFont.load_default()
+
+
+def standings_from_matches(matches):
+    """ Per-team rows for a series, given stored match records oldest first.
+
+    Returns [{"tag", "games": [(placement, kills) or None per game], "kills", "average_placement"}],
+    best average placement first, then most kills.
+    """
+    rows = {}
+    for game_index, match in enumerate(matches):
+        tags = match.get("team_tags", {})
+        for team_number, data in match["teams"].items():
+            tag = tags.get(team_number, team_number)
+            row = rows.setdefault(tag, {"tag": tag, "games": [None] * len(matches)})
+            row["games"][game_index] = (placement_number(data["placement"]), data["kills"])
+
+    for row in rows.values():
+        played = [game for game in row["games"] if game is not None]
+        placements = [placement for placement, _ in played if placement is not None]
+        row["kills"] = sum(kills for _, kills in played)
+        row["average_placement"] = sum(placements) / len(placements) if placements else None
+
+    return sorted(rows.values(), key=lambda row: (
+        row["average_placement"] if row["average_placement"] is not None else float("inf"),
+        -row["kills"],
+    ))
+
+
+def render_standings(rows, game_count, title="Scrims Results", path=IMAGE_PATH):
+    """ Draw the standings table to a PNG with Pillow and return its path. """
+    font = load_font()
+    bold_font = load_font(bold=True)
+    title_font = load_font(FONT_SIZE + 6, bold=True)
+
+    columns = [("Team", TAG_COLUMN_WIDTH)]
+    for game_index in range(game_count):
+        columns.append((f"G{game_index + 1} Place", GAME_COLUMN_WIDTH))
+        columns.append((f"G{game_index + 1} Kills", GAME_COLUMN_WIDTH))
+    columns += [("Avg Place", TOTAL_COLUMN_WIDTH), ("Kills", TOTAL_COLUMN_WIDTH)]
+
+    table_width = sum(width for _, width in columns)
+    title_height = ROW_HEIGHT + PADDING
+    width = table_width + PADDING * 2
+    height = title_height + ROW_HEIGHT * (len(rows) + 1) + PADDING * 2
+
+    image = Image.new("RGB", (width, height), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    draw.text((PADDING, PADDING), title, font=title_font, fill=TEXT_COLOR)
+
+    def draw_row(y, cells, background, fonts, colors):
+        draw.rectangle((PADDING, y, PADDING + table_width, y + ROW_HEIGHT), fill=background, outline=GRID_COLOR)
+        x = PADDING
+        for (text, cell_font, color), (_, column_width) in zip(zip(cells, fonts, colors), columns):
+            text_width = draw.textlength(text, font=cell_font)
+            draw.text((x + (column_width - text_width) / 2, y + (ROW_HEIGHT - FONT_SIZE) / 2), text, font=cell_font, fill=color)
+            x += column_width
+            draw.line((x, y, x, y + ROW_HEIGHT), fill=GRID_COLOR)
+
+    y = PADDING + title_height
+    draw_row(y, [name for name, _ in columns], HEADER_BACKGROUND, [bold_font] * len(columns), [TEXT_COLOR] * len(columns))
+
+    for row_index, row in enumerate(rows):
+        y += ROW_HEIGHT
+        cells, fonts, colors = [row["tag"]], [bold_font], [TEXT_COLOR]
+        for game in row["games"]:
+            placement, kills = game if game is not None else (None, None)
+            cells += ["-" if placement is None else ordinal(placement), "-" if kills is None else str(kills)]
+            fonts += [font, font]
+            colors += [PODIUM_COLORS.get(placement, TEXT_COLOR), TEXT_COLOR]
+        average = row["average_placement"]
+        cells += ["-" if average is None else f"{average:.1f}", str(row["kills"])]
+        fonts += [bold_font, bold_font]
+        colors += [TEXT_COLOR, TEXT_COLOR]
+        draw_row(y, cells, ROW_BACKGROUNDS[row_index % 2], fonts, colors)
+
+    image.save(path)
+    return path
+
+
+def render_latest_results(store=None, path=IMAGE_PATH):
+    """ Render the standings of the most recently written series from the local match store. """
+    from match_store import MatchStore
+
+    own_store = store is None
+    store = store or MatchStore()
+    try:
+        tab, matches = store.latest_tab_matches()
+    finally:
+        if own_store:
+            store.close()
+
+    if not matches:
+        return None
+    return render_standings(standings_from_matches(matches), len(matches), title=tab or "Scrims Results", path=path)
+
+
+if __name__ == "__main__":
+    output_path = sys.argv[1] if len(sys.argv) > 1 else IMAGE_PATH
+    rendered = render_latest_results(path=output_path)
+    print(f"Results image saved as {rendered}" if rendered else "No stored games to render.")
@@ -0,0 +1,137 @@
+import re
+import threading
+
+from metrics import metrics
+
+
+CELL_PATTERN = re.compile(r"^([A-Z]+)(\d+)$")
+
+
+def column_number(letters):
+    """ 'A' -> 1, 'Z' -> 26, 'AA' -> 27. """
+    number = 0
+    for letter in letters.upper():
+        number = number * 26 + (ord(letter) - 64)
+    return number
+
+
+def column_letter(number):
+    """ 1 -> 'A', 26 -> 'Z', 27 -> 'AA'. """
+    letters = ""
+    while number > 0:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def cell_a1(row, col):
+    return f"{column_letter(col)}{row}"
+
+
+def parse_cell(a1_cell):
+    """ 'C12' -> (12, 3). """
+    match = CELL_PATTERN.match(a1_cell.upper())
+    if not match:
+        raise ValueError(f"Not a single A1 cell: {a1_cell}")
+    return int(match.group(2)), column_number(match.group(1))
+
+
+def update_cells(update):
+    """ (row, col, value) for every cell of a {"range", "values"} update, a single cell or a block. """
+    first_row, first_col = parse_cell(update["range"].split(":")[0])
+    for row_offset, row_values in enumerate(update["values"]):
+        for col_offset, value in enumerate(row_values):
+            yield first_row + row_offset, first_col + col_offset, value
+
+
+def same_value(old, new):
+    # Sheets hands numbers back as formatted strings, so 5 and "5" are the same cell value
+    return str(old if old is not None else "") == str(new if new is not None else "")
+
+
+def grid_range(worksheet):
+    """ A1 range covering the worksheet's whole grid; Sheets rejects reads that run past it. """
+    return f"A1:{cell_a1(worksheet.row_count, worksheet.col_count)}"
+
+
+class ScoreboardMirror:
+    """ In-process copy of the scoreboard grid, loaded with one batch_get.
+
+    Writes are diffed against the mirror so only cells whose value actually changes are sent,
+    and team rows are looked up locally instead of re-reading Column A. Writes are recorded as
+    soon as they are queued; cells of a batch the queue dropped are marked unsent so the next
+    write of them is sent again even if the value is unchanged.
+    """
+
+    def __init__(self, worksheet, mirror_range=None):
+        self.worksheet = worksheet
+        self.mirror_range = mirror_range or grid_range(worksheet)
+        self.cells = {}  # (row, col) -> value
+        self.unsent = set()  # (row, col) of cells whose queued write never reached the sheet
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        metrics.inc("scrims_sheets_api_calls_total", method="batch_get")
+        with metrics.timer("scrims_sheets_api_seconds", method="batch_get"):
+            rows = self.worksheet.batch_get([self.mirror_range])[0]
+        first_row, first_col = parse_cell(self.mirror_range.split(":")[0])
+        cells = {}
+        for row_offset, row_values in enumerate(rows):
+            for col_offset, value in enumerate(row_values):
+                if value != "":
+                    cells[(first_row + row_offset, first_col + col_offset)] = value
+        with self.lock:
+            self.cells = cells
+            self.unsent.clear()
+
+    def value(self, row, col):
+        with self.lock:
+            return self.cells.get((row, col), "")
+
+    def team_rows(self, first_row=1):
+        """ {team tag: row} from Column A, starting at `first_row`. """
+        with self.lock:
+            return {value: row for (row, col), value in sorted(self.cells.items()) if col == 1 and row >= first_row and value}
+
+    def row_of(self, team_tag):
+        with self.lock:
+            for (row, col), value in sorted(self.cells.items()):
+                if col == 1 and value == team_tag:
+                    return row
+        return None
+
+    def diff(self, updates):
+        """ The subset of {"range", "values"} updates that would change at least one cell of the sheet. """
+        changed = []
+        with self.lock:
+            for update in updates:
+                if any((row, col) in self.unsent or not same_value(self.cells.get((row, col)), value)
+                       for row, col, value in update_cells(update)):
+                    changed.append(update)
+        return changed
+
+    def apply(self, updates):
+        with self.lock:
+            for update in updates:
+                for row, col, value in update_cells(update):
+                    self.unsent.discard((row, col))
+                    if value in ("", None):
+                        self.cells.pop((row, col), None)
+                    else:
+                        self.cells[(row, col)] = value
+
+    def mark_unsent(self, updates):
+        """ Record that `updates` were dropped before reaching the sheet (the queue's on_failed callback). """
+        with self.lock:
+            for update in updates:
+                for row, col, _ in update_cells(update):
+                    self.unsent.add((row, col))
+
+    def write(self, updates, send):
+        """ Diff `updates`, pass only the changed ones to `send` and record them in the mirror. """
+        changed = self.diff(updates)
+        if changed:
+            send(changed)
+            self.apply(changed)
+        return changed
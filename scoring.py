@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from match_source import placement_number
+from scoreboard import cell_a1
+
+
+SCORING_FILE = "scoring.json"  # optional {"placement_points": [...], "kill_points": 1, "kill_cap": null}
+DEFAULT_PLACEMENT_POINTS = (12, 9, 7, 5, 4, 3, 2, 1, 0, 0)  # 1st .. 10th
+DEFAULT_KILL_POINTS = 1.0
+WRITE_TOTALS = False  # True writes the totals block to the sheet, over any formulas the template keeps in those columns
+
+TOTALS_HEADER = ["Placement Points", "Kill Points", "Total", "Rank"]
+
+
+class ScoringRules:
+    """ Points per placement (index 0 = 1st) and per kill, with an optional per-game kill cap. """
+
+    def __init__(self, placement_points=DEFAULT_PLACEMENT_POINTS, kill_points=DEFAULT_KILL_POINTS, kill_cap=None):
+        self.placement_points = np.asarray(placement_points, dtype=float)
+        self.kill_points = float(kill_points)
+        self.kill_cap = kill_cap
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("placement_points", DEFAULT_PLACEMENT_POINTS),
+                   data.get("kill_points", DEFAULT_KILL_POINTS),
+                   data.get("kill_cap"))
+
+
+def load_rules(path=SCORING_FILE):
+    """ Rules from scoring.json, or the defaults when there is no such file. """
+    if not os.path.exists(path):
+        return ScoringRules()
+    with open(path, "r", encoding="utf-8") as file:
+        return ScoringRules.from_dict(json.load(file))
+
+
+class ScoringSession:
+    """ A series held as teams x games arrays: placements (0 = did not play) and kills.
+
+    score() computes every team's points, tie-breakers and rank in one vectorized pass, so
+    re-scoring the whole series under different rules is instant.
+    """
+
+    def __init__(self, tags=(), game_count=0):
+        self.tags = list(tags)
+        self.rows = {tag: row for row, tag in enumerate(self.tags)}
+        self.placements = np.zeros((len(self.tags), game_count), dtype=np.int16)
+        self.kills = np.zeros((len(self.tags), game_count), dtype=np.int32)
+
+    @classmethod
+    def from_games(cls, games):
+        """ Session from a list of {team tag: {"placement", "kills"}} dicts, one per game in play order. """
+        session = cls(game_count=len(games))
+        for game_index, game in enumerate(games):
+            session.record_game(game_index, game)
+        return session
+
+    @classmethod
+    def from_matches(cls, matches):
+        """ Session from stored match records (oldest first), keyed by the team tags they were written under. """
+        games = []
+        for match in matches:
+            tags = match.get("team_tags", {})
+            games.append({tags.get(team_number, team_number): data for team_number, data in match["teams"].items()})
+        return cls.from_games(games)
+
+    def row(self, tag):
+        if tag not in self.rows:
+            self.rows[tag] = len(self.tags)
+            self.tags.append(tag)
+            self.placements = np.pad(self.placements, ((0, 1), (0, 0)))
+            self.kills = np.pad(self.kills, ((0, 1), (0, 0)))
+        return self.rows[tag]
+
+    def record_game(self, game_index, results):
+        """ Store one game's {team tag: {"placement", "kills"}}, growing the arrays as needed. """
+        if game_index >= self.placements.shape[1]:
+            extra = game_index + 1 - self.placements.shape[1]
+            self.placements = np.pad(self.placements, ((0, 0), (0, extra)))
+            self.kills = np.pad(self.kills, ((0, 0), (0, extra)))
+        for tag, data in results.items():
+            row = self.row(tag)
+            self.placements[row, game_index] = placement_number(data["placement"]) or 0
+            self.kills[row, game_index] = int(data["kills"] or 0)
+
+    def score(self, rules=None):
+        """ Per-team arrays: placement/kill/total points, wins, kills, average placement and rank.
+
+        Ties on total points are broken by wins, then total kills, then best average placement;
+        teams still level share a rank.
+        """
+        rules = rules or ScoringRules()
+        played = self.placements > 0
+        table = rules.placement_points
+        table_index = np.clip(self.placements - 1, 0, len(table) - 1)
+        placement_points = np.where(played & (self.placements <= len(table)), table[table_index], 0.0)
+
+        kills = self.kills if rules.kill_cap is None else np.minimum(self.kills, rules.kill_cap)
+        kill_points = np.where(played, kills * rules.kill_points, 0.0)
+
+        games_played = played.sum(axis=1)
+        placement_sum = np.where(played, self.placements, 0).sum(axis=1)
+        average_placement = np.divide(placement_sum, games_played, out=np.full(len(self.tags), np.inf),
+                                      where=games_played > 0)
+
+        totals = {
+            "placement_points": placement_points.sum(axis=1),
+            "kill_points": kill_points.sum(axis=1),
+            "total": (placement_points + kill_points).sum(axis=1),
+            "wins": (self.placements == 1).sum(axis=1),
+            "kills": self.kills.sum(axis=1),
+            "average_placement": average_placement,
+        }
+
+        # Sort keys, most significant first; lexsort wants them least significant first
+        keys = np.stack([-totals["total"], -totals["wins"], -totals["kills"], average_placement])
+        order = np.lexsort(keys[::-1])
+        sorted_keys = keys[:, order]
+        new_rank = np.ones(len(order), dtype=bool)
+        new_rank[1:] = np.any(sorted_keys[:, 1:] != sorted_keys[:, :-1], axis=0)
+        positions = np.arange(1, len(order) + 1)
+        rank = np.empty(len(order), dtype=int)
+        rank[order] = np.maximum.accumulate(np.where(new_rank, positions, 0))
+
+        totals["rank"] = rank
+        totals["order"] = order
+        return totals
+
+    def standings(self, rules=None):
+        """ [{"tag", "rank", "total", ...}] best first. """
+        totals = self.score(rules)
+        return [{
+            "tag": self.tags[row],
+            "rank": int(totals["rank"][row]),
+            "total": float(totals["total"][row]),
+            "placement_points": float(totals["placement_points"][row]),
+            "kill_points": float(totals["kill_points"][row]),
+            "wins": int(totals["wins"][row]),
+            "kills": int(totals["kills"][row]),
+        } for row in totals["order"]]
+
+    def totals_update(self, team_rows, column, header_row, rules=None):
+        """ One {"range", "values"} update writing the totals block for every team row at once.
+
+        `team_rows` maps team tag -> sheet row; rows between them with no scored team are left blank.
+        """
+        if not team_rows:
+            return None
+        totals = self.score(rules)
+        first_row, last_row = min(team_rows.values()), max(team_rows.values())
+        values = [[""] * len(TOTALS_HEADER) for _ in range(first_row, last_row + 1)]
+        for tag, sheet_row in team_rows.items():
+            row = self.rows.get(tag)
+            if row is None:
+                continue
+            values[sheet_row - first_row] = [
+                number_cell(totals["placement_points"][row]),
+                number_cell(totals["kill_points"][row]),
+                number_cell(totals["total"][row]),
+                int(totals["rank"][row]),
+            ]
+
+        values = [TOTALS_HEADER] + [[""] * len(TOTALS_HEADER)] * (first_row - header_row - 1) + values
+        start = cell_a1(header_row, column)
+        end = cell_a1(last_row, column + len(TOTALS_HEADER) - 1)
+        return {"range": f"{start}:{end}", "values": values}
+
+
+def number_cell(value):
+    # Whole numbers go to the sheet as ints so they do not show up as "12.0"
+    return int(value) if float(value).is_integer() else round(float(value), 2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score the latest stored series, optionally under different rules.")
+    parser.add_argument("--rules", default=SCORING_FILE, help="scoring.json with placement_points / kill_points / kill_cap")
+    parser.add_argument("--placement-points", help="comma separated points for 1st, 2nd, ... (what-if)")
+    parser.add_argument("--kill-points", type=float, help="points per kill (what-if)")
+    parser.add_argument("--kill-cap", type=int, help="max kills counted per game (what-if)")
+    args = parser.parse_args()
+
+    from match_store import MatchStore
+
+    rules = load_rules(args.rules)
+    if args.placement_points:
+        rules.placement_points = np.asarray([float(points) for points in args.placement_points.split(",")])
+    if args.kill_points is not None:
+        rules.kill_points = args.kill_points
+    if args.kill_cap is not None:
+        rules.kill_cap = args.kill_cap
+
+    store = MatchStore()
+    try:
+        tab, matches = store.latest_tab_matches()
+    finally:
+        store.close()
+
+    session = ScoringSession.from_matches(matches)
+    print(f"{tab or 'Stored games'}: {len(matches)} game(s)")
+    for row in session.standings(rules):
+        print(f"{row['rank']:>3}. {row['tag']:<12} {row['total']:>7g} pts "
+              f"({row['placement_points']:g} placement + {row['kill_points']:g} kills, {row['wins']} win(s))")
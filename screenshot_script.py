@@ -1,53 +1,54 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
 from PIL import Image
-import time
-import subprocess
 
+from browser_pool import get_pool
 
-SPREADSHEET_URL = "" # SPREADSHEET URL GOES HERE
 
+SPREADSHEET_URL = "" # SPREADSHEET URL GOES HERE
 
-options = webdriver.ChromeOptions()
-options.add_argument("--headless")
-options.add_argument("--window-size=1920,1080")  
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+full_screenshot_path = "full_spreadsheet.png"
+cropped_screenshot_path = "/tmp/spreadsheet_final.png"
 
 
-driver.get(SPREADSHEET_URL)
-time.sleep(5)  
+def take_screenshot(pool=None, output_path=cropped_screenshot_path):
+    """ Screenshot the spreadsheet with a pooled browser and crop it to the standings table. """
+    pool = pool or get_pool()
 
+    with pool.session() as driver:
+        driver.get(SPREADSHEET_URL)
 
-table_element = driver.find_element(By.XPATH, "//div[contains(@class, 'grid-container')]") 
 
+        table_element = WebDriverWait(driver, 20).until(
+            EC.visibility_of_element_located((By.XPATH, "//div[contains(@class, 'grid-container')]"))
+        )
 
-full_screenshot_path = "full_spreadsheet.png"
-driver.save_screenshot(full_screenshot_path)
 
+        driver.save_screenshot(full_screenshot_path)
 
-location = table_element.location
-size = table_element.size
-x, y = location["x"], location["y"]
-width, height = size["width"], size["height"]
 
+        location = table_element.location
+        size = table_element.size
+    x, y = location["x"], location["y"]
+    width, height = size["width"], size["height"]
 
-crop_x_left = x + 52  
-crop_y_top = y + 25  
-crop_x_right = x + width - 255  
-crop_y_bottom = y + height - 127  
 
+    crop_x_left = x + 52  
+    crop_y_top = y + 25  
+    crop_x_right = x + width - 255  
+    crop_y_bottom = y + height - 127  
 
-image = Image.open(full_screenshot_path)
-cropped_image = image.crop((crop_x_left, crop_y_top, crop_x_right, crop_y_bottom))
 
+    image = Image.open(full_screenshot_path)
+    cropped_image = image.crop((crop_x_left, crop_y_top, crop_x_right, crop_y_bottom))
 
-cropped_screenshot_path = "/tmp/spreadsheet_final.png"
-cropped_image.save(cropped_screenshot_path)
-print(f"Final Cropped Screenshot saved as {cropped_screenshot_path}")
 
-subprocess.run(["python", "discord_bot.py"]) 
+    cropped_image.save(output_path)
+    print(f"Final Cropped Screenshot saved as {output_path}")
+    return output_path
 
 
-driver.quit()
+if __name__ == "__main__":
+    take_screenshot()
+    get_pool().close()
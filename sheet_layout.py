@@ -0,0 +1,134 @@
+import re
+import time
+
+from metrics import get_logger
+from scoreboard import column_letter, parse_cell
+from scoring import TOTALS_HEADER
+
+
+SERIES_LENGTH = 5  # games per series before it is archived and a fresh tab is started
+TEMPLATE_TITLE = "Template"  # copied for new series tabs when present, so formulas and dropdowns carry over
+ARCHIVE_PREFIX = "Archive"
+HEADER_ROW = 2
+FIRST_GAME_COLUMN = 2  # Column A holds team tags, games start at B
+
+log = get_logger("sheets")
+
+
+def game_columns(game_index):
+    """ (placement column, kills column) letters for a 0-based game index: 0 -> B, C; 12 -> Z, AA. """
+    placement_number = FIRST_GAME_COLUMN + game_index * 2
+    return column_letter(placement_number), column_letter(placement_number + 1)
+
+
+def totals_column(game_count):
+    """ Column number of the totals block, just right of the last game's kills column. """
+    return FIRST_GAME_COLUMN + game_count * 2
+
+
+def tab_columns(game_count):
+    """ Columns a tab needs for `game_count` games plus the totals block after them. """
+    return totals_column(game_count) + len(TOTALS_HEADER) - 1
+
+
+def grow_grid(worksheet, rows=0, cols=0):
+    """ Add rows / columns until `worksheet` is at least rows x cols; never shrinks it. """
+    if cols > worksheet.col_count:
+        worksheet.add_cols(cols - worksheet.col_count)
+    if rows > worksheet.row_count:
+        worksheet.add_rows(rows - worksheet.row_count)
+
+
+def ensure_grid(worksheet, updates):
+    """ Grow `worksheet` until every {"range", "values"} update fits; Sheets rejects a whole batch that writes past the grid. """
+    last_row = last_col = 0
+    for update in updates:
+        first_row, first_col = parse_cell(update["range"].split(":")[0])
+        last_row = max(last_row, first_row + len(update["values"]) - 1)
+        last_col = max(last_col, first_col + max((len(row) for row in update["values"]), default=1) - 1)
+    grow_grid(worksheet, last_row, last_col)
+
+
+def header_row(game_count):
+    row = ["Team"]
+    for game_index in range(game_count):
+        row += [f"Game {game_index + 1} Placement", f"Game {game_index + 1} Kills"]
+    return row
+
+
+def games_recorded(scoreboard, first_team_row):
+    """ How many game columns of a series tab already hold results, to resume after a restart. """
+    games = 0
+    rows = list(scoreboard.team_rows(first_team_row).values())
+    while rows and any(scoreboard.value(row, FIRST_GAME_COLUMN + games * 2) != "" for row in rows):
+        games += 1
+    return games
+
+
+class SeriesTabs:
+    """ One worksheet tab per series per lobby ("Lobby 1 - Series 3"), archived once the series is done.
+
+    Keeps the active tab small no matter how many games an evening has, and keeps every finished
+    series around as a hidden "Archive ..." tab.
+    """
+
+    def __init__(self, spreadsheet, lobby="Lobby 1", series_length=SERIES_LENGTH):
+        self.spreadsheet = spreadsheet
+        self.lobby = lobby
+        self.series_length = series_length
+        self.title_pattern = re.compile(rf"^{re.escape(lobby)} - Series (\d+)$")
+
+    def title(self, series_number):
+        return f"{self.lobby} - Series {series_number}"
+
+    def open_series(self):
+        """ (worksheet, series number) of the lobby's newest unarchived series, or a new one after the last archived. """
+        latest = None
+        highest_number = 0
+        for worksheet in self.spreadsheet.worksheets():
+            archived = worksheet.title.startswith(ARCHIVE_PREFIX)
+            title = worksheet.title.split(" - ", 1)[1] if archived and " - " in worksheet.title else worksheet.title
+            match = self.title_pattern.match(title)
+            if not match:
+                continue
+            number = int(match.group(1))
+            highest_number = max(highest_number, number)
+            if not archived and (latest is None or number > latest[1]):
+                latest = (worksheet, number)
+        if latest:
+            return latest
+        return self.create(highest_number + 1), highest_number + 1
+
+    def create(self, series_number):
+        title = self.title(series_number)
+        template = next((ws for ws in self.spreadsheet.worksheets() if ws.title == TEMPLATE_TITLE), None)
+        if template is not None:
+            worksheet = self.spreadsheet.duplicate_sheet(template.id, insert_sheet_index=0, new_sheet_name=title)
+            grow_grid(worksheet, cols=FIRST_GAME_COLUMN + self.series_length * 2)
+        else:
+            worksheet = self.spreadsheet.add_worksheet(title=title, rows=60, cols=tab_columns(self.series_length))
+            worksheet.update(f"A{HEADER_ROW}", [header_row(self.series_length)])
+        log.info(f"Started new series tab: {title}")
+        return worksheet
+
+    def archive(self, worksheet):
+        """ Rename a finished series tab to "Archive <date> - <title>", hide it and move it to the end. """
+        archived_title = f"{ARCHIVE_PREFIX} {time.strftime('%Y-%m-%d')} - {worksheet.title}"
+        self.spreadsheet.batch_update({"requests": [{
+            "updateSheetProperties": {
+                "properties": {
+                    "sheetId": worksheet.id,
+                    "title": archived_title,
+                    "hidden": True,
+                    "index": len(self.spreadsheet.worksheets()) - 1,
+                },
+                "fields": "title,hidden,index",
+            }
+        }]})
+        log.info(f"Archived {worksheet.title} as {archived_title}")
+        return archived_title
+
+    def next_series(self, worksheet, series_number):
+        """ Archive the finished series tab and return (worksheet, number) for the next one. """
+        self.archive(worksheet)
+        return self.create(series_number + 1), series_number + 1
@@ -0,0 +1,191 @@
+import random
+import threading
+import time
+
+from metrics import get_logger, metrics
+
+
+REQUESTS_PER_MINUTE = 50  # Sheets allows 60 write requests per minute per user; leave headroom
+FLUSH_INTERVAL = 1.0  # seconds to gather more writes before sending a batch
+MAX_RETRIES = 6
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+log = get_logger("sheets")
+
+
+def status_code(error):
+    """ HTTP status of a gspread APIError (or anything carrying a requests response), else None. """
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable(error):
+    if status_code(error) in RETRY_STATUS_CODES:
+        return True
+    # Connection resets and timeouts from requests have no response at all
+    return type(error).__name__ in ("ConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout")
+
+
+class TokenBucket:
+    """ Paces calls to `rate` per second with bursts up to `capacity`. """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SheetWriteQueue:
+    """ Write-behind queue that merges cell writes into one worksheet.batch_update per flush.
+
+    write() returns immediately, so the scrape loop never waits on Sheets latency. Writes to the
+    same range are coalesced (the latest value wins), requests are paced with a token bucket, and
+    429/5xx responses are retried with exponential backoff.
+    """
+
+    def __init__(self, worksheet, requests_per_minute=REQUESTS_PER_MINUTE, flush_interval=FLUSH_INTERVAL, max_retries=MAX_RETRIES):
+        self.worksheet = worksheet
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.bucket = TokenBucket(requests_per_minute / 60, capacity=max(1, requests_per_minute // 10))
+        self.pending = {}  # A1 range -> values, in first-write order
+        self.pending_callbacks = []  # (on_sent, on_failed) for the writes queued with them
+        self.sending_callbacks = []  # the same, for the batch being sent right now
+        self.condition = threading.Condition()
+        self.in_flight = False
+        self.closed = False
+        self.batches_sent = 0
+        self.batches_dropped = 0
+        self.retries = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, a1_range, values):
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("SheetWriteQueue is closed")
+            self.pending.pop(a1_range, None)
+            self.pending[a1_range] = values
+            self.condition.notify_all()
+
+    def write_many(self, updates, on_sent=None, on_failed=None):
+        """ Queue a list of {"range": ..., "values": ...} dicts, the shape batch_update takes.
+
+        `on_sent()` is called from the queue thread once the batch carrying these writes has been sent,
+        `on_failed(batch)` with the dropped updates if that batch had to be given up on.
+        """
+        for update in updates:
+            self.write(update["range"], update["values"])
+        if on_sent or on_failed:
+            with self.condition:
+                self.pending_callbacks.append((on_sent, on_failed))
+
+    def retarget(self, worksheet):
+        """ Send everything queued for the current worksheet, then write to `worksheet` from now on. """
+        self.flush()
+        with self.condition:
+            self.worksheet = worksheet
+
+    def flush(self, timeout=None):
+        """ Block until everything queued so far has been sent. Returns False on timeout. """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            self.condition.notify_all()
+            while self.pending or self.in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        self.flush(timeout)
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if self.closed and not self.pending:
+                    return
+
+            # Let the rest of this game (or the next one) land in the same batch
+            time.sleep(self.flush_interval)
+
+            with self.condition:
+                batch = [{"range": a1_range, "values": values} for a1_range, values in self.pending.items()]
+                self.sending_callbacks = self.pending_callbacks
+                self.pending.clear()
+                self.pending_callbacks = []
+                self.in_flight = True
+
+            try:
+                sent, batch = self.send(batch)
+                with self.condition:
+                    callbacks = self.sending_callbacks
+                    self.sending_callbacks = []
+                for on_sent, on_failed in callbacks:
+                    try:
+                        if sent and on_sent:
+                            on_sent()
+                        elif not sent and on_failed:
+                            on_failed(batch)
+                    except Exception as e:
+                        log.warning("Sheet write callback failed: %s", e)
+            finally:
+                with self.condition:
+                    self.in_flight = False
+                    self.condition.notify_all()
+
+    def send(self, batch):
+        """ Send one batch, retrying retryable errors. Returns (sent, batch as last tried); sent is False if it was dropped. """
+        delay = 1.0
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            metrics.inc("scrims_sheets_api_calls_total", method="batch_update")
+            try:
+                with metrics.timer("scrims_sheets_api_seconds", method="batch_update"):
+                    self.worksheet.batch_update(batch)
+                self.batches_sent += 1
+                metrics.inc("scrims_sheet_cells_written_total", len(batch))
+                log.info("Sent %d cell update(s) to the sheet in one batch.", len(batch))
+                return True, batch
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    metrics.inc("scrims_sheets_api_errors_total", method="batch_update")
+                    self.batches_dropped += 1
+                    log.error("Dropping %d cell update(s) after error: %s", len(batch), e)
+                    return False, batch
+                self.retries += 1
+                metrics.inc("scrims_sheets_api_retries_total", method="batch_update")
+                wait = delay * (1 + random.uniform(0, 0.25))
+                log.warning("Sheets API error (%s). Retrying in %.1fs...", status_code(e) or type(e).__name__, wait)
+                time.sleep(wait)
+                delay = min(delay * 2, 64)
+
+                # Newer writes queued meanwhile supersede the failed ones for the same range
+                with self.condition:
+                    merged = {update["range"]: update["values"] for update in batch}
+                    merged.update(self.pending)
+                    self.pending.clear()
+                    self.sending_callbacks += self.pending_callbacks
+                    self.pending_callbacks = []
+                    batch = [{"range": a1_range, "values": values} for a1_range, values in merged.items()]
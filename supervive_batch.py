@@ -1,28 +1,28 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.by import By
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
-import json
-import time
+import argparse
 import sys
-import re
-import hashlib
+import uuid
+
+from analytics import Rollups
+from browser_pool import get_pool
+from event_bus import EventPublisher
+from jobs import Job
+from match_source import JsonMatchSource, RecordingMatchSource, ReplayMatchSource, SeleniumMatchSource
+from match_store import STORE_FILE, MatchStore
+from metrics import configure_logging, get_logger, metrics
+from opgg_parser import parse_game
+from scoreboard import ScoreboardMirror
+from scoring import WRITE_TOTALS, ScoringSession, load_rules
+from sheet_layout import FIRST_GAME_COLUMN, HEADER_ROW, SERIES_LENGTH, ensure_grid, game_columns, totals_column
+from team_index import TeamIndex
 
 sys.stdout.reconfigure(encoding='utf-8')
 
-TEAM_FILE = "teams.json"
+log = get_logger("batch")
 
-def load_teams():
-    try:
-        with open(TEAM_FILE, "r", encoding="utf-8") as file:
-            return json.load(file)
-    except (FileNotFoundError, json.JSONDecodeError):
-        print("Warning: Could not load teams.json. Using empty fallback.")
-        return {}
-
-teams = load_teams()  
+# Player -> registered team lookup, refreshed from teams.json / players.json when they change
+team_index = TeamIndex()
 team_mappings = {} 
 
 
@@ -33,64 +33,56 @@ spreadsheet_name = "Supervive Scrims"
 base_team_row = 3  
 
 scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-creds = ServiceAccountCredentials.from_json_keyfile_name(json_key_file, scope)
-gc = gspread.authorize(creds)
-worksheet = gc.open(spreadsheet_name).sheet1
+
+# Opened in run_batch() so the bot can import this module without side effects
+worksheet = None
+driver = None
 
 
-options = webdriver.ChromeOptions()
-options.add_argument("--headless") 
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+def open_worksheet(tab=None):
+    """ The worksheet to write to: `tab` by title (created if missing) or the first sheet. """
+    creds = ServiceAccountCredentials.from_json_keyfile_name(json_key_file, scope)
+    gc = gspread.authorize(creds)
+    spreadsheet = gc.open(spreadsheet_name)
+    if not tab:
+        return spreadsheet.sheet1
+    try:
+        return spreadsheet.worksheet(tab)
+    except gspread.exceptions.WorksheetNotFound:
+        return spreadsheet.add_worksheet(title=tab, rows=60, cols=FIRST_GAME_COLUMN + 100)
 
-time.sleep(15)
 
-def process_past_games(num_games):
-    """ Processes the past `num_games` custom games in order """
+def process_past_games(num_games, source=None, store=None, job=None):
+    """ Processes the past `num_games` custom games in order, scraping only games the store does not have """
     
     global team_mappings  
 
-    driver.get("https://supervive.op.gg/players/steam-LilMeap%230001")
-    time.sleep(5)
-
-
-    match_containers = driver.find_elements(By.CLASS_NAME, "space-y-2")
-    if len(match_containers) < 6:
-        print("Could not locate the match history block. Aborting.")
-        return
-
-    match_history_block = match_containers[5]  
-    past_games = match_history_block.find_elements(By.XPATH, "./div")
+    source = source or SeleniumMatchSource(driver)
+    with metrics.stage("scrape"):
+        matches = source.recent_matches(num_games, known=store.get_match if store else None)
 
-    if not past_games:
-        print("No games found.")
+    if not matches:
+        log.warning("No games found. Aborting.")
         return
 
-    print(f"Found {len(past_games)} total games. Processing last {num_games} Custom Games...")
+    log.info(f"Processing last {len(matches)} Custom Games...")
+    if job:
+        job.report("matches_found", count=len(matches))
 
     processed_teams_data = []
     
     team_mappings.clear() 
 
-    for i in range(min(num_games, len(past_games))):
+    for i, match in enumerate(matches):
+        if job:
+            job.check()
         try:
-            game = past_games[i]
-
-
-            try:
-                dropdown_button = game.find_element(By.XPATH, ".//button[contains(@class, 'items-center')]")
-                dropdown_button.click()
-                print(f"Clicked dropdown for Custom Game #{i+1}.")
-                time.sleep(3)  
-            except Exception as e:
-                print(f"Could not click dropdown for Game {i+1}: {e}")
-                continue  
-
-
-            teams_data = extract_team_data(game)
+            teams_data = match["teams"]
 
 
             if i == 0:
-                teams_data = assign_team_names(teams_data)  
+                with metrics.stage("assign"):
+                    teams_data = assign_team_names(teams_data)  
 
 
             formatted_teams_data = {}
@@ -99,118 +91,46 @@ def process_past_games(num_games):
                 formatted_teams_data[team_tag] = {"placement": team_info["placement"], "kills": team_info["kills"]}
 
             processed_teams_data.append(formatted_teams_data)
+            metrics.inc("scrims_games_processed_total", source="batch")
 
-            print(f"Processed Game #{i+1}")
+            log.debug(f"Processed Game #{i+1}")
+            if job:
+                job.report("game_processed", game_number=i + 1, total=len(matches))
         
         except Exception as e:
-            print(f"Error processing Game #{i+1}: {e}")
-
-    print("Completed batch processing.")
+            log.error(f"Error processing Game #{i+1}: {e}")
+            if job:
+                job.report("error", error=f"Error processing Game #{i+1}: {e}", recovered=True)
+
+    if store:
+        # Each run overwrites its tab, so its games are tagged with the run for /results and totals
+        run_id = uuid.uuid4().hex
+        # Oldest first, so the store's insertion order stays the order the games were played in
+        for match in reversed(matches):
+            tags = {team_number: team_mappings.get(team_number, team_number) for team_number in match["teams"]}
+            store.save_match(match, tags, worksheet.title if worksheet is not None else None, run_id)
+        Rollups(store).ingest()
+
+    log.info("Completed batch processing.")
     return processed_teams_data
 
 
 
 
 
-def open_game_dropdown(game_block):
-    """ Click the dropdown to expose team data. """
-    while True:
-        try:
-            dropdown_button = game_block.find_element(
-                By.XPATH, ".//button[contains(@class, 'items-center')]"
-            )
-            dropdown_button.click()
-            print("Clicked dropdown.")
-            time.sleep(3)  
-            break
-        except Exception as e:
-            print(f"Failed to click dropdown. Retrying... {e}")
-            time.sleep(3)
-
 def extract_team_data(latest_game):
-    """ Extracts team placements, Team #X, and total kills per team """
-    teams_data = {}
-
+    """ Extracts team placements, Team #X, total kills per team and each player's K/D/A """
     try:
-
-        team_blocks = latest_game.find_elements(
-            By.XPATH, ".//div[contains(@class, 'rounded') and contains(@class, 'border-opacity')]"
-        )
-
-        print(f"Found {len(team_blocks)} team blocks. Processing...")
-
-        for team in team_blocks:
-            try:
-
-                team_number_element = team.find_element(
-                    By.XPATH, ".//div[@class='text-muted-foreground']"
-                )
-                team_number = team_number_element.text.strip()
-                print(f"Found {team_number} in team block.")
-
-
-                try:
-                    placement_element = team.find_element(
-                        By.XPATH,
-                        ".//div[contains(@class, 'flex items-center gap-2')]/div[contains(@class, 'font-bold')]"
-                    )
-                    placement = placement_element.text.strip()
-                    print(f"Placement for {team_number}: {placement}")
-                except:
-                    placement = "Unknown"
-                    print(f"Could not find placement for {team_number}.")
-
-
-                team_players = []
-                try:
-                    player_rows = team.find_elements(
-                        By.XPATH, ".//div[contains(@class, 'flex items-center justify-between rounded w-full')]"
-                    )
-
-                    for row in player_rows:
-                        try:
-
-                            player_name_element = row.find_element(
-                                By.XPATH, ".//div[contains(@class, 'text-xs cursor-help')]"
-                            )
-                            player_name = player_name_element.text.strip()
-                            team_players.append(player_name)
-                            print(f"Found player: {player_name} in {team_number}")
-                        except Exception:
-                            print("Could not extract player name properly.")
-
-                except Exception as e:
-                    print(f"Error extracting player names: {e}")
-
-
-                total_kills = 0
-                try:
-                    kill_elements = team.find_elements(
-                        By.XPATH,
-                        ".//div[contains(@class, 'grid grid-cols-4 gap-1 text-[11px]')]/div[contains(@class, 'flex flex-col items-center w-[50px]')]/div[@class='font-medium']"
-                    )
-
-                    for kill_element in kill_elements:
-                        kill_text = kill_element.text.strip()
-                        if "/" in kill_text:
-                            kills = int(kill_text.split("/")[0])
-                            total_kills += kills
-
-                except Exception as e:
-                    print(f"Error extracting total kills: {e}")
-
-                teams_data[team_number] = {
-                    "placement": placement,
-                    "kills": total_kills,
-                    "players": team_players
-                }
-                print(f"Stored {team_number}: Placement: {placement}, Kills: {total_kills}, Players: {team_players}")
-
-            except Exception as e:
-                print(f"Error processing a team block: {e}")
-
+        # One round trip for the whole expanded game block, then parse it locally
+        game_html = latest_game.get_attribute("outerHTML")
+        teams_data = parse_game(game_html)
     except Exception as e:
-        print(f"Error extracting team data: {e}")
+        log.error(f"Error extracting team data: {e}")
+        return {}
+
+    log.info(f"Found {len(teams_data)} team blocks. Processing...")
+    for team_number, data in teams_data.items():
+        log.debug(f"Stored {team_number}: Placement: {data['placement']}, Kills: {data['kills']}, Players: {data['players']}")
 
     return teams_data
 
@@ -219,60 +139,47 @@ def assign_team_names(teams_data):
     """ Assigns correct team names using the majority rule on first detection and persists for future games. """
     global team_mappings
 
-    print("Assigning team names based on player priority rule.")
+    log.info("Assigning team names based on player priority rule.")
 
     for team_number, data in teams_data.items():
         if team_number in team_mappings:
-
             teams_data[team_number]["team_name"] = team_mappings[team_number]
-            print(f"Reused previous mapping: {team_number} → {team_mappings[team_number]}")
+            log.debug(f"Reused previous mapping: {team_number} → {team_mappings[team_number]}")
+
+    # Unmapped teams are matched together, so no two of them can end up with the same tag
+    unmapped = {team_number: data["players"] for team_number, data in teams_data.items() if team_number not in team_mappings}
+    assignment = team_index.assign(unmapped, exclude=set(team_mappings.values()))
+    for team_number in unmapped:
+        if team_number not in assignment:
+            log.debug(f"No registered team matches {team_number}: {unmapped[team_number]}")
             continue
-
-
-        player_team_counts = {}
-
-        print(f"\nProcessing {team_number}: Players: {data['players']}")
-
-        for team_name, team_info in teams.items():
-            for player in data["players"]:
-                if player in team_info["players"]:
-                    if team_name not in player_team_counts:
-                        player_team_counts[team_name] = 0
-                    if player == team_info["captain"]:
-                        player_team_counts[team_name] += 3  
-                        print(f"{player} is a Captain of {team_name} (+3 points)")
-                    else:
-                        player_team_counts[team_name] += 2  
-                        print(f"{player} is a Member of {team_name} (+2 points)")
-
-
-        if player_team_counts:
-            best_team = max(player_team_counts, key=player_team_counts.get)
-            print(f"Assigned {team_number} to {best_team} with {player_team_counts[best_team]} points")
-            team_mappings[team_number] = best_team 
-            teams_data[team_number]["team_name"] = best_team  
+        tag, points = assignment[team_number]
+        log.debug(f"Assigned {team_number} to {tag} with {points} points")
+        team_mappings[team_number] = tag
+        teams_data[team_number]["team_name"] = tag
 
     return teams_data
 
 
 
 def update_spreadsheet(processed_games_data):
-    """ Updates Google Sheets with the latest game results using team tags, ensuring Game 1 updates first. """
+    """ Updates Google Sheets with the game results using team tags, sending only cells that changed. """
 
-    print("Performing first batch update for Game 1 (Writing Team Tags and Placements)...")
+    log.debug("Preparing batch update for Game 1 (Writing Team Tags and Placements)...")
 
+    # One batch_get up front; every row lookup and change check after this is local
+    scoreboard = ScoreboardMirror(worksheet)
 
     first_game_data = processed_games_data[0]  
-    placement_column = "B"
-    kills_column = "C"
-
-    existing_teams = worksheet.col_values(1) 
+    placement_column, kills_column = game_columns(0)
 
     batch_updates = []
+    team_rows = {}
 
 
     for i, (team_tag, team_info) in enumerate(first_game_data.items()):
         team_row = base_team_row + i  
+        team_rows[team_tag] = team_row
         batch_updates.append({"range": f"A{team_row}", "values": [[team_tag]]})
 
         formatted_placement = f"{team_info['placement']} Place"
@@ -280,28 +187,16 @@ def update_spreadsheet(processed_games_data):
         batch_updates.append({"range": f"{kills_column}{team_row}", "values": [[team_info["kills"]]]})
 
 
-    worksheet.batch_update(batch_updates)
-    print("Game 1 batch update sent.")
-
-
-    time.sleep(3)
-
-
-    batch_updates = []  
     for game_index, game_data in enumerate(processed_games_data[1:], start=1):
-        placement_column = chr(66 + (game_index * 2))  
-        kills_column = chr(67 + (game_index * 2))  
-
-        print(f"Preparing batch update for Game {game_index + 1} → Columns: {placement_column}, {kills_column}")
+        placement_column, kills_column = game_columns(game_index)
 
-        existing_teams = worksheet.col_values(1)  
+        log.debug(f"Preparing batch update for Game {game_index + 1} → Columns: {placement_column}, {kills_column}")
 
         for team_tag, team_info in game_data.items():
             try:
-                if team_tag in existing_teams:
-                    team_row = existing_teams.index(team_tag) + 1  
-                else:
-                    print(f"Could not find {team_tag} in Column A for Game {game_index + 1}. Skipping...")
+                team_row = team_rows.get(team_tag) or scoreboard.row_of(team_tag)
+                if team_row is None:
+                    log.warning(f"Could not find {team_tag} in Column A for Game {game_index + 1}. Skipping...")
                     continue
 
                 formatted_placement = f"{team_info['placement']} Place"
@@ -309,29 +204,137 @@ def update_spreadsheet(processed_games_data):
                 batch_updates.append({"range": f"{kills_column}{team_row}", "values": [[team_info["kills"]]]})
 
             except Exception as e:
-                print(f"Error preparing update for {team_tag}: {e}")
+                log.warning(f"Error preparing update for {team_tag}: {e}")
+
+    if WRITE_TOTALS:
+        # Points, tie-breakers and rank for every team, as one block in the same batch_update
+        session = ScoringSession.from_games(processed_games_data)
+        totals = session.totals_update(team_rows, totals_column(max(len(processed_games_data), SERIES_LENGTH)),
+                                       HEADER_ROW, load_rules())
+        if totals:
+            batch_updates.append(totals)
+
+    # sheet1 starts out 26 columns wide; 13+ games or the totals of 11+ would run past Z
+    ensure_grid(worksheet, batch_updates)
+    changed = scoreboard.write(batch_updates, send_batch)
+    if changed:
+        log.info(f"Batch update sent: {len(changed)} of {len(batch_updates)} update(s) changed.")
+    else:
+        log.info("Sheet already up to date. No updates sent.")
+
+    log.info("Spreadsheet update complete.")
+
+
 
 
-    if batch_updates:
-        worksheet.batch_update(batch_updates)
-        print("Batch update sent for Games 2+.")
+def send_batch(updates):
+    metrics.inc("scrims_sheets_api_calls_total", method="batch_update")
+    with metrics.timer("scrims_sheets_api_seconds", method="batch_update"):
+        worksheet.batch_update(updates)
+    metrics.inc("scrims_sheet_cells_written_total", len(updates))
+
+
+def build_source(source_name, driver, record_dir=None, pool=None):
+    """ Picks the MatchSource for a run: 'selenium', 'json' or 'replay:<fixture dir>'. """
+    if source_name.startswith("replay:"):
+        source = ReplayMatchSource(source_name.split(":", 1)[1])
+    elif source_name == "json":
+        source = JsonMatchSource()
     else:
-        print("No updates queued for Games 2+.")
+        source = SeleniumMatchSource(driver, pool=pool)
 
-    print("Spreadsheet update complete.")
+    if record_dir:
+        source = RecordingMatchSource(source, record_dir)
+    return source
 
 
+def run_batch(num_games, pool=None, source_name="selenium", record_dir=None, store_path=STORE_FILE, tab=None, job=None):
+    """ Processes and logs the past `num_games` Custom Games with a browser borrowed from the pool. """
+    global driver, worksheet
 
+    team_index.refresh()
+    worksheet = open_worksheet(tab)
+    store = MatchStore(store_path)
 
-if __name__ == "__main__":
-    num_games = int(sys.argv[1]) if len(sys.argv) > 1 else 5
-    print(f"Processing the past {num_games} Custom Games...")
-    processed_games_data = process_past_games(num_games)
+    log.info(f"Processing the past {num_games} Custom Games...")
+    try:
+        if source_name == "selenium":
+            pool = pool or get_pool()
+            with pool.session() as pooled_driver:
+                driver = pooled_driver
+                processed_games_data = process_past_games(num_games, build_source(source_name, driver, record_dir, pool), store, job)
+        else:
+            source = build_source(source_name, None, record_dir)
+            try:
+                processed_games_data = process_past_games(num_games, source, store, job)
+            finally:
+                source.close()
+    finally:
+        store.close()
 
     if processed_games_data:
-        print("Calling update_spreadsheet() to log data...")
-        update_spreadsheet(processed_games_data)
+        log.info("Calling update_spreadsheet() to log data...")
+        with metrics.stage("write"):
+            update_spreadsheet(processed_games_data)
+        if job:
+            job.report("sheet_written", games=len(processed_games_data), tab=worksheet.title)
     else:
-        print("No valid game data found. Skipping spreadsheet update.")
-    print("Completed batch processing.")
+        log.info("No valid game data found. Skipping spreadsheet update.")
+    log.info("Completed batch processing.")
+    return processed_games_data
+
+
+def rebuild_from_store(num_games, store_path=STORE_FILE, tab=None):
+    """ Rewrites the spreadsheet from the last `num_games` stored games, with no browser at all. """
+    global worksheet
+
+    worksheet = open_worksheet(tab)
+    store = MatchStore(store_path)
+    try:
+        matches = store.recent_matches(num_games)
+        if matches:
+            store.mark_run([match["game_key"] for match in matches], worksheet.title, uuid.uuid4().hex)
+    finally:
+        store.close()
+
+    if not matches:
+        log.info("No stored games found. Skipping spreadsheet update.")
+        return []
+
+    processed_games_data = []
+    for match in matches:
+        processed_games_data.append({
+            match["team_tags"].get(team_number, team_number): {"placement": team_info["placement"], "kills": team_info["kills"]}
+            for team_number, team_info in match["teams"].items()
+        })
+
+    log.info(f"Rebuilding the spreadsheet from {len(matches)} stored games...")
+    update_spreadsheet(processed_games_data)
+    log.info("Completed batch processing.")
+    return processed_games_data
 
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Log the past N Custom Games to the scrims sheet.")
+    parser.add_argument("num_games", nargs="?", type=int, default=5)
+    parser.add_argument("--source", default="selenium", help="selenium, json or replay:<fixture dir>")
+    parser.add_argument("--record", metavar="DIR", help="save every fetched match as a replayable fixture")
+    parser.add_argument("--from-store", action="store_true", help="rebuild the sheet from stored games without scraping")
+    parser.add_argument("--tab", help="worksheet tab to write to (created if missing); defaults to the first sheet")
+    args = parser.parse_args()
+
+    configure_logging()
+    # Run outside the bot, progress reaches it over the event bus instead of the job runner
+    publisher = EventPublisher()
+    job = Job("batch", listener=publisher.publish)
+    try:
+        if args.from_store:
+            rebuild_from_store(args.num_games, tab=args.tab)
+        else:
+            run_batch(args.num_games, source_name=args.source, record_dir=args.record, tab=args.tab, job=job)
+            get_pool().close()
+    except Exception as e:
+        job.report("error", error=str(e), recovered=False)
+        raise
+    finally:
+        publisher.close()
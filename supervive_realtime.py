@@ -1,320 +1,147 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import WebDriverException
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
-import json
+import argparse
+import asyncio
 import time
 import sys
 import re
-import hashlib
 
+from analytics import Rollups
+from browser_pool import BrowserPool, get_pool
+from event_bus import EventPublisher
+from jobs import Job, JobCancelled
+from match_source import DEFAULT_PROFILE_URL
+from match_store import MatchStore
+from metrics import configure_logging, get_logger, metrics
+from observers import ObserverScheduler, ProfileObserver, observer_profiles
+from opgg_parser import parse_game
+from scoreboard import ScoreboardMirror
+from scoring import WRITE_TOTALS, ScoringSession, load_rules
+from sheet_layout import HEADER_ROW, SeriesTabs, ensure_grid, game_columns, games_recorded, totals_column
+from sheets_queue import SheetWriteQueue
+from team_index import TeamIndex
+from waits import Backoff
 
-sys.stdout.reconfigure(encoding='utf-8')  
 
-TEAM_FILE = "teams.json"
+sys.stdout.reconfigure(encoding='utf-8')  
 
-def load_teams():
-    try:
-        with open(TEAM_FILE, "r", encoding="utf-8") as file:
-            return json.load(file)
-    except (FileNotFoundError, json.JSONDecodeError):
-        print("Warning: Could not load teams.json. Using empty fallback.")
-        return {}  
+log = get_logger("realtime")
 
-teams = load_teams()  
+# Player -> registered team lookup, refreshed from teams.json / players.json when they change
+team_index = TeamIndex()
 
 
 json_key_file = "" # .json API KEY FILE HERE
 spreadsheet_name = "Supervive Scrims"
+LOBBY_NAME = "Lobby 1"
 base_team_row = 3  
 
 scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-creds = ServiceAccountCredentials.from_json_keyfile_name(json_key_file, scope)
-gc = gspread.authorize(creds)
-worksheet = gc.open(spreadsheet_name).sheet1
-
-
-options = webdriver.ChromeOptions()
-options.add_argument("--headless")  
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
 
+# Opened in main() so importing this module has no side effects
+worksheet = None
+sheet_writes = None
+scoreboard = None
+series_tabs = None
+series_number = None
+observer = None  # the ProfileObserver polling for new games in single-profile mode
+match_store = None
+rollups = None  # cross-session team/player stats, updated as each game is stored
+job = None  # progress and stop flag; the bot passes its own, the CLI makes a standalone one
 
-team_mappings = {}
-processed_games = 0  
 
-time.sleep(15)
+def open_spreadsheet():
+    creds = ServiceAccountCredentials.from_json_keyfile_name(json_key_file, scope)
+    gc = gspread.authorize(creds)
+    return gc.open(spreadsheet_name)
 
-processed_games = set()  
 
-def fetch_new_games():
-    fetch_button = driver.find_element(By.XPATH, "//button[contains(text(), 'Fetch New Matches')]")
-    fetch_button.click()
-    print("Clicked 'Fetch New Matches' to refresh data.")
-    time.sleep(5)  
+team_mappings = {}
 
-def generate_game_key(game_text):
-    """Generate a unique key for the game based on its details, excluding timestamps."""
+retry_backoff = Backoff(initial=2, maximum=30)
 
-    cleaned_text = re.sub(r"(\d+\s+minutes\s+ago|\d+\s+hours\s+ago|an hour ago|\d+\s+days\s+ago)", "", game_text, flags=re.IGNORECASE)
-    
-
-    game_hash = hashlib.md5(cleaned_text.encode()).hexdigest()
-    return game_hash
+def retry_later(message):
+    """ Log why this poll found nothing and back off before the next one. """
+    metrics.inc("scrims_polls_total", outcome="no_new_game")
+    delay = retry_backoff.sleep(job.sleep)
+    log.info(f"{message} Retried after {delay:.1f}s.")
 
 def fetch_latest_custom_game():
-    """ Find the latest completed Custom Game and open it. """
-    first_attempt = True  
-
+    """ Poll the observed profile until a new, recent Custom Game shows up, then return it expanded. """
     while True:
-        driver.get("https://supervive.op.gg/players/steam-LilMeap%230001") # OP.GG of user in the games
-        time.sleep(5)
-
-
-        if first_attempt:
-            try:
-                fetch_new_games()
-            except:
-                print("'Fetch New Matches' button not found on first attempt.")
-
-            first_attempt = False  
-
         try:
-            match_containers = driver.find_elements(By.CLASS_NAME, "space-y-2")
-            if len(match_containers) < 6:
-                print("Could not locate the correct match history block. Retrying...")
-                time.sleep(15)
-                continue
-
-            match_history_block = match_containers[5]  
-            past_games = match_history_block.find_elements(By.XPATH, "./div")  
-
-            if not past_games:
-                print("No games found. Retrying...")
-                time.sleep(15)
-                continue
-
-            print(f"Found {len(past_games)} possible game blocks. Checking first Custom Game...")
-
-            latest_game = None
-            
-            first_game = past_games[0]
-
-            try:
-                
-                custom_game_label = first_game.find_elements(By.XPATH, ".//div[contains(@class, 'text-xs font-bold text-red-500')]")
-                
-                if custom_game_label and "Custom Game" in custom_game_label[0].text:
-                    print(f"Found latest Custom Game at position 1.")
-
-                   
-                    time_label_element = first_game.find_element(By.XPATH, ".//div[contains(@class, 'text-muted-foreground')]")
-                    time_label = time_label_element.text.strip().lower()
-                    print(f"Game time label: {time_label}")
-
-
-                    if "minute" in time_label:  
-                        match = re.search(r"(\d+)", time_label)  
-                        if match:
-                            minutes_ago = int(match.group(1))
-                            if minutes_ago > 5:
-                                print("Game is older than 5 minutes. Fetching new matches.")
-                                try:
-                                    fetch_new_games()
-                                    continue  
-                                except:
-                                    print("'Fetch New Matches' button not found.")
-                                time.sleep(30)
-                                continue  
-                    elif "hour" in time_label or "day" in time_label:  
-                        print("Game is too old. Skipping & waiting for a new match.")
-                        fetch_new_games()
-                        continue  
-
-
-                    game_text = first_game.text.strip()
-                    if game_text in processed_games:
-                        print("Same game found. Clicking 'Fetch New Matches' and retrying...")
-                        try:
-                            fetch_new_games()
-                        except:
-                            print("'Fetch New Matches' button not found.")
-
-
-                        time.sleep(30)  
-                        continue  
-
-                    latest_game = first_game  
-
-            except:
-                print("Error checking first game. Retrying...")
-                time.sleep(30)
-                continue  
-
-            if not latest_game:
-                print("No recent Custom Game found. Waiting...")
-                time.sleep(30)
-                continue  
-
-
-            while True:
-                try:
-                    dropdown_button = latest_game.find_element(By.XPATH, ".//button[contains(@class, 'items-center')]")
-                    dropdown_button.click()
-                    print("Clicked dropdown via button.")
-                    time.sleep(3) 
-                    break  
-                except Exception as e:
-                    print(f"Failed to click dropdown, game might be in progress. Retrying in 30s... {e}")
-                    time.sleep(30)  
-
-            return latest_game  
-
-        except Exception as e:
-            print(f"Error finding Custom Game: {e}. Retrying...")
-            time.sleep(15)
+            found = observer.poll(known=match_store.has_game, sleep=job.sleep)
+        except WebDriverException as e:
+            retry_later(f"Error finding Custom Game: {e}.")
+            continue
+        if found is None:
+            retry_later("No new game yet. Waiting for a new match.")
+            continue
+        retry_backoff.reset()
+        metrics.inc("scrims_polls_total", outcome="new_game")
+        return found
 
 
 def extract_team_data(latest_game):
-    """ Extracts team placements, Team #X, and kill counts """
-    teams_data = {}
+    """ Extracts team placements, Team #X, kill counts and each player's K/D/A """
     try:
+        # One round trip for the whole expanded game block, then parse it locally
+        game_html = latest_game.get_attribute("outerHTML")
+        teams_data = parse_game(game_html)
+    except Exception as e:
+        log.error(f"Error extracting team data: {e}")
+        return {}
 
-        team_blocks = latest_game.find_elements(By.XPATH, ".//div[contains(@class, 'rounded') and contains(@class, 'border-opacity')]")
-
-
-        print(f"Found {len(team_blocks)} team blocks. Processing...")
-
-        for team in team_blocks:
-            try:
-
-                team_number_element = team.find_element(By.XPATH, ".//div[@class='text-muted-foreground']")
-                team_number = team_number_element.text.strip()
-                print(f"Found {team_number} in team block.")
-
-
-                try:
-                    placement_element = team.find_element(By.XPATH, ".//div[contains(@class, 'flex items-center gap-2')]/div[contains(@class, 'font-bold')]")
-                    placement = placement_element.text.strip()
-                    print(f"Placement for {team_number}: {placement}")
-                except:
-                    placement = "Unknown"
-                    print(f"Could not find placement for {team_number}.")
-
-
-                players = team.find_elements(By.XPATH, ".//div[contains(@class, 'cursor-help')]")
-                total_kills = 0
-                team_players = []
-
-                for player in players:
-                    player_name = player.text.strip()
-                    team_players.append(player_name)
-                    print(f"Found player: {player_name} in {team_number}")
-
-                try:
-
-                    player_rows = team.find_elements(By.XPATH, ".//div[contains(@class, 'flex items-center justify-between rounded w-full')]")
-                    num_players = len(player_rows)
-
-
-                    kill_values = []
-                    try:
-
-                        kda_blocks = team.find_elements(By.XPATH, ".//div[contains(@class, 'grid grid-cols-4 gap-1 text-[11px]')]/div[contains(@class, 'flex flex-col items-center w-[50px]')]/div[@class='font-medium']")
-                        
-                        for kda in kda_blocks:
-                            kda_text = kda.text.strip()
-                            if "/" in kda_text:  
-                                kills = int(kda_text.split('/')[0])  
-                                kill_values.append(kills)
-
-                        if len(kill_values) != num_players:
-                            print(f"Data mismatch: Players ({num_players}) != KDA values ({len(kill_values)})")
-                        else:
-                            print(f"Extracted kills: {kill_values}")
-
-                    except Exception as e:
-                        print(f"Error extracting kills list: {e}")
-
-
-                    for i, player_row in enumerate(player_rows):
-                        try:
-                            player_name = player_row.find_element(By.XPATH, ".//a").text.strip()  
-
-                            if i < len(kill_values):  
-                                kills = kill_values[i]
-                                total_kills += kills
-                                
-                            else:
-                                print(f"Could not find kills for {player_name}")
-
-                        except Exception:
-                            print(f"Could not extract player data properly.")
-                except Exception as e:
-                    print(f"Error extracting kills: {e}")
-
-
-
-
+    log.info(f"Found {len(teams_data)} team blocks. Processing...")
+    for team_number, data in teams_data.items():
+        log.debug(f"Stored {team_number}: Placement: {data['placement']}, Kills: {data['kills']}, Players: {data['players']}")
 
-                teams_data[team_number] = {"placement": placement, "kills": total_kills, "players": team_players}
-                print(f"Stored {team_number}: Placement: {placement}, Kills: {total_kills}, Players: {team_players}")
+    return teams_data
 
-            except Exception as e:
-                print(f"Error processing a team block: {e}")
 
-    except Exception as e:
-        print(f"Error extracting team data: {e}")
 
-    return teams_data
+games_since_reset = 0  
 
+def start_next_series():
+    """ Archive the finished series tab and point the queue and mirror at a fresh one. """
+    global worksheet, scoreboard, series_number, games_since_reset
 
+    sheet_writes.flush()
+    worksheet, series_number = series_tabs.next_series(worksheet, series_number)
+    sheet_writes.retarget(worksheet)
+    scoreboard = ScoreboardMirror(worksheet)
+    team_mappings.clear()
+    games_since_reset = 0
 
-team_mappings = {} 
-games_since_reset = 0  
 
 def assign_team_names(teams_data):
-    """ Assigns correct team names using the majority rule on first detection and persists for 5 games. """
+    """ Assigns correct team names using the majority rule on first detection and persists for the series. """
     global team_mappings, games_since_reset
 
 
-    if games_since_reset >= 5:
-        print("Resetting team mappings. New series detected.")
-        team_mappings.clear()
-        games_since_reset = 0
+    team_index.refresh()
+
+    if games_since_reset >= series_tabs.series_length:
+        log.info("Resetting team mappings. New series detected.")
+        start_next_series()
 
     for team_number, data in teams_data.items():
         if team_number in team_mappings:
-
             teams_data[team_number]["team_name"] = team_mappings[team_number]
-            print(f"Reused previous mapping: {team_number} → {team_mappings[team_number]}")
+            log.debug(f"Reused previous mapping: {team_number} → {team_mappings[team_number]}")
+
+    # Unmapped teams are matched together, so no two of them can end up with the same tag
+    unmapped = {team_number: data["players"] for team_number, data in teams_data.items() if team_number not in team_mappings}
+    assignment = team_index.assign(unmapped, exclude=set(team_mappings.values()))
+    for team_number in unmapped:
+        if team_number not in assignment:
+            log.debug(f"No registered team matches {team_number}: {unmapped[team_number]}")
             continue
-
-
-        player_team_counts = {}
-
-        print(f"\nProcessing {team_number}: {data['players']}")
-
-        for team_name, team_info in teams.items():
-            for player in data["players"]:
-                if player in team_info["players"]:
-                    if team_name not in player_team_counts:
-                        player_team_counts[team_name] = 0
-                    if player == team_info["captain"]:
-                        player_team_counts[team_name] += 3  
-                        print(f"{player} is a Captain of {team_name} (+3 points)")
-                    else:
-                        player_team_counts[team_name] += 2  
-                        print(f"{player} is a Member of {team_name} (+2 points)")
-
-        if player_team_counts:
-            best_team = max(player_team_counts, key=player_team_counts.get)
-            print(f"Assigned {team_number} to {best_team} with {player_team_counts[best_team]} points")
-            team_mappings[team_number] = best_team
-            teams_data[team_number]["team_name"] = best_team
+        tag, points = assignment[team_number]
+        log.debug(f"Assigned {team_number} to {tag} with {points} points")
+        team_mappings[team_number] = tag
+        teams_data[team_number]["team_name"] = tag
 
     return teams_data
 
@@ -336,18 +163,20 @@ def format_placement(placement):
         return "10th Place"  
 
 
-def update_spreadsheet(teams_data):
-    """ Updates Google Sheets with the latest game results. """
+def update_spreadsheet(teams_data, on_sent=None):
+    """ Queues the latest game results; the write-behind queue sends them to Google Sheets in one batch.
+
+    `on_sent()` is called once the batch carrying them has reached the sheet.
+    """
     global games_since_reset
 
 
     game_index = games_since_reset  
-    placement_column = chr(66 + (game_index * 2))  
-    kills_column = chr(67 + (game_index * 2))  
-    print(f"Updating spreadsheet for Game {game_index + 1} → Columns: {placement_column}, {kills_column}")
+    placement_column, kills_column = game_columns(game_index)
+    log.debug(f"Updating spreadsheet for Game {game_index + 1} → Columns: {placement_column}, {kills_column}")
 
 
-    existing_teams = worksheet.col_values(1)  
+    updates = []
 
     for team_number, team_data in teams_data.items():
         try:
@@ -355,39 +184,186 @@ def update_spreadsheet(teams_data):
             if team_number in team_mappings:
                 team_tag = team_mappings[team_number]
             else:
-                print(f"No mapping found for {team_number}, using fallback.")
+                log.warning(f"No mapping found for {team_number}, using fallback.")
                 team_tag = team_number  
 
 
             if games_since_reset == 0:
 
                 team_row = base_team_row + list(teams_data.keys()).index(team_number)
-                worksheet.update(f"A{team_row}", [[team_tag]])
+                updates.append({"range": f"A{team_row}", "values": [[team_tag]]})
             else:
 
-                if team_tag in existing_teams:
-                    team_row = existing_teams.index(team_tag) + 1  
-                else:
-                    print(f"Could not find {team_tag} in Column A. Skipping...")
+                # Column A is looked up in the local mirror instead of re-read from the sheet
+                team_row = scoreboard.row_of(team_tag)
+                if team_row is None:
+                    log.warning(f"Could not find {team_tag} in Column A. Skipping...")
                     continue
 
 
             formatted_placement = f"{team_data['placement']} Place"  
-            worksheet.update(f"{placement_column}{team_row}", [[formatted_placement]])
-            worksheet.update(f"{kills_column}{team_row}", [[team_data["kills"]]])
+            updates.append({"range": f"{placement_column}{team_row}", "values": [[formatted_placement]]})
+            updates.append({"range": f"{kills_column}{team_row}", "values": [[team_data["kills"]]]})
 
-            print(f"Updated {team_tag} → Placement: {formatted_placement}, Kills: {team_data['kills']}")
+            log.debug(f"Queued {team_tag} → Placement: {formatted_placement}, Kills: {team_data['kills']}")
 
         except Exception as e:
-            print(f"Error updating {team_tag}: {e}")
+            log.warning(f"Error updating {team_tag}: {e}")
+
+    changed = scoreboard.write(updates, lambda changed_updates: sheet_writes.write_many(changed_updates, on_sent, scoreboard.mark_unsent))
+    log.info(f"{len(changed)} of {len(updates)} cell(s) changed and queued for the sheet.")
 
     games_since_reset += 1 
 
 
-while True:
-    latest_game = fetch_latest_custom_game()
-    teams_data = extract_team_data(latest_game)
-    teams_data = assign_team_names(teams_data)
-    update_spreadsheet(teams_data)
-    print("Game processed. Waiting for next game...")
-    time.sleep(60)
+def update_totals():
+    """ Re-score the series from the store and queue the totals block as one range write. """
+    tab, matches = match_store.latest_tab_matches()
+    if tab != worksheet.title:
+        return
+    session = ScoringSession.from_matches(matches)
+    # Rules are re-read every game, so a scoring.json change re-scores the whole series on the next write
+    totals = session.totals_update(scoreboard.team_rows(base_team_row), totals_column(series_tabs.series_length),
+                                   HEADER_ROW, load_rules())
+    if totals:
+        # Tabs created before they were sized for the totals block are widened once
+        ensure_grid(worksheet, [totals])
+    if totals and scoreboard.write([totals], lambda changed: sheet_writes.write_many(changed, on_failed=scoreboard.mark_unsent)):
+        log.info(f"Queued totals for {len(session.tags)} team(s).")
+
+
+def seconds_since_finish(time_label):
+    """ Rough age of a game from op.gg's relative time label: '3 minutes ago' -> 180, 'a few seconds ago' -> 0. """
+    match = re.search(r"(\d+|an?)\s*(second|minute|hour)", time_label or "")
+    if not match:
+        return 0
+    amount = 1 if match.group(1) in ("a", "an") else int(match.group(1))
+    return amount * {"second": 1, "minute": 60, "hour": 3600}[match.group(2)]
+
+
+def process_next_game():
+    """ Wait for the next finished Custom Game and record it: sheet, store, totals. """
+    latest_game, record = fetch_latest_custom_game()
+    job.report("game_detected", game_key=record["game_key"], time_label=record["time_label"])
+    with metrics.stage("extract"):
+        record["teams"] = extract_team_data(latest_game)
+    job.report("game_extracted", game_key=record["game_key"], teams=len(record["teams"]))
+    record_game(record)
+
+
+def record_game(record):
+    """ Assign, write, store and total one extracted game. """
+    finished_at = time.time() - seconds_since_finish(record["time_label"])
+
+    with metrics.stage("assign"):
+        teams_data = assign_team_names(record["teams"])
+
+    # Bound after assigning, which may have started the next series tab; the queue calls this later
+    def reached_sheet(finished_at=finished_at, game_key=record["game_key"], tab=worksheet.title):
+        metrics.observe("scrims_game_to_sheet_seconds", time.time() - finished_at)
+        job.report("sheet_written", game_key=game_key, tab=tab)
+
+    with metrics.stage("write"):
+        update_spreadsheet(teams_data, on_sent=reached_sheet)
+    record["teams"] = teams_data
+    with metrics.stage("store"):
+        match_store.save_match(record, team_mappings, worksheet.title)
+        rollups.ingest()
+    if WRITE_TOTALS:
+        with metrics.stage("totals"):
+            update_totals()
+    metrics.inc("scrims_games_processed_total", source="realtime")
+    job.report("game_processed", game_key=record["game_key"], tab=worksheet.title, game_number=games_since_reset,
+               teams={team_mappings.get(team_number, team_number): data["placement"] for team_number, data in teams_data.items()})
+    log.info("Game processed. Waiting for next game...")
+
+
+def process_games_forever():
+    while True:
+        job.check()
+        process_next_game()
+
+
+def set_job(new_job):
+    # main() takes `job` as a parameter for the job runner, so the module global is set here
+    global job
+    job = new_job
+
+
+def watch_observers(profiles):
+    """ Poll several profiles at once, each with its own browser, and record every lobby the first time one shows it. """
+    pool = BrowserPool(size=len(profiles))
+    scheduler = ObserverScheduler(profiles, pool, on_game=record_game, extract=extract_team_data,
+                                  known=match_store.has_game, job=job, lobby_known=match_store.has_lobby)
+    try:
+        asyncio.run(scheduler.run())
+    finally:
+        pool.close()
+
+
+def main(lobby=LOBBY_NAME, job=None, observers=None):
+    """ Watch for finished Custom Games until `job` is cancelled.
+
+    By default one profile is watched with a browser borrowed from the shared pool; `observers`
+    ("auto", or comma separated player names / op.gg URLs) watches several profiles at once.
+    """
+    global observer, worksheet, sheet_writes, scoreboard, match_store, rollups, series_tabs, series_number, games_since_reset
+
+    job = job or Job("realtime")
+    set_job(job)
+
+    series_tabs = SeriesTabs(open_spreadsheet(), lobby)
+    worksheet, series_number = series_tabs.open_series()
+    sheet_writes = SheetWriteQueue(worksheet)
+    scoreboard = ScoreboardMirror(worksheet)
+    # Pick an interrupted series back up where it stopped instead of overwriting its first games
+    games_since_reset = games_recorded(scoreboard, base_team_row)
+    log.info(f"Recording into {worksheet.title}, {games_since_reset} game(s) already recorded.")
+    match_store = MatchStore()
+    rollups = Rollups(match_store)
+    pool = get_pool()
+    job.report("watching", tab=worksheet.title, games_recorded=games_since_reset)
+
+    try:
+        if observers:
+            profiles = observer_profiles(observers)
+            if not profiles:
+                raise ValueError(f"No op.gg profiles found for observers '{observers}'.")
+            watch_observers(profiles)
+            return
+        # One observer for the whole run, so games it already judged stay skipped across browser swaps
+        observer = ProfileObserver(DEFAULT_PROFILE_URL)
+        while True:
+            with pool.session() as driver:
+                observer.attach(driver)
+                try:
+                    process_games_forever()
+                except WebDriverException as e:
+                    # The pool discards the crashed browser on release; the next session gets a fresh one
+                    log.warning(f"Browser session failed: {e}. Getting a fresh browser...")
+                    job.report("error", error=f"Browser session failed: {e}", recovered=True)
+    except JobCancelled:
+        raise
+    except Exception as e:
+        job.report("error", error=str(e), recovered=False)
+        raise
+    finally:
+        sheet_writes.close(timeout=30)
+        match_store.close()
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Log finished Custom Games to the scrims sheet as they happen.")
+    parser.add_argument("--lobby", default=LOBBY_NAME, help="lobby name used for this lobby's series tabs")
+    parser.add_argument("--observers", help='"auto" or comma separated player names / op.gg URLs to watch at once')
+    args = parser.parse_args()
+
+    configure_logging()
+    # Run outside the bot, progress reaches it over the event bus instead of the job runner
+    publisher = EventPublisher()
+    try:
+        main(args.lobby, job=Job("realtime", listener=publisher.publish), observers=args.observers)
+    finally:
+        publisher.close()
+
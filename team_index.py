@@ -0,0 +1,294 @@
+import difflib
+import json
+import os
+from functools import lru_cache
+from urllib.parse import unquote
+
+from metrics import get_logger
+
+
+TEAM_FILE = "teams.json"
+PLAYERS_FILE = "players.json"
+
+CAPTAIN_POINTS = 3
+MEMBER_POINTS = 2
+FUZZY_CUTOFF = 0.85  # difflib ratio a lobby name needs to count as a rostered player it does not match exactly
+RESOLVE_CACHE_SIZE = 2048  # lobby names remembered per roster version
+MIN_MATCH_POINTS = 4  # below this a lobby team is treated as unregistered (e.g. one rostered sub in a pickup team)
+
+log = get_logger("teams")
+
+
+def player_key(value):
+    """ Canonical key for a player given a display name, 'Name#tag' or an op.gg profile URL.
+
+    'https://supervive.op.gg/players/steam-Kumcho%20Vulcho%23kur', 'Kumcho Vulcho#kur'
+    and 'kumcho vulcho' all map to 'kumcho vulcho'.
+    """
+    value = unquote(value.strip())
+    if "/players/" in value:
+        value = value.rstrip("/").rsplit("/", 1)[-1]
+        if value.startswith("steam-"):
+            value = value[len("steam-"):]
+    return value.split("#", 1)[0].strip().casefold()
+
+
+def roster_keys(team_info, url_to_name):
+    """ Canonical keys of a team's roster, whether 'players' is a list of URLs or a name -> URL dict. """
+    players = team_info.get("players", [])
+    entries = []
+    if isinstance(players, dict):
+        for name, url in players.items():
+            entries.append(name or url)
+    else:
+        for entry in players:
+            entries.append(url_to_name.get(entry, entry))
+
+    keys = []
+    for entry in entries:
+        if entry:
+            key = player_key(entry)
+            if key and key not in keys:
+                keys.append(key)
+    return keys
+
+
+def max_weight_matching(weights):
+    """ {row: column} pairing rows with distinct columns for the largest total weight (Hungarian algorithm).
+
+    Works on any rows x columns array; when there are more rows than columns, some rows stay unmatched.
+    """
+    import numpy as np
+
+    weights = np.asarray(weights, dtype=float)
+    transposed = weights.shape[0] > weights.shape[1]
+    if transposed:
+        weights = weights.T
+    rows, columns = weights.shape
+    if rows == 0:
+        return {}
+
+    # Usual case: every row's best column is different, which is already optimal
+    best = weights.argmax(axis=1)
+    if len(np.unique(best)) == rows:
+        matching = {row: int(column) for row, column in enumerate(best)}
+        return {column: row for row, column in matching.items()} if transposed else matching
+
+    # Shortest augmenting paths on the cost matrix, one row at a time (1-based, column 0 is the root)
+    cost = weights.max() - weights
+    u = np.zeros(rows + 1)
+    v = np.zeros(columns + 1)
+    owner = np.zeros(columns + 1, dtype=int)  # row matched to each column, 0 = free
+    way = np.zeros(columns + 1, dtype=int)
+    for row in range(1, rows + 1):
+        owner[0] = row
+        column = 0
+        min_slack = np.full(columns + 1, np.inf)
+        used = np.zeros(columns + 1, dtype=bool)
+        while owner[column] != 0:
+            used[column] = True
+            current_row = owner[column]
+            free = ~used
+            free[0] = False
+            slack = cost[current_row - 1] - u[current_row] - v[1:]
+            better = free[1:] & (slack < min_slack[1:])
+            min_slack[1:][better] = slack[better]
+            way[1:][better] = column
+            candidates = np.where(free, min_slack, np.inf)
+            next_column = int(np.argmin(candidates))
+            delta = candidates[next_column]
+            u[owner[used]] += delta
+            v[used] -= delta
+            min_slack[free] -= delta
+            column = next_column
+        while column != 0:
+            previous = way[column]
+            owner[column] = owner[previous]
+            column = previous
+
+    matching = {int(owner[column]) - 1: column - 1 for column in range(1, columns + 1) if owner[column] != 0}
+    if transposed:
+        return {column: row for row, column in matching.items()}
+    return matching
+
+
+def load_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        log.warning(f"Could not load {path}. Using empty fallback.")
+        return {}
+
+
+def file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class TeamIndex:
+    """ In-memory index from canonical player key to the registered teams (and role weight) they play for.
+
+    Built once from teams.json and players.json, and refreshed team by team when either file changes.
+    """
+
+    def __init__(self, team_file=TEAM_FILE, players_file=PLAYERS_FILE):
+        self.team_file = team_file
+        self.players_file = players_file
+        self.mtimes = (None, None)
+        self.team_entries = {}  # team tag -> raw teams.json entry the index was built from
+        self.team_keys = {}  # team tag -> [(player key, points)]
+        self.players = {}  # player key -> {team tag: points}
+        self.url_to_name = {}
+        self.version = 0
+        self.stale = False
+        self.matrix = None  # (player key -> row, team tags, players x teams points), built per version
+        self.matrix_version = None
+        self.resolve = lru_cache(maxsize=RESOLVE_CACHE_SIZE)(self.lookup)
+        self.refresh(force=True)
+
+    def mark_stale(self):
+        """ Make the next refresh() re-read the files even if their mtimes look unchanged.
+
+        Safe to call from another thread; the index itself is only rebuilt by whoever calls refresh().
+        """
+        self.stale = True
+
+    def refresh(self, force=False):
+        """ Re-read the files if their mtime changed. Returns True when the index changed. """
+        mtimes = (file_mtime(self.team_file), file_mtime(self.players_file))
+        if not force and not self.stale and mtimes == self.mtimes:
+            return False
+        self.stale = False
+        players_changed = force or mtimes[1] != self.mtimes[1]
+        self.mtimes = mtimes
+
+        if players_changed:
+            players = load_json(self.players_file) if mtimes[1] is not None else {}
+            self.url_to_name = {url: name for name, url in players.items() if url}
+
+        teams = load_json(self.team_file) if mtimes[0] is not None else {}
+        changed = False
+        for team_name in list(self.team_entries):
+            if team_name not in teams:
+                self.remove_team(team_name)
+                changed = True
+        for team_name, team_info in teams.items():
+            if players_changed or self.team_entries.get(team_name) != team_info:
+                self.remove_team(team_name)
+                self.add_team(team_name, team_info)
+                changed = True
+
+        if changed:
+            self.version += 1
+            # Names resolved against the old rosters may point elsewhere now
+            self.resolve = lru_cache(maxsize=RESOLVE_CACHE_SIZE)(self.lookup)
+        return changed
+
+    def lookup(self, name):
+        """ Rostered player key for a lobby display name, or None. Use resolve(), its memoized version.
+
+        Exact canonical keys hit a dict; anything else falls back to the closest rostered key, as long
+        as it is close enough and not tied with another one.
+        """
+        key = player_key(name)
+        if key in self.players:
+            return key
+        matches = difflib.get_close_matches(key, self.players, n=2, cutoff=FUZZY_CUTOFF)
+        if not matches:
+            return None
+        if len(matches) == 2:
+            ratios = [difflib.SequenceMatcher(None, key, match).ratio() for match in matches]
+            if ratios[0] == ratios[1]:
+                return None
+        return matches[0]
+
+    def add_team(self, team_name, team_info):
+        captain = team_info.get("captain")
+        captain_key = player_key(captain) if captain else None
+
+        entries = []
+        for key in roster_keys(team_info, self.url_to_name):
+            points = CAPTAIN_POINTS if key == captain_key else MEMBER_POINTS
+            entries.append((key, points))
+            self.players.setdefault(key, {})[team_name] = points
+
+        self.team_entries[team_name] = team_info
+        self.team_keys[team_name] = entries
+
+    def remove_team(self, team_name):
+        for key, _ in self.team_keys.pop(team_name, []):
+            memberships = self.players.get(key)
+            if memberships is not None:
+                memberships.pop(team_name, None)
+                if not memberships:
+                    del self.players[key]
+        self.team_entries.pop(team_name, None)
+
+    def team_points(self, lobby_players):
+        """ {team tag: points} for one lobby team, one dict lookup per player. """
+        points = {}
+        for player in lobby_players:
+            for team_name, player_points in self.players.get(self.resolve(player), {}).items():
+                points[team_name] = points.get(team_name, 0) + player_points
+        return points
+
+    def best_team(self, lobby_players):
+        """ (team tag, points) of the registered team with the most points, or (None, 0). """
+        points = self.team_points(lobby_players)
+        if not points:
+            return None, 0
+        best = max(points, key=points.get)
+        return best, points[best]
+
+    def points_matrix(self):
+        """ Players x registered teams points array, rebuilt only when the roster version changes. """
+        import numpy as np
+
+        if self.matrix_version != self.version:
+            player_rows = {key: row for row, key in enumerate(self.players)}
+            tags = list(self.team_keys)
+            tag_columns = {tag: column for column, tag in enumerate(tags)}
+            points = np.zeros((len(player_rows), len(tags)))
+            for key, memberships in self.players.items():
+                for tag, player_points in memberships.items():
+                    points[player_rows[key], tag_columns[tag]] = player_points
+            self.matrix = (player_rows, tags, points)
+            self.matrix_version = self.version
+        return self.matrix
+
+    def assign(self, lobby, exclude=(), min_points=MIN_MATCH_POINTS):
+        """ {lobby team: (team tag, points)} for a whole lobby of {lobby team: [players]} at once.
+
+        Every registered team is used at most once, picked to maximize the lobby's total points.
+        Tags in `exclude` (already mapped) are left out, and teams scoring under `min_points` stay unassigned.
+        """
+        import numpy as np
+
+        player_rows, tags, points = self.points_matrix()
+        lobby_teams = list(lobby)
+        columns = [column for column, tag in enumerate(tags) if tag not in exclude]
+        if not lobby_teams or not columns:
+            return {}
+
+        members = np.zeros((len(lobby_teams), len(player_rows)))
+        for row, team in enumerate(lobby_teams):
+            for player in lobby[team]:
+                player_row = player_rows.get(self.resolve(player))
+                if player_row is not None:
+                    members[row, player_row] = 1
+        scores = members @ points[:, columns]
+
+        # Teams and tags that cannot reach min_points anywhere are left out of the matching
+        candidate_rows = np.flatnonzero(scores.max(axis=1) >= min_points)
+        candidate_columns = np.flatnonzero(scores.max(axis=0) >= min_points)
+        scores = scores[np.ix_(candidate_rows, candidate_columns)]
+
+        assignment = {}
+        for row, column in max_weight_matching(scores).items():
+            if scores[row, column] >= min_points:
+                tag = tags[columns[candidate_columns[column]]]
+                assignment[lobby_teams[candidate_rows[row]]] = (tag, int(scores[row, column]))
+        return assignment
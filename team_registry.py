@@ -0,0 +1,87 @@
+import asyncio
+import json
+import os
+import tempfile
+
+from metrics import get_logger
+from team_index import TEAM_FILE, load_json
+
+
+log = get_logger("teams")
+
+
+def write_json_atomic(path, data):
+    """ Write `data` to a temp file next to `path` and rename it over `path`, so readers never see half a file. """
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp_path = tempfile.mkstemp(prefix=".teams-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(handle, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class TeamRegistry:
+    """ The bot's in-memory copy of teams.json.
+
+    Edits are serialized with an asyncio lock, written through to disk atomically in a worker
+    thread so the event loop never blocks on file I/O, and announced to subscribers with
+    `callback(tag, entry)` (entry is None when the team was removed).
+    """
+
+    def __init__(self, path=TEAM_FILE):
+        self.path = path
+        self.teams = load_json(path) if os.path.exists(path) else {}
+        self.lock = asyncio.Lock()
+        self.subscribers = []
+        self.version = 0
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def get(self, tag):
+        return self.teams.get(tag)
+
+    async def add_team(self, tag, entry):
+        """ Add or replace a team. Returns the entry it replaced, if any. """
+        async with self.lock:
+            previous = await self.commit(tag, entry)
+        self.notify(tag, entry)
+        return previous
+
+    async def remove_team(self, tag):
+        """ Remove a team. Returns False when no team has that tag. """
+        async with self.lock:
+            if tag not in self.teams:
+                return False
+            await self.commit(tag, None)
+        self.notify(tag, None)
+        return True
+
+    async def commit(self, tag, entry):
+        # Callers hold self.lock, so concurrent edits apply one after another instead of clobbering each other
+        teams = dict(self.teams)
+        previous = teams.get(tag)
+        if entry is None:
+            teams.pop(tag, None)
+        else:
+            teams[tag] = entry
+        await asyncio.to_thread(write_json_atomic, self.path, teams)
+        # Swapped in only after the write succeeded, so memory and disk never disagree
+        self.teams = teams
+        self.version += 1
+        return previous
+
+    def notify(self, tag, entry):
+        for callback in self.subscribers:
+            try:
+                callback(tag, entry)
+            except Exception as e:
+                log.warning(f"Team registry subscriber failed: {e}")
@@ -0,0 +1,199 @@
+import random
+import time
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+from metrics import get_logger
+
+
+PAGE_TIMEOUT = 20  # seconds to wait for the profile page to render its match list
+EXPAND_TIMEOUT = 10  # seconds to wait for a game dropdown to show its team blocks
+FETCH_TIMEOUT = 5  # upper bound on waiting for "Fetch New Matches" to re-render the list
+POLL_FREQUENCY = 0.25
+
+log = get_logger("waits")
+
+MATCH_HISTORY_INDEX = 5  # the match history is the 6th "space-y-2" container on the profile page
+DROPDOWN_BUTTON_XPATH = ".//button[contains(@class, 'items-center')]"
+TEAM_BLOCK_XPATH = ".//div[contains(@class, 'rounded') and contains(@class, 'border-opacity')]"
+FETCH_BUTTON_XPATH = "//button[contains(text(), 'Fetch New Matches')]"
+
+
+class Backoff:
+    """ Exponential backoff with jitter for retry loops. Call reset() after a success. """
+
+    def __init__(self, initial=1.0, maximum=30.0, factor=2.0, jitter=0.1):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.attempt = 0
+
+    def next_delay(self):
+        delay = min(self.maximum, self.initial * (self.factor ** self.attempt))
+        self.attempt += 1
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def sleep(self, wait=time.sleep):
+        """ Sleep for the next delay. Pass a job's sleep() as `wait` to wake up early on cancellation. """
+        delay = self.next_delay()
+        wait(delay)
+        return delay
+
+    def reset(self):
+        self.attempt = 0
+
+
+def wait_until(target, condition, timeout, poll=POLL_FREQUENCY):
+    """ Wait for `condition(target)` to return something truthy, or None on timeout.
+
+    `target` can be the driver or any WebElement; WebDriverWait only passes it through.
+    """
+    try:
+        return WebDriverWait(target, timeout, poll_frequency=poll,
+                             ignored_exceptions=(WebDriverException,)).until(condition)
+    except TimeoutException:
+        return None
+
+
+# Runs in the page so expanding every selected game costs one round trip instead of two per game
+EXPAND_GAMES_SCRIPT = """
+const games = Array.from(arguments[0].children);
+for (const index of arguments[1]) {
+    const game = games[index];
+    if (!game) continue;
+    const expanded = document.evaluate(arguments[3], game, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (expanded) continue;
+    const button = document.evaluate(arguments[2], game, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (button) button.click();
+}
+"""
+
+EXPANDED_GAMES_SCRIPT = """
+const games = Array.from(arguments[0].children);
+return arguments[1].map(
+    index => !!games[index] && document.evaluate(arguments[2], games[index], null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue !== null
+);
+"""
+
+
+# Reads only the newest game's header (team blocks cut from a detached copy) and, when it has not
+# changed since the last poll, asks op.gg for new matches for the next one, all in one round trip
+NEWEST_GAME_HEADER_SCRIPT = """
+const history = document.getElementsByClassName('space-y-2')[arguments[0]];
+if (!history || !history.firstElementChild) return null;
+const game = history.firstElementChild.cloneNode(true);
+const teams = document.evaluate(arguments[1], game, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+for (let i = 0; i < teams.snapshotLength; i++) teams.snapshotItem(i).remove();
+if (arguments[3] !== null && game.outerHTML === arguments[3]) {
+    const button = document.evaluate(arguments[2], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (button) button.click();
+}
+return game.outerHTML;
+"""
+
+
+def newest_game_header(driver, last_header=None):
+    """ outerHTML of the newest game's collapsed header, or None when the match history is not rendered.
+
+    When the header is still `last_header`, 'Fetch New Matches' is clicked in the same call so the next
+    poll sees fresh data. A changed header is returned without fetching, so the list is not re-rendered
+    under a caller about to expand the new game.
+    """
+    return driver.execute_script(NEWEST_GAME_HEADER_SCRIPT, MATCH_HISTORY_INDEX, TEAM_BLOCK_XPATH, FETCH_BUTTON_XPATH, last_header)
+
+
+def match_history_block(driver):
+    """ The match history container element, or None if it is not rendered. """
+    match_containers = driver.find_elements(By.CLASS_NAME, "space-y-2")
+    if len(match_containers) <= MATCH_HISTORY_INDEX:
+        return None
+    return match_containers[MATCH_HISTORY_INDEX]
+
+
+def match_history_rendered(driver):
+    """ Condition: the match history block is rendered and has at least one game in it. """
+    history_block = match_history_block(driver)
+    if history_block is None:
+        return False
+    past_games = history_block.find_elements(By.XPATH, "./div")
+    return past_games or False
+
+
+def team_blocks_present(game_block):
+    """ Condition: an expanded game block shows its team blocks. """
+    return game_block.find_elements(By.XPATH, TEAM_BLOCK_XPATH) or False
+
+
+def wait_for_match_history(driver, timeout=PAGE_TIMEOUT):
+    """ Returns the list of game blocks as soon as the match history renders, or None on timeout. """
+    return wait_until(driver, match_history_rendered, timeout)
+
+
+def expand_game(game_block, timeout=EXPAND_TIMEOUT):
+    """ Click a game's dropdown and wait until its team blocks are present. Returns True when expanded. """
+    if team_blocks_present(game_block):
+        return True
+    dropdown_button = game_block.find_element(By.XPATH, DROPDOWN_BUTTON_XPATH)
+    dropdown_button.click()
+    return wait_until(game_block, team_blocks_present, timeout) is not None
+
+
+def open_game_dropdown(game_block, max_attempts=4):
+    """ Click the dropdown to expose team data, waiting for the team blocks instead of a fixed sleep. """
+    backoff = Backoff(initial=1, maximum=8)
+    for attempt in range(1, max_attempts + 1):
+        try:
+            if expand_game(game_block):
+                return True
+            log.debug(f"Dropdown did not expand (attempt {attempt}/{max_attempts}).")
+        except Exception as e:
+            log.debug(f"Failed to click dropdown (attempt {attempt}/{max_attempts}). Retrying... {e}")
+        if attempt < max_attempts:
+            backoff.sleep()
+    return False
+
+
+def expand_games(driver, history_block, indices, timeout=EXPAND_TIMEOUT):
+    """ Expand the games at `indices` in one pass and wait until they all show their team blocks.
+
+    Returns one flag per index; games still collapsed at the timeout (e.g. the page only keeps
+    one dropdown open at a time) come back False so the caller can read them another way.
+    """
+    indices = list(indices)
+    driver.execute_script(EXPAND_GAMES_SCRIPT, history_block, indices, DROPDOWN_BUTTON_XPATH, TEAM_BLOCK_XPATH)
+
+    def all_expanded(driver):
+        flags = driver.execute_script(EXPANDED_GAMES_SCRIPT, history_block, indices, TEAM_BLOCK_XPATH)
+        return flags if flags and all(flags) else False
+
+    flags = wait_until(driver, all_expanded, timeout)
+    if flags is None:
+        flags = driver.execute_script(EXPANDED_GAMES_SCRIPT, history_block, indices, TEAM_BLOCK_XPATH) or []
+    return flags
+
+
+def click_fetch_new_matches(driver, timeout=FETCH_TIMEOUT):
+    """ Click 'Fetch New Matches' and wait for the match list to re-render instead of sleeping.
+
+    Raises if the button is not on the page, like a plain find_element would.
+    """
+    previous_games = match_history_rendered(driver) or []
+    first_game = previous_games[0] if previous_games else None
+
+    driver.find_element(By.XPATH, FETCH_BUTTON_XPATH).click()
+
+    def refreshed(driver):
+        if first_game is not None:
+            try:
+                first_game.is_enabled()
+            except WebDriverException:
+                # The old first game went stale, so the list was re-rendered
+                return match_history_rendered(driver)
+            return False
+        return match_history_rendered(driver)
+
+    # No re-render within the timeout just means there was nothing new to fetch
+    return wait_until(driver, refreshed, timeout)